@@ -0,0 +1 @@
+"""Makes ``db`` and ``services`` importable when pytest runs from this directory."""
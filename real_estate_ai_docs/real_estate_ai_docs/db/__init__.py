@@ -0,0 +1 @@
+"""Database models and data-access helpers for the Real Estate AI platform."""
@@ -0,0 +1,293 @@
+"""Approximate nearest-neighbour index (IVF) over property embeddings.
+
+Vectors are clustered with k-means into ``n_lists`` inverted lists. A query is
+scored only against the ``nprobe`` lists whose centroids are closest, so the
+cost per query is roughly ``nprobe / n_lists`` of an exact scan. Raising
+``nprobe`` trades latency for recall.
+
+The index is keyed by ``Embedding.property_id``, follows ``Embedding.updated_at``
+through :meth:`IVFIndex.sync`, and persists to a single ``.npz`` file.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+
+from .models import Embedding
+from .vector_search import METRICS, load_embedding_matrix, top_k
+
+FORMAT_VERSION = 1
+
+
+def _row_norms_squared(data):
+    return np.einsum('ij,ij->i', data, data)
+
+
+def assign_nearest(data, centroids, chunk_size=4096):
+    """Return the index of the closest centroid (squared L2) for every row of ``data``."""
+    centroid_norms = _row_norms_squared(centroids)
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        block = data[start:start + chunk_size]
+        distances = centroid_norms - 2.0 * (block @ centroids.T)
+        assignment[start:start + chunk_size] = np.argmin(distances, axis=1)
+    return assignment
+
+
+def kmeans(data, n_clusters, n_iter=20, seed=0, sample_size=None):
+    """Lloyd's k-means; returns a ``(n_clusters, d)`` float32 centroid matrix.
+
+    Empty clusters are re-seeded from random rows so every list stays usable.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    if sample_size and len(data) > sample_size:
+        data = data[np.sort(rng.choice(len(data), sample_size, replace=False))]
+    n_clusters = min(n_clusters, len(data))
+    if n_clusters == 0:
+        raise ValueError("k-means needs at least one training vector")
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = assign_nearest(data, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=n_clusters)
+        nonempty = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(data[order], starts[nonempty], axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def suggest_n_lists(n_vectors):
+    """Rule-of-thumb list count: about ``4 * sqrt(n)``, at least 1."""
+    return max(1, int(4 * np.sqrt(n_vectors)))
+
+
+class _InvertedList:
+    """Growable contiguous block of vectors belonging to one centroid."""
+
+    def __init__(self, dimensions, capacity=16):
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, dimensions), dtype=np.float32)
+
+    def append(self, property_id, vector):
+        if self.size == len(self.ids):
+            capacity = 2 * len(self.ids)
+            self.ids = np.resize(self.ids, capacity)
+            vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            vectors[:self.size] = self.vectors[:self.size]
+            self.vectors = vectors
+        self.ids[self.size] = property_id
+        self.vectors[self.size] = vector
+        self.size += 1
+        return self.size - 1
+
+    def remove(self, position):
+        """Swap-remove the entry at ``position``; returns the ID moved into it, if any."""
+        last = self.size - 1
+        moved = None
+        if position != last:
+            self.ids[position] = self.ids[last]
+            self.vectors[position] = self.vectors[last]
+            moved = int(self.ids[position])
+        self.size = last
+        return moved
+
+
+class IVFIndex:
+    """Inverted-file index with incremental insert, update and delete."""
+
+    def __init__(self, dimensions, n_lists=256, metric='cosine', nprobe=8):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+        self.dimensions = dimensions
+        self.n_lists = n_lists
+        self.metric = metric
+        self.nprobe = nprobe
+        self.centroids = None
+        self.watermark = None  # newest Embedding.updated_at applied by sync()
+        self._lists = []
+        self._location = {}  # property_id -> (list number, position)
+
+    def __len__(self):
+        return len(self._location)
+
+    def __contains__(self, property_id):
+        return property_id in self._location
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _prepare(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Vectors have {vectors.shape[1]} dimensions, index has {self.dimensions}")
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        return vectors
+
+    def train(self, vectors, n_iter=20, seed=0, sample_size=100_000):
+        """Fit the coarse centroids. Existing entries are re-assigned to the new lists."""
+        vectors = self._prepare(vectors)
+        self.centroids = kmeans(vectors, self.n_lists, n_iter=n_iter, seed=seed, sample_size=sample_size)
+        self.n_lists = len(self.centroids)
+        ids, stored = self._export()
+        self._lists = [_InvertedList(self.dimensions) for _ in range(self.n_lists)]
+        self._location = {}
+        if len(ids):
+            self._insert(ids, stored)
+
+    def _insert(self, property_ids, vectors):
+        for property_id, list_no, vector in zip(property_ids.tolist(), assign_nearest(vectors, self.centroids).tolist(), vectors):
+            self._location[property_id] = (list_no, self._lists[list_no].append(property_id, vector))
+
+    def upsert(self, property_ids, vectors):
+        """Insert new vectors or replace the stored vector for existing property IDs."""
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex.train() must be called before adding vectors")
+        property_ids = np.atleast_1d(np.asarray(property_ids, dtype=np.int64))
+        vectors = self._prepare(vectors)
+        if len(property_ids) != len(vectors):
+            raise ValueError("property_ids and vectors must have the same length")
+        self.delete(property_ids)
+        self._insert(property_ids, vectors)
+
+    def delete(self, property_ids):
+        """Remove property IDs from the index; unknown IDs are ignored."""
+        removed = 0
+        for property_id in np.atleast_1d(property_ids).tolist():
+            location = self._location.pop(property_id, None)
+            if location is None:
+                continue
+            list_no, position = location
+            moved = self._lists[list_no].remove(position)
+            if moved is not None:
+                self._location[moved] = (list_no, position)
+            removed += 1
+        return removed
+
+    def search_batch(self, queries, k=10, nprobe=None):
+        """Return ``(property_ids, scores)`` of shape ``(n_queries, k)``, padded with ID -1."""
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex.train() must be called before searching")
+        queries = self._prepare(queries)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        # Probe the lists whose centroids are nearest in L2, matching how vectors were assigned.
+        probes = top_k(2.0 * (queries @ self.centroids.T) - _row_norms_squared(self.centroids), nprobe)
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            blocks = [self._lists[list_no] for list_no in lists.tolist() if self._lists[list_no].size]
+            if not blocks:
+                continue
+            ids = np.concatenate([block.ids[:block.size] for block in blocks])
+            scores = np.concatenate([block.vectors[:block.size] @ query for block in blocks])
+            best = top_k(scores, k)
+            result_ids[row, :len(best)] = ids[best]
+            result_scores[row, :len(best)] = scores[best]
+        return result_ids, result_scores
+
+    def search(self, query, k=10, nprobe=None):
+        """Return up to ``k`` ``(property_id, score)`` pairs for a single query, best first."""
+        ids, scores = self.search_batch(query, k, nprobe=nprobe)
+        return [(pid, score) for pid, score in zip(ids[0].tolist(), scores[0].tolist()) if pid != -1]
+
+    # Database synchronisation
+
+    @classmethod
+    def build_from_session(cls, session, n_lists=None, metric='cosine', nprobe=8, seed=0):
+        """Train and fill an index from every row of ``embeddings``."""
+        watermark = session.scalar(select(func.max(Embedding.updated_at)))
+        ids, matrix = load_embedding_matrix(session)
+        index = cls(matrix.shape[1], n_lists=n_lists or suggest_n_lists(len(ids)), metric=metric, nprobe=nprobe)
+        index.train(matrix, seed=seed)
+        index.upsert(ids, matrix)
+        index.watermark = watermark
+        return index
+
+    def sync(self, session, batch_size=1000):
+        """Apply rows changed since the last sync and drop deleted embeddings.
+
+        Returns ``(upserted, deleted)`` counts. Rows whose ``updated_at`` equals
+        the watermark are re-applied, which is harmless and avoids missing
+        writes that share a timestamp with the previous sync.
+        """
+        stmt = select(Embedding.property_id, Embedding.vector, Embedding.updated_at)
+        if self.watermark is not None:
+            stmt = stmt.where(Embedding.updated_at >= self.watermark)
+        upserted = 0
+        watermark = self.watermark
+        result = session.execute(stmt.execution_options(yield_per=batch_size))
+        for rows in result.partitions(batch_size):
+            self.upsert([r.property_id for r in rows], np.stack([r.vector for r in rows]))
+            upserted += len(rows)
+            newest = max((r.updated_at for r in rows if r.updated_at is not None), default=None)
+            if newest is not None and (watermark is None or newest > watermark):
+                watermark = newest
+        self.watermark = watermark
+        live = set(session.scalars(select(Embedding.property_id)))
+        deleted = self.delete([pid for pid in list(self._location) if pid not in live])
+        return upserted, deleted
+
+    # Persistence
+
+    def _export(self):
+        blocks = [block for block in self._lists if block.size]
+        if not blocks:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dimensions), dtype=np.float32)
+        return (np.concatenate([b.ids[:b.size] for b in blocks]),
+                np.concatenate([b.vectors[:b.size] for b in blocks]))
+
+    def save(self, path):
+        """Write the index to ``path`` atomically (temp file + rename)."""
+        if not self.is_trained:
+            raise RuntimeError("Cannot save an untrained index")
+        sizes = np.array([block.size for block in self._lists], dtype=np.int64)
+        ids, vectors = self._export()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            np.savez(
+                fh,
+                version=np.int64(FORMAT_VERSION),
+                metric=np.str_(self.metric),
+                nprobe=np.int64(self.nprobe),
+                watermark=np.str_(self.watermark.isoformat() if self.watermark else ''),
+                centroids=self.centroids,
+                sizes=sizes,
+                ids=ids,
+                vectors=vectors,
+            )
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported IVF index format version {int(data['version'])}")
+            centroids = data['centroids']
+            index = cls(centroids.shape[1], n_lists=len(centroids), metric=str(data['metric']), nprobe=int(data['nprobe']))
+            index.centroids = centroids
+            watermark = str(data['watermark'])
+            index.watermark = datetime.fromisoformat(watermark) if watermark else None
+            ids, vectors = data['ids'], data['vectors']
+            index._lists = []
+            start = 0
+            for list_no, size in enumerate(data['sizes'].tolist()):
+                block = _InvertedList(index.dimensions, capacity=max(16, size))
+                block.ids[:size] = ids[start:start + size]
+                block.vectors[:size] = vectors[start:start + size]
+                block.size = size
+                index._lists.append(block)
+                for position, property_id in enumerate(block.ids[:size].tolist()):
+                    index._location[property_id] = (list_no, position)
+                start += size
+        return index
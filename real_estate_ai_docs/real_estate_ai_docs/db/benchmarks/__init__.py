@@ -0,0 +1 @@
+"""Benchmarks for the database and search helpers; run with ``python -m db.benchmarks.<name>``."""
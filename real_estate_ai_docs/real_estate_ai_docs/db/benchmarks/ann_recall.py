@@ -0,0 +1,76 @@
+"""Recall-vs-latency benchmark of the IVF index against exact search.
+
+    python -m db.benchmarks.ann_recall --vectors 100000 --dimensions 256
+
+Vectors are drawn around random cluster centres so the data has the kind of
+structure real listing embeddings have; uniformly random vectors are a
+worst case that no partitioning index handles well.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..ann_index import IVFIndex, suggest_n_lists
+from ..vector_search import ExactIndex
+
+
+def clustered_vectors(n, dimensions, n_clusters=64, spread=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centres[labels] + spread * rng.standard_normal((n, dimensions)).astype(np.float32)
+
+
+def recall_at_k(found, expected):
+    hits = sum(len(set(f.tolist()) & set(e.tolist())) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def run(n_vectors, dimensions, n_queries, k, n_lists, probes, seed):
+    data = clustered_vectors(n_vectors + n_queries, dimensions, seed=seed)
+    vectors, queries = data[:n_vectors], data[n_vectors:]
+    ids = np.arange(1, n_vectors + 1)
+
+    exact = ExactIndex(ids, vectors)
+    start = time.perf_counter()
+    expected, _ = exact.search_batch(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / n_queries
+    # Per-query latency for a fair comparison with the IVF loop below
+    start = time.perf_counter()
+    for query in queries:
+        exact.search_batch(query, k)
+    exact_single_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+    start = time.perf_counter()
+    index = IVFIndex(dimensions, n_lists=n_lists or suggest_n_lists(n_vectors))
+    index.train(vectors, seed=seed)
+    index.upsert(ids, vectors)
+    build_s = time.perf_counter() - start
+
+    print(f"{n_vectors} vectors x {dimensions} dims, {index.n_lists} lists, {n_queries} queries, k={k}")
+    print(f"IVF build: {build_s:.2f} s")
+    print(f"exact: {exact_single_ms:.3f} ms/query ({exact_ms:.3f} ms/query batched)")
+    print(f"{'nprobe':>8} {'recall@k':>10} {'ms/query':>10} {'speedup':>8}")
+    for nprobe in probes:
+        start = time.perf_counter()
+        found, _ = index.search_batch(queries, k, nprobe=nprobe)
+        ms = (time.perf_counter() - start) * 1000 / n_queries
+        print(f"{nprobe:>8} {recall_at_k(found, expected):>10.3f} {ms:>10.3f} {exact_single_ms / ms:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=50_000)
+    parser.add_argument('--dimensions', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.vectors, args.dimensions, args.queries, args.k, args.lists, args.probes, args.seed)
+
+
+if __name__ == '__main__':
+    main()
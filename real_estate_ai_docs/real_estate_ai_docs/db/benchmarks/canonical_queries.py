@@ -0,0 +1,94 @@
+"""Latency of the canonical ``api/schema.graphql`` queries on a synthetic SQLite database.
+
+    python -m db.benchmarks.canonical_queries --properties 1000000 --leads 1000000 --database scale.db
+
+Loads :mod:`db.synthetic` data at the requested scale into a scratch SQLite
+file (or reuses ``--database`` if it already holds data), then times every
+query in :data:`db.query_plans.CANONICAL_QUERIES`: median and p95 over
+``--repeat`` runs of executing it and fetching all rows, plus the row count and
+whether the plan reads a table with a full scan. Exits non-zero if a query's
+median exceeds ``--budget-ms``.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from ..models import Base, Property
+from ..query_plans import CANONICAL_QUERIES, explain
+from ..synthetic import generate
+
+
+def load(engine, properties, leads, embeddings, seed):
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        if connection.scalar(select(func.count()).select_from(Property)):
+            print("database already holds data, not loading")
+            return
+    started = time.perf_counter()
+    counts = generate(engine, properties, leads, embeddings=embeddings, seed=seed,
+                      progress=lambda name, rows, seconds: print(f"  {name:<48} {rows:>10} rows {seconds:8.1f} s"))
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ANALYZE')
+    print(f"loaded {sum(counts.values())} rows in {time.perf_counter() - started:.1f} s")
+
+
+def time_queries(engine, repeat, queries=None):
+    """``{name: (median_ms, p95_ms, rows, full_scan_tables)}`` for each canonical query."""
+    results = {}
+    with engine.connect() as connection:
+        for name, build in (queries or CANONICAL_QUERIES).items():
+            stmt = build()
+            _, scans = explain(connection, stmt)
+            rows = len(connection.execute(stmt).all())  # warm the page cache and the statement cache
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(stmt).all()
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            results[name] = (statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                             rows, scans)
+    return results
+
+
+def run(database, properties, leads, embeddings, seed, repeat, budget_ms):
+    engine = create_engine(f"sqlite:///{database}")
+    load(engine, properties, leads, embeddings, seed)
+    print(f"{'query':<40} {'median ms':>10} {'p95 ms':>10} {'rows':>6}  plan")
+    failed = False
+    for name, (median_ms, p95_ms, rows, scans) in time_queries(engine, repeat).items():
+        over = median_ms > budget_ms
+        failed |= over
+        plan = 'FULL SCAN ' + ', '.join(scans) if scans else 'indexed'
+        print(f"{name:<40} {median_ms:>10.2f} {p95_ms:>10.2f} {rows:>6}  {plan}{'  OVER BUDGET' if over else ''}")
+    engine.dispose()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--properties', type=int, default=100_000)
+    parser.add_argument('--leads', type=int, default=100_000)
+    parser.add_argument('--no-embeddings', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=50.0, help="limit on the median latency of each query")
+    parser.add_argument('--database', help="SQLite file to load or reuse (default: a temporary file)")
+    args = parser.parse_args()
+    if args.database:
+        failed = run(args.database, args.properties, args.leads, not args.no_embeddings, args.seed, args.repeat,
+                     args.budget_ms)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            failed = run(os.path.join(tmp, 'canonical.db'), args.properties, args.leads, not args.no_embeddings,
+                         args.seed, args.repeat, args.budget_ms)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Latency of GeoIndex radius, bounding-box and nearest queries against a full haversine scan.
+
+    python -m db.benchmarks.geo --sizes 100000 1000000
+
+Listings are drawn around community centres spread over Dubai and Abu Dhabi,
+so cell occupancy is as uneven as it is in real listing data.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..geo_index import GeoIndex, haversine_km
+
+# Rough bounding box of Dubai and Abu Dhabi
+_LAT_RANGE = (24.3, 25.35)
+_LON_RANGE = (54.3, 55.6)
+
+
+def clustered_coordinates(n, n_communities=200, spread_km=1.5, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = np.column_stack([rng.uniform(*_LAT_RANGE, n_communities), rng.uniform(*_LON_RANGE, n_communities)])
+    labels = rng.integers(0, n_communities, size=n)
+    offsets = rng.standard_normal((n, 2)) * spread_km / 111.0
+    coords = centres[labels] + offsets
+    return coords[:, 0], coords[:, 1], centres
+
+
+def _ms(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(n, n_queries, radius_km, k, cell_km, seed):
+    lat, lon, centres = clustered_coordinates(n, seed=seed)
+    ids = np.arange(1, n + 1)
+    rng = np.random.default_rng(seed + 1)
+    points = centres[rng.integers(0, len(centres), n_queries)] + rng.standard_normal((n_queries, 2)) * 0.01
+
+    start = time.perf_counter()
+    index = GeoIndex(cell_km=cell_km).build(ids, lat, lon)
+    build_s = time.perf_counter() - start
+
+    scan_ms = _ms(lambda a, b: ids[haversine_km(a, b, lat, lon) <= radius_km], points)
+    radius_ms = _ms(lambda a, b: index.within_radius(a, b, radius_km), points)
+    dlat = radius_km / 111.0
+    bbox_ms = _ms(lambda a, b: index.within_bbox(a - dlat, b - dlat, a + dlat, b + dlat), points)
+    nearest_ms = _ms(lambda a, b: index.nearest(a, b, k), points)
+    scan_nearest_ms = _ms(lambda a, b: np.argpartition(haversine_km(a, b, lat, lon), k)[:k], points)
+
+    updates = 10000
+    moved = rng.integers(1, n + 1, updates)
+    start = time.perf_counter()
+    index.upsert(moved, lat[moved - 1] + 0.01, lon[moved - 1] + 0.01)
+    upsert_us = (time.perf_counter() - start) * 1e6 / updates
+
+    print(f"{n} listings, {index.cell_km} km cells ({index.n_cells} occupied), {n_queries} queries")
+    print(f"  build: {build_s:.2f} s, incremental upsert: {upsert_us:.1f} us/listing")
+    print(f"  radius {radius_km} km: {radius_ms:.3f} ms/query vs full scan {scan_ms:.3f} ms ({scan_ms / radius_ms:.0f}x)")
+    print(f"  bbox:            {bbox_ms:.3f} ms/query")
+    print(f"  nearest k={k}:    {nearest_ms:.3f} ms/query vs full scan {scan_nearest_ms:.3f} ms "
+          f"({scan_nearest_ms / nearest_ms:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius-km', type=float, default=2.0)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--cell-km', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.queries, args.radius_km, args.k, args.cell_km, args.seed)
+
+
+if __name__ == '__main__':
+    main()
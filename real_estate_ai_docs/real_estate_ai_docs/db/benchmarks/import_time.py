@@ -0,0 +1,79 @@
+"""Import cost of the model package, measured with ``python -X importtime``.
+
+    python -m db.benchmarks.import_time --budget-ms 60
+
+Imports each module in a fresh interpreter ``--repeat`` times and keeps the
+fastest run. It reports the cumulative time and the time spent in this
+repository's own modules (SQLAlchemy itself is excluded). Exits non-zero if
+that own time exceeds ``--budget-ms`` or if a module in ``--forbid`` (pandas,
+NumPy, the diagram tooling) was imported at all, so it can guard the budget in
+CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FORBIDDEN = ('numpy', 'pandas', 'eralchemy2', 'pygraphviz', 'graphviz')
+
+
+def parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us)]`` from ``-X importtime`` output, in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, forbid=FORBIDDEN, python=sys.executable):
+    """One cold import of ``module``: ``(rows, loaded_forbidden_modules)``."""
+    probe = f"import sys, {module}; print(','.join(m for m in {tuple(forbid)!r} if m in sys.modules))"
+    result = subprocess.run([python, '-X', 'importtime', '-c', probe], cwd=PACKAGE_ROOT,
+                            capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr), [m for m in result.stdout.strip().split(',') if m]
+
+
+def own_modules(rows, prefixes=('db', 'services')):
+    return [row for row in rows if row[0].split('.')[0] in prefixes]
+
+
+def run(module, repeat, forbid=FORBIDDEN):
+    best = None
+    for _ in range(repeat):
+        rows, forbidden = measure(module, forbid)
+        total = next(cumulative for name, _, cumulative in rows if name == module)
+        own = sum(self_us for _, self_us, _ in own_modules(rows))
+        if best is None or own < best[1]:
+            best = (total, own, rows, forbidden)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=['db.models'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=60.0, help="limit on time spent in this repository's modules")
+    parser.add_argument('--forbid', nargs='*', default=list(FORBIDDEN), help="modules that must not be imported")
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+    failed = False
+    for module in args.modules:
+        total, own, rows, forbidden = run(module, args.repeat, args.forbid)
+        print(f"{module}: {total / 1000:.1f} ms cumulative, {own / 1000:.1f} ms in repository modules "
+              f"(budget {args.budget_ms:.0f} ms)")
+        for name, self_us, _ in sorted(own_modules(rows), key=lambda row: -row[1])[:args.top]:
+            print(f"  {self_us / 1000:7.1f} ms  {name}")
+        if forbidden:
+            print(f"  FAIL: imports {', '.join(forbidden)}")
+        if own > args.budget_ms * 1000:
+            print("  FAIL: over budget")
+        failed |= bool(forbidden) or own > args.budget_ms * 1000
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
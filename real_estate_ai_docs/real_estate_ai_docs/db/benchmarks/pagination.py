@@ -0,0 +1,82 @@
+"""Page-depth latency of OFFSET pagination versus keyset pagination.
+
+    python -m db.benchmarks.pagination --rows 200000 --pages 1 10 100 1000 5000
+
+Seeds ``leads`` in a scratch SQLite database, then times fetching page N of
+``Query.leads(status: NEW)`` both ways. Keyset latency should stay flat as N
+grows while OFFSET latency grows linearly.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from ..models import Base, Lead
+from ..pagination import encode_cursor, paginate_leads
+
+STATUSES = ('new', 'contacted', 'qualified', 'proposal', 'negotiation', 'closed', 'lost')
+
+
+def seed_leads(engine, rows, batch_size=10_000):
+    start = datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, batch_size):
+            connection.execute(insert(Lead), [
+                {'first_name': 'Lead', 'last_name': str(i), 'email': f'lead{i}@example.com',
+                 'status': STATUSES[i % 2], 'created_at': start + timedelta(minutes=i)}
+                for i in range(offset, min(rows, offset + batch_size))
+            ])
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(rows, pages, page_size, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'pagination.db')}")
+        Base.metadata.create_all(engine)
+        seed_leads(engine, rows)
+        print(f"{rows} leads, page size {page_size}, median of {repeat} runs")
+        print(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+        with Session(engine) as session:
+            base = select(Lead).where(Lead.status == 'new').order_by(Lead.created_at.desc(), Lead.id.desc())
+            for page in pages:
+                skip = (page - 1) * page_size
+                # The keyset cursor for page N is the sort key of the last row of page N-1 (setup, not timed)
+                after = None
+                if skip:
+                    last = session.execute(select(Lead.created_at, Lead.id).where(Lead.status == 'new')
+                                           .order_by(Lead.created_at.desc(), Lead.id.desc()).offset(skip - 1).limit(1)).first()
+                    if last is None:
+                        break
+                    after = encode_cursor(tuple(last))
+                offset_ms = _time(lambda: session.scalars(base.offset(skip).limit(page_size)).all(), repeat)
+                keyset_ms = _time(lambda: paginate_leads(session, status='new', first=page_size, after=after,
+                                                         include_total=False), repeat)
+                session.expunge_all()
+                print(f"{page:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 4000])
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.rows, args.pages, args.page_size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Recall@k and bytes per vector for each embedding encoding, side by side.
+
+    python -m db.benchmarks.quantization_recall --vectors 50000 --dimensions 1536
+
+Each row compares one encoding with exact float32 search, both with the
+compressed scores alone and after re-ranking the shortlist at full precision.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+from ..vector_search import ExactIndex
+from .ann_recall import clustered_vectors, recall_at_k
+
+
+def _timed_search(index, queries, k, **options):
+    start = time.perf_counter()
+    found = np.array([[pid for pid, _ in index.search(query, k, **options)] for query in queries])
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(n_vectors, dimensions, n_queries, k, rerank, pq_sizes, seed):
+    data = clustered_vectors(n_vectors + n_queries, dimensions, seed=seed)
+    vectors, queries = data[:n_vectors], data[n_vectors:]
+    exact = ExactIndex(np.arange(1, n_vectors + 1), vectors)
+    expected, exact_ms = _timed_search(exact, queries, k)
+
+    print(f"{n_vectors} vectors x {dimensions} dims, {n_queries} queries, k={k}, rerank={rerank}")
+    print(f"{'encoding':>10} {'bytes/vec':>10} {'ratio':>6} {'recall':>8} {'+rerank':>8} {'ms/query':>9}")
+    print(f"{'float32':>10} {4 * dimensions:>10} {1:>5.0f}x {1:>8.3f} {1:>8.3f} {exact_ms:>9.3f}")
+    float16 = ExactIndex(exact.ids, vectors.astype(np.float16))
+    found, ms = _timed_search(float16, queries, k)
+    recall = recall_at_k(found, expected)
+    print(f"{'float16':>10} {2 * dimensions:>10} {2:>5.0f}x {recall:>8.3f} {recall:>8.3f} {ms:>9.3f}")
+
+    quantizers = [ScalarQuantizer()] + [ProductQuantizer(m, seed=seed) for m in pq_sizes if dimensions % m == 0]
+    for quantizer in quantizers:
+        index = QuantizedIndex.build(quantizer, exact, rerank=rerank, seed=seed)
+        coarse, _ = _timed_search(index, queries, k, rerank=0)
+        found, ms = _timed_search(index, queries, k)
+        print(f"{quantizer.name:>10} {index.bytes_per_vector:>10} {4 * dimensions / index.bytes_per_vector:>5.0f}x "
+              f"{recall_at_k(coarse, expected):>8.3f} {recall_at_k(found, expected):>8.3f} {ms:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=20_000)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--rerank', type=int, default=100)
+    parser.add_argument('--pq', type=int, nargs='+', default=[192, 96, 48])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.vectors, args.dimensions, args.queries, args.k, args.rerank, args.pq, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Bulk write helpers shared by the import and backfill jobs."""
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+
+
+def upsert_rows(session, table, rows, key_columns, update_columns=None):
+    """Insert ``rows`` into ``table``, updating rows that clash on ``key_columns``.
+
+    Uses a single ``executemany`` of ``INSERT ... ON CONFLICT DO UPDATE`` on
+    SQLite and PostgreSQL. Other dialects fall back to one ``executemany``
+    UPDATE for existing keys and one INSERT for the rest. ``key_columns`` must
+    be covered by a unique constraint. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    if update_columns is None:
+        update_columns = [name for name in rows[0] if name not in key_columns]
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={name: stmt.excluded[name] for name in update_columns},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+        session.execute(stmt, rows)
+        return len(rows)
+
+    keys = [table.c[name] for name in key_columns]
+    existing = set()
+    for start in range(0, len(rows), 500):
+        chunk = [tuple(row[name] for name in key_columns) for row in rows[start:start + 500]]
+        if len(keys) == 1:
+            condition = keys[0].in_([key[0] for key in chunk])
+        else:
+            condition = or_(*(and_(*(c == v for c, v in zip(keys, key))) for key in chunk))
+        existing.update(tuple(r) for r in session.execute(select(*keys).where(condition)))
+    updates = [row for row in rows if tuple(row[name] for name in key_columns) in existing]
+    inserts = [row for row in rows if tuple(row[name] for name in key_columns) not in existing]
+    if updates and update_columns:
+        stmt = (
+            update(table)
+            .where(and_(*(table.c[name] == bindparam(f'key_{name}') for name in key_columns)))
+            .values({name: bindparam(f'new_{name}') for name in update_columns})
+        )
+        session.connection().execute(stmt, [
+            {**{f'key_{n}': row[n] for n in key_columns}, **{f'new_{n}': row[n] for n in update_columns}}
+            for row in updates
+        ])
+    if inserts:
+        session.execute(insert(table), inserts)
+    return len(rows)
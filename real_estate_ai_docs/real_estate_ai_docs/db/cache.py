@@ -0,0 +1,163 @@
+"""Byte-bounded cache primitives shared by the application caches.
+
+Caches store serialized ``bytes`` values behind a small Redis-compatible
+interface (``get``/``set``/``delete``). :class:`LocalBackend` is the
+in-process implementation and doubles as a stand-in for Redis in tests and
+single-process deployments. :class:`RedisBackend` wraps any client that speaks
+``redis-py``'s ``get``/``set(ex=...)``/``delete``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU mapping of keys to ``bytes``, bounded by total value size.
+
+    ``on_evict(key)`` is called, outside the lock, for every key evicted to make room.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            # Never cache a value that would evict everything else
+            self.delete(key)
+            return False
+        evicted_keys = []
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = value
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                evicted_key, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+                evicted_keys.append(evicted_key)
+        if self.on_evict is not None:
+            for evicted_key in evicted_keys:
+                self.on_evict(evicted_key)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            return old is not None
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+class LocalBackend:
+    """In-process backend with the Redis subset used by the caches, including ``ex`` expiry.
+
+    Callables in ``eviction_listeners`` are called with each key the backend
+    drops on its own, evicted by the LRU or found expired, so callers indexing
+    their keys can forget them.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.lru = LRUCache(max_bytes, on_evict=self._evicted)
+        self._expires = {}
+        self.eviction_listeners = []
+
+    def _evicted(self, key):
+        self._expires.pop(key, None)
+        for listener in self.eviction_listeners:
+            listener(key)
+
+    def get(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            if self.delete(key):
+                self._evicted(key)
+            return None
+        return self.lru.get(key)
+
+    def set(self, key, value, ex=None):
+        if ex is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ex
+        stored = self.lru.set(key, value)
+        if not stored:
+            self._expires.pop(key, None)
+        return stored
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            self._expires.pop(key, None)
+            removed += self.lru.delete(key)
+        return removed
+
+    def stats(self):
+        return {'keys': len(self.lru), 'bytes': self.lru.bytes, 'max_bytes': self.lru.max_bytes,
+                'evictions': self.lru.evictions}
+
+
+class RedisBackend:
+    """Backend over a Redis client; ``maxmemory``/``maxmemory-policy allkeys-lru`` bound it server side."""
+
+    def __init__(self, client, prefix='real_estate:', ttl=None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ex=None):
+        return bool(self.client.set(self.prefix + key, value, ex=ex if ex is not None else self.ttl))
+
+    def delete(self, *keys):
+        if not keys:
+            return 0
+        return self.client.delete(*(self.prefix + key for key in keys))
+
+    def stats(self):
+        return {}
+
+
+class CacheStats:
+    """Hit/miss counters for one cache; ``bytes_saved`` counts payload served without a database read."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.bytes_saved = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                'invalidations': self.invalidations, 'bytes_saved': self.bytes_saved}
@@ -0,0 +1,173 @@
+"""Per-session conversation context cache for building chatbot prompts.
+
+Each chatbot turn needs the recent messages of a ``ChatSession`` plus a summary
+of everything older. Reloading ``ChatSession.messages`` for that on every turn
+reads the whole history. This cache keeps, per session, a window of the most
+recent messages that fits a token budget and a running summary of the messages
+that have scrolled out of it, serialized in a :mod:`db.cache` backend (local
+LRU by default, Redis when shared between workers).
+
+Writes keep it coherent in two ways:
+
+* messages written through :class:`db.chat_log_store.ChatLogWriter` are folded
+  into cached windows incrementally (:meth:`ChatContextCache.attach`), so a
+  live conversation never goes back to a full reload;
+* ORM inserts, updates and deletes of ``ChatMessage`` invalidate the affected
+  sessions once the ORM transaction commits.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.orm import Session, object_session
+
+from .cache import CacheStats, LocalBackend
+from .chat_log_store import ChatLogStore
+from .models import ChatMessage
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def truncate_summary(summary, dropped, max_tokens, count_tokens=estimate_tokens):
+    """Default summarizer: one clipped line per dropped message, keeping the newest lines within budget."""
+    lines = summary.splitlines() if summary else []
+    lines += [f"{m['role']}: {' '.join(m['content'].split())[:160]}" for m in dropped]
+    while lines and count_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def _message(row):
+    return {'id': row['id'], 'role': row['role'], 'content': row['content'], 'language': row['language'],
+            'timestamp': row['timestamp'].isoformat()}
+
+
+class ChatContextCache:
+    """Token-budgeted message window and running summary per chat session.
+
+    ``max_tokens`` bounds the window, ``max_summary_tokens`` the summary and
+    ``window_limit`` how many messages a cache miss reads. ``summarizer`` is
+    called as ``summarizer(summary, dropped_messages, max_summary_tokens)``
+    and may be replaced by an LLM-backed one.
+    """
+
+    def __init__(self, engine, backend=None, max_tokens=3000, max_summary_tokens=500, window_limit=200,
+                 count_tokens=estimate_tokens, summarizer=None, track_orm_writes=True):
+        self.engine = engine
+        self.store = ChatLogStore(engine)
+        self.backend = backend if backend is not None else LocalBackend(max_bytes=32 * 1024 * 1024)
+        self.max_tokens = max_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.window_limit = window_limit
+        self.count_tokens = count_tokens
+        self.summarizer = summarizer or (lambda s, d, n: truncate_summary(s, d, n, count_tokens))
+        self.stats = CacheStats()
+        self._listeners = []
+        if track_orm_writes:
+            self._listen_for_orm_writes()
+
+    @staticmethod
+    def key(session_id):
+        return f'chat_context:{session_id}'
+
+    def _message_tokens(self, message):
+        return self.count_tokens(message['content']) + 4
+
+    def _fold(self, context, messages):
+        """Append ``messages`` to the window, moving the oldest into the summary until it fits the budget."""
+        window = context['messages'] + messages
+        tokens = context['tokens'] + sum(self._message_tokens(m) for m in messages)
+        cut = 0
+        while tokens > self.max_tokens and len(window) - cut > 1:
+            tokens -= self._message_tokens(window[cut])
+            cut += 1
+        if cut:
+            context['summary'] = self.summarizer(context['summary'], window[:cut], self.max_summary_tokens)
+        context['messages'] = window[cut:]
+        context['tokens'] = tokens
+        return context
+
+    def _save(self, session_id, context):
+        self.backend.set(self.key(session_id), json.dumps(context, separators=(',', ':')).encode())
+
+    def get(self, session_id):
+        """``{'session_id', 'summary', 'messages', 'tokens'}`` for a session, loading it on a miss."""
+        payload = self.backend.get(self.key(session_id))
+        if payload is not None:
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(payload)
+            return json.loads(payload)
+        self.stats.misses += 1
+        rows = self.store.recent_messages(session_id, self.window_limit)
+        context = self._fold({'session_id': session_id, 'summary': '', 'messages': [], 'tokens': 0},
+                             [_message(row) for row in rows])
+        self._save(session_id, context)
+        return context
+
+    def prompt_messages(self, session_id):
+        """The cached context as chat-completion messages, summary first."""
+        context = self.get(session_id)
+        messages = [{'role': m['role'], 'content': m['content']} for m in context['messages']]
+        if context['summary']:
+            messages.insert(0, {'role': 'system', 'content': 'Earlier in this conversation:\n' + context['summary']})
+        return messages
+
+    def invalidate(self, *session_ids):
+        self.stats.invalidations += len(session_ids)
+        self.backend.delete(*(self.key(sid) for sid in session_ids))
+
+    def refresh(self, session_ids):
+        """Fold messages written since each cached window's last message into it; uncached sessions are skipped."""
+        table = ChatMessage.__table__
+        for session_id in session_ids:
+            payload = self.backend.get(self.key(session_id))
+            if payload is None:
+                continue
+            context = json.loads(payload)
+            stmt = select(table).where(table.c.session_id == session_id)
+            if context['messages']:
+                last = context['messages'][-1]
+                stmt = stmt.where(tuple_(table.c.timestamp, table.c.id)
+                                  > tuple_(datetime.fromisoformat(last['timestamp']), last['id']))
+            with self.engine.connect() as connection:
+                rows = connection.execute(stmt.order_by(table.c.timestamp, table.c.id)).mappings().all()
+            self._save(session_id, self._fold(context, [_message(row) for row in rows]))
+
+    def attach(self, writer):
+        """Keep cached windows current for messages group-committed by ``writer``."""
+        writer.on_flush.append(self.refresh)
+
+    # ORM write tracking: collect touched sessions per ORM session, invalidate after commit
+
+    def _listen_for_orm_writes(self):
+        dirty_key = f'chat_context_dirty:{id(self)}'
+
+        def mark(mapper, connection, target):
+            session = object_session(target)
+            if session is not None:
+                session.info.setdefault(dirty_key, set()).add(target.session_id)
+
+        def committed(session):
+            dirty = session.info.pop(dirty_key, None)
+            if dirty:
+                self.invalidate(*dirty)
+
+        def rolled_back(session):
+            session.info.pop(dirty_key, None)
+
+        for target, name, fn in ((ChatMessage, 'after_insert', mark), (ChatMessage, 'after_update', mark),
+                                 (ChatMessage, 'after_delete', mark), (Session, 'after_commit', committed),
+                                 (Session, 'after_rollback', rolled_back)):
+            event.listen(target, name, fn)
+            self._listeners.append((target, name, fn))
+
+    def close(self):
+        for target, name, fn in self._listeners:
+            event.remove(target, name, fn)
+        self._listeners = []
+
+    def metrics(self):
+        return dict(self.stats.as_dict(), **self.backend.stats())
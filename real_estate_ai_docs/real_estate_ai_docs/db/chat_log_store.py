@@ -0,0 +1,294 @@
+"""Append-optimised storage for ``chat_logs`` with monthly archive partitions.
+
+``chat_logs`` is the hot tier: every assistant turn appends to it, and almost
+every read is "the last N messages of session X".
+
+* :class:`ChatLogWriter` buffers appended messages and group-commits them. One
+  transaction holds a single ``executemany`` INSERT plus one UPDATE of
+  ``chat_sessions.updated_at`` per touched session, instead of a commit per
+  message.
+* :meth:`ChatLogStore.recent_messages` reads the window with one range scan of
+  ``ix_chat_logs_session_id_timestamp_id`` and only consults the archive when
+  the hot tier holds fewer than N messages for the session. Even then it
+  only reads the archive months since the session was created, and the list of
+  archive tables is cached rather than inspected on every read.
+* :meth:`ChatLogStore.compact` moves closed months out of ``chat_logs`` into
+  per-month archive tables (``chat_logs_YYYY_MM``) in small batches, each in
+  its own short transaction. Batches are found through
+  ``ix_chat_logs_timestamp_id``, so each one costs an index range scan rather
+  than a scan of the whole hot table.
+* :meth:`ChatLogStore.drop_archives_before` enforces retention by dropping
+  whole month tables, which takes constant time and no row locks, unlike
+  ``DELETE ... WHERE timestamp < ...``.
+
+The scheme is the same on SQLite and PostgreSQL. Archive tables have no foreign
+keys so they can be dropped or exported independently.
+"""
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, bindparam, delete, func, inspect, insert, select, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from .models import ChatMessage, ChatSession
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = 'chat_logs_'
+_ARCHIVE_NAME = re.compile(r'^chat_logs_(\d{4})_(\d{2})$')
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(moment):
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+def archive_table_name(month):
+    return f"{ARCHIVE_PREFIX}{month.year:04d}_{month.month:02d}"
+
+
+class ChatLogWriter:
+    """Buffers chat messages and writes them in group commits.
+
+    Messages are flushed when ``max_batch`` are pending, when the oldest has
+    waited ``max_delay`` seconds (checked on append and by the optional
+    background thread), or on :meth:`flush`/:meth:`close`. ``on_flush``
+    callbacks receive the set of session IDs written, e.g. to invalidate
+    caches.
+
+    A failed batch stays pending, and automatic flushes back off
+    exponentially (up to ``max_backoff`` seconds) before retrying it. A batch
+    that violates a constraint, or that has failed ``max_retries`` flushes in
+    a row, is split in halves until the bad messages are isolated. The rest
+    are written, and each bad message goes to the ``on_dead_letter``
+    callbacks as ``(message, error)``, so one bad message cannot block the
+    writer.
+    """
+
+    def __init__(self, engine, max_batch=500, max_delay=0.05, background=False, max_retries=10, max_backoff=30.0):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.on_flush = []
+        self.on_dead_letter = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name='chat-log-writer', daemon=True)
+            self._thread.start()
+
+    def append(self, session_id, role, content, language, timestamp=None):
+        message = {'session_id': session_id, 'role': role, 'content': content, 'language': language,
+                   'timestamp': timestamp or datetime.utcnow()}
+        with self._lock:
+            self._pending.append(message)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            now = time.monotonic()
+            due = now >= self._retry_at and (len(self._pending) >= self.max_batch or now - self._oldest >= self.max_delay)
+        if due:
+            self.flush()
+
+    def _write(self, messages):
+        """Insert ``messages`` and bump their sessions in one transaction; returns the session IDs written."""
+        latest = defaultdict(lambda: datetime.min)
+        for message in messages:
+            latest[message['session_id']] = max(latest[message['session_id']], message['timestamp'])
+        with self.engine.begin() as connection:
+            connection.execute(insert(ChatMessage.__table__), messages)
+            connection.execute(
+                update(ChatSession.__table__)
+                .where(ChatSession.__table__.c.id == bindparam('sid'))
+                .values(updated_at=bindparam('ts')),
+                [{'sid': sid, 'ts': ts} for sid, ts in latest.items()],
+            )
+        return set(latest)
+
+    def _write_isolating(self, messages):
+        """Write what can be written by bisecting ``messages``; returns ``(count, session IDs)`` written."""
+        try:
+            return len(messages), self._write(messages)
+        except Exception as exc:
+            if len(messages) == 1:
+                log.error("dropping chat message for session %s: %s", messages[0]['session_id'], exc)
+                for callback in self.on_dead_letter:
+                    callback(messages[0], exc)
+                return 0, set()
+        middle = len(messages) // 2
+        first_count, first_sessions = self._write_isolating(messages[:middle])
+        second_count, second_sessions = self._write_isolating(messages[middle:])
+        return first_count + second_count, first_sessions | second_sessions
+
+    def flush(self):
+        """Write all pending messages in one transaction; returns the number written.
+
+        If the write fails the messages stay pending and the error is re-raised,
+        unless the batch is split to isolate bad messages (see the class docstring).
+        """
+        with self._lock:
+            pending, started = self._pending, self._oldest
+            self._pending, self._oldest = [], None
+        if not pending:
+            return 0
+        try:
+            written, sessions = len(pending), self._write(pending)
+        except Exception as exc:
+            self._failures += 1
+            if not isinstance(exc, (IntegrityError, DataError)) and self._failures < self.max_retries:
+                # Nothing was committed: put the batch back ahead of anything appended meanwhile
+                with self._lock:
+                    self._pending[:0] = pending
+                    self._oldest = started if self._oldest is None else min(started, self._oldest)
+                self._retry_at = time.monotonic() + min(self.max_delay * 2 ** self._failures, self.max_backoff)
+                raise
+            written, sessions = self._write_isolating(pending)
+        self._failures, self._retry_at = 0, 0.0
+        if sessions:
+            for callback in self.on_flush:
+                callback(sessions)
+        return written
+
+    def _run(self):
+        while not self._stop.wait(self.max_delay):
+            if time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                # The batch is still pending; keep the thread alive and retry on the next tick
+                log.exception("chat log flush failed")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ChatLogStore:
+    """Hot ``chat_logs`` table plus monthly archive tables on one engine."""
+
+    def __init__(self, engine, archive_ttl=60.0):
+        self.engine = engine
+        self.archive_metadata = MetaData()
+        # Archive months are re-listed at most every archive_ttl seconds (compaction elsewhere creates new ones)
+        self.archive_ttl = archive_ttl
+        self._archives = None
+        self._archives_listed = 0.0
+
+    def writer(self, **options):
+        return ChatLogWriter(self.engine, **options)
+
+    # Archive tables
+
+    def _archive_table(self, name):
+        if name in self.archive_metadata.tables:
+            return self.archive_metadata.tables[name]
+        columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False)
+                   for c in ChatMessage.__table__.columns]
+        return Table(name, self.archive_metadata, *columns,
+                     Index(f'ix_{name}_session_id_timestamp_id', 'session_id', 'timestamp', 'id'))
+
+    def archive_months(self, refresh=False):
+        """Months that have an archive table, newest first."""
+        if refresh or self._archives is None or time.monotonic() - self._archives_listed >= self.archive_ttl:
+            months = []
+            for name in inspect(self.engine).get_table_names():
+                match = _ARCHIVE_NAME.match(name)
+                if match:
+                    months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+            self._archives = sorted(months, reverse=True)
+            self._archives_listed = time.monotonic()
+        return list(self._archives)
+
+    def compact(self, before, batch_size=5000):
+        """Move messages older than the month containing ``before`` into archive tables.
+
+        Each batch is copied and deleted in its own transaction, so writers are
+        never blocked for longer than one batch. Returns the number of rows moved.
+        """
+        cutoff = month_start(before)
+        hot = ChatMessage.__table__
+        moved = 0
+        while True:
+            with self.engine.begin() as connection:
+                oldest = connection.scalar(select(func.min(hot.c.timestamp)).where(hot.c.timestamp < cutoff))
+                if oldest is None:
+                    self.archive_months(refresh=True)
+                    return moved
+                month = month_start(oldest)
+                archive = self._archive_table(archive_table_name(month))
+                archive.create(connection, checkfirst=True)
+                ids = connection.scalars(
+                    select(hot.c.id).where(hot.c.timestamp >= month, hot.c.timestamp < min(next_month(month), cutoff))
+                    .order_by(hot.c.timestamp, hot.c.id).limit(batch_size)).all()
+                connection.execute(archive.insert().from_select(
+                    [c.name for c in hot.columns], select(*hot.columns).where(hot.c.id.in_(ids))))
+                connection.execute(delete(hot).where(hot.c.id.in_(ids)))
+                moved += len(ids)
+
+    def drop_archives_before(self, before):
+        """Drop archive tables for months before the month containing ``before``; returns their names."""
+        cutoff = month_start(before)
+        dropped = []
+        for month in self.archive_months():
+            if month < cutoff:
+                name = archive_table_name(month)
+                with self.engine.begin() as connection:
+                    self._archive_table(name).drop(connection)
+                self.archive_metadata.remove(self.archive_metadata.tables[name])
+                dropped.append(name)
+        self.archive_months(refresh=True)
+        return dropped
+
+    # Reads
+
+    def recent_messages(self, session_id, limit=20):
+        """Last ``limit`` messages of a session, oldest first, as dicts.
+
+        Served by one index range scan of ``chat_logs``; archive months since
+        the session was created are read newest first only while the window
+        is still short.
+        """
+        with self.engine.connect() as connection:
+            messages = self._window(connection, ChatMessage.__table__, session_id, limit)
+            archives = self.archive_months() if len(messages) < limit else []
+            if archives:
+                created = connection.scalar(select(ChatSession.created_at).where(ChatSession.id == session_id))
+                first = month_start(created) if created is not None else None
+                for month in archives:
+                    if first is not None and month < first:
+                        break
+                    messages += self._window(connection, self._archive_table(archive_table_name(month)),
+                                             session_id, limit - len(messages))
+                    if len(messages) >= limit:
+                        break
+        messages.reverse()
+        return messages
+
+    @staticmethod
+    def _window(connection, table, session_id, limit):
+        rows = connection.execute(
+            select(table).where(table.c.session_id == session_id)
+            .order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit))
+        return [dict(row._mapping) for row in rows]
@@ -0,0 +1,198 @@
+"""Data dictionary of the database models, written as xlsx, CSV, Markdown and JSON.
+
+    python -m db.data_dictionary --output-dir db --format xlsx md
+
+Descriptions come from each column's ``comment`` (also emitted as ``COMMENT
+ON COLUMN`` by PostgreSQL DDL), or from ``info['description']`` for columns
+that should not carry a database comment. Rows are generated one at a time
+from ``Base.metadata``, and every writer streams them straight to its file. The
+xlsx writer produces the OOXML parts with :mod:`zipfile`, so pandas and
+openpyxl are not needed.
+
+Each run hashes the rows. Formats whose file exists and was written from the
+same hash (recorded in ``.data_dictionary.json`` next to the outputs) are
+skipped, so a docs build only rewrites the dictionary when the schema changed.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import Base
+
+FIELDS = ('Table', 'Column', 'Type', 'Primary Key', 'Foreign Key', 'Nullable', 'Default', 'Description')
+FORMATS = ('xlsx', 'csv', 'md', 'json')
+MANIFEST = '.data_dictionary.json'
+DEFAULT_OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def describe(column):
+    return column.comment or column.info.get('description', '')
+
+
+def _default(column):
+    """Stable text for a column default (callables by name, not by their per-process repr)."""
+    default = column.default
+    if default is None:
+        return ''
+    if default.is_callable:
+        return f'{default.arg.__qualname__}()'
+    if default.is_scalar:
+        return repr(default.arg)
+    return str(default.arg)
+
+
+def iter_rows(metadata=Base.metadata):
+    """One dict per column, keyed by :data:`FIELDS`, in table and column definition order."""
+    for table_name, table in metadata.tables.items():
+        for column in table.columns:
+            yield {
+                'Table': table_name,
+                'Column': column.name,
+                'Type': str(column.type),
+                'Primary Key': 'Yes' if column.primary_key else 'No',
+                'Foreign Key': 'Yes' if column.foreign_keys else 'No',
+                'Nullable': 'Yes' if column.nullable else 'No',
+                'Default': _default(column),
+                'Description': describe(column),
+            }
+
+
+def schema_hash(metadata=Base.metadata):
+    digest = hashlib.sha256()
+    for row in iter_rows(metadata):
+        digest.update(json.dumps([row[field] for field in FIELDS]).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+# Writers: each takes the row iterator and a file object (binary for xlsx, text otherwise)
+
+def write_csv(rows, f):
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_markdown(rows, f):
+    f.write('| ' + ' | '.join(FIELDS) + ' |\n')
+    f.write('|' + '---|' * len(FIELDS) + '\n')
+    for row in rows:
+        f.write('| ' + ' | '.join(row[field].replace('|', '\\|') for field in FIELDS) + ' |\n')
+
+
+def write_json(rows, f):
+    f.write('[')
+    for i, row in enumerate(rows):
+        f.write((',\n ' if i else '\n ') + json.dumps(row, ensure_ascii=False))
+    f.write('\n]\n')
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Data Dictionary" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/></Relationships>'),
+}
+
+
+def _xlsx_row(number, values):
+    cells = ''.join(f'<c r="{chr(ord("A") + i)}{number}" t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+                    for i, value in enumerate(values) if value)
+    return f'<row r="{number}">{cells}</row>'
+
+
+def write_xlsx(rows, f):
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name, content in _XLSX_PARTS.items():
+            package.writestr(name, content)
+        with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(1, FIELDS).encode())
+            for number, row in enumerate(rows, start=2):
+                sheet.write(_xlsx_row(number, [row[field] for field in FIELDS]).encode())
+            sheet.write(b'</sheetData></worksheet>')
+
+
+WRITERS = {
+    'xlsx': (write_xlsx, 'wb'),
+    'csv': (write_csv, 'w'),
+    'md': (write_markdown, 'w'),
+    'json': (write_json, 'w'),
+}
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path, mode, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode, **({} if 'b' in mode else {'encoding': 'utf-8', 'newline': ''})) as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def generate(output_dir=DEFAULT_OUTPUT_DIR, formats=FORMATS, metadata=Base.metadata, force=False):
+    """Write ``data_dictionary.<format>`` for each format whose schema changed; returns the paths written."""
+    os.makedirs(output_dir, exist_ok=True)
+    current = schema_hash(metadata)
+    manifest = _read_manifest(output_dir)
+    written = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f'data_dictionary.{fmt}')
+        if not force and manifest.get(fmt) == current and os.path.exists(path):
+            continue
+        write, mode = WRITERS[fmt]
+        _write_atomic(path, mode, lambda f: write(iter_rows(metadata), f))
+        manifest[fmt] = current
+        written.append(path)
+    if written:
+        _write_atomic(os.path.join(output_dir, MANIFEST), 'w', lambda f: json.dump(manifest, f, indent=2, sort_keys=True))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the data dictionary of the database models")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--force', action='store_true', help="rewrite even if the schema is unchanged")
+    args = parser.parse_args()
+    written = generate(args.output_dir, args.format, force=args.force)
+    for path in written:
+        print(f"Data dictionary generated at {path}")
+    if not written:
+        print("Data dictionary is up to date")
+
+
+if __name__ == '__main__':
+    main()
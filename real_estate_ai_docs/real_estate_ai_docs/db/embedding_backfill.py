@@ -0,0 +1,171 @@
+"""Incremental backfill of property embeddings.
+
+Walks ``properties`` in primary-key order, one batch at a time. For each
+property it builds the text the embedding is computed from (title,
+description and ``PropertyFeature`` rows) and hashes it. Properties whose hash
+matches ``Embedding.content_hash`` are skipped. The rest are sent to the
+embedder in one call per batch and bulk-upserted with a single
+``executemany``.
+
+Progress is checkpointed to a JSON file after every committed batch, so a
+crashed run resumes where it stopped. Re-running a finished batch is harmless
+because its hashes now match. Run from the command line with::
+
+    python -m db.embedding_backfill --database-url sqlite:///real_estate.db --checkpoint backfill.json
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from .bulk import upsert_rows
+from .models import EMBEDDING_DIMENSIONS, Embedding, Property, PropertyFeature
+
+_TOKEN = re.compile(r'\w+')
+
+
+def property_document(title, description, features):
+    """The text a property's embedding is computed from."""
+    parts = [title or '', description or '']
+    if features:
+        parts.append('Features: ' + ', '.join(sorted(features)))
+    return '\n'.join(parts)
+
+
+def content_hash(document):
+    return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+
+class HashingEmbedder:
+    """Deterministic local stand-in for the embedding service.
+
+    Hashes word tokens into signed buckets and L2-normalises the result, so
+    documents sharing words get similar vectors. Any callable mapping a list of
+    strings to an ``(n, EMBEDDING_DIMENSIONS)`` array can be used instead.
+    """
+
+    def __init__(self, dimensions=EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def _load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as fh:
+            return json.load(fh)
+    return {'last_property_id': 0, 'processed': 0, 'embedded': 0, 'skipped': 0}
+
+
+def _save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as fh:
+        json.dump(state, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def run_backfill(session, embedder=None, batch_size=256, checkpoint_path=None, force=False, progress=None):
+    """Embed every property whose content changed since its embedding was computed.
+
+    Resumes from ``checkpoint_path`` when it exists and removes it once the
+    whole table has been processed. ``force`` re-embeds unchanged properties
+    too. ``progress`` is called with the running state after each batch.
+    Returns the final state: counts of processed, embedded and skipped rows.
+    """
+    embedder = embedder or HashingEmbedder()
+    state = _load_checkpoint(checkpoint_path)
+    started = time.perf_counter()
+    while True:
+        properties = session.execute(
+            select(Property.id, Property.title, Property.description)
+            .where(Property.id > state['last_property_id'])
+            .order_by(Property.id)
+            .limit(batch_size)
+        ).all()
+        if not properties:
+            break
+        ids = [p.id for p in properties]
+        features = defaultdict(list)
+        for property_id, feature in session.execute(
+                select(PropertyFeature.property_id, PropertyFeature.feature).where(PropertyFeature.property_id.in_(ids))):
+            features[property_id].append(feature)
+        stored = dict(session.execute(
+            select(Embedding.property_id, Embedding.content_hash).where(Embedding.property_id.in_(ids))).all())
+
+        changed = []
+        for p in properties:
+            document = property_document(p.title, p.description, features[p.id])
+            digest = content_hash(document)
+            if force or stored.get(p.id) != digest:
+                changed.append((p.id, document, digest))
+
+        if changed:
+            vectors = np.asarray(embedder([document for _, document, _ in changed]), dtype=np.float32)
+            if vectors.shape != (len(changed), EMBEDDING_DIMENSIONS):
+                raise ValueError(f"Embedder returned shape {vectors.shape}, expected ({len(changed)}, {EMBEDDING_DIMENSIONS})")
+            now = datetime.utcnow()
+            upsert_rows(session, Embedding.__table__, [
+                {'property_id': property_id, 'vector': vector, 'content_hash': digest, 'created_at': now, 'updated_at': now}
+                for (property_id, _, digest), vector in zip(changed, vectors)
+            ], key_columns=['property_id'], update_columns=['vector', 'content_hash', 'updated_at'])
+        session.commit()
+
+        state['last_property_id'] = ids[-1]
+        state['processed'] += len(ids)
+        state['embedded'] += len(changed)
+        state['skipped'] += len(ids) - len(changed)
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, state)
+        if progress:
+            progress(dict(state, rows_per_second=state['processed'] / max(time.perf_counter() - started, 1e-9)))
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+    return state
+
+
+def _load_embedder(spec):
+    """Resolve ``module:attribute`` to an embedder instance or callable."""
+    module_name, _, attribute = spec.partition(':')
+    embedder = getattr(importlib.import_module(module_name), attribute)
+    return embedder() if isinstance(embedder, type) else embedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill property embeddings for changed properties")
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--checkpoint', help="JSON file used to resume an interrupted run")
+    parser.add_argument('--embedder', help="module:callable producing embeddings (default: local hashing stub)")
+    parser.add_argument('--force', action='store_true', help="re-embed properties even if unchanged")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    embedder = _load_embedder(args.embedder) if args.embedder else None
+    with Session(engine) as session:
+        state = run_backfill(session, embedder, batch_size=args.batch_size, checkpoint_path=args.checkpoint,
+                             force=args.force, progress=lambda s: print(
+                                 f"up to property {s['last_property_id']}: {s['embedded']} embedded, "
+                                 f"{s['skipped']} unchanged ({s['rows_per_second']:.0f} rows/s)"))
+    print(f"Done: {state['processed']} properties, {state['embedded']} embedded, {state['skipped']} unchanged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Memory-mapped embedding matrix shared by all workers on a host.
+
+:func:`export_embedding_store` streams the ``embeddings`` table into a flat file
+and atomically renames it into place. Each worker opens it with
+:meth:`EmbeddingStore.open`, which maps the file read-only. The OS page cache
+then holds a single copy of the matrix however many processes use it, and
+opening costs no parsing and no heap.
+
+File layout (little-endian, every section 64-byte aligned)::
+
+    header   magic, version, dimensions, dtype, count, section offsets
+    ids      int64[count]       property IDs, ascending (the offset table:
+                                row i of the matrix belongs to ids[i])
+    norms    float32[count]     row L2 norms, so cosine search needs no pass
+    matrix   dtype[count, dims] embedding vectors
+"""
+import os
+import struct
+
+import numpy as np
+
+from .models import Embedding
+from .vector_search import ExactIndex, count_embeddings, fill_embedding_matrix
+
+MAGIC = b'REEMBED\x00'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sII8sQQQQ')
+_ALIGN = 64
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _layout(count, dimensions, dtype):
+    ids_offset = _align(_HEADER.size)
+    norms_offset = _align(ids_offset + 8 * count)
+    matrix_offset = _align(norms_offset + 4 * count)
+    size = matrix_offset + count * dimensions * dtype.itemsize
+    return ids_offset, norms_offset, matrix_offset, size
+
+
+def write_embedding_store(path, ids, matrix, dtype='float32'):
+    """Write ``ids``/``matrix`` (any row order) to ``path`` atomically."""
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    with _StoreWriter(path, len(ids), np.asarray(matrix).shape[1], dtype) as writer:
+        writer.ids[:] = ids[order]
+        writer.matrix[:] = np.asarray(matrix)[order]
+        writer.count = len(ids)
+
+
+def export_embedding_store(session, path, dtype='float32', batch_size=1000):
+    """Stream every row of ``embeddings`` into a store file at ``path``.
+
+    Rows are copied straight from the result cursor into the mapped output, so
+    peak memory stays at one batch regardless of table size. Readers with the
+    previous file open keep using it until they reopen. Returns the row count.
+    """
+    count = count_embeddings(session)
+    dimensions = Embedding.__table__.c.vector.type.dimensions
+    with _StoreWriter(path, count, dimensions, dtype) as writer:
+        writer.count = fill_embedding_matrix(session, writer.ids, writer.matrix, batch_size=batch_size)
+    return writer.count
+
+
+class _StoreWriter:
+    """Preallocates a temp file, maps it for writing and renames it over ``path`` on success."""
+
+    def __init__(self, path, capacity, dimensions, dtype):
+        self.path = path
+        self.capacity = capacity
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.count = 0
+        self.tmp_path = f"{path}.tmp.{os.getpid()}"
+
+    def __enter__(self):
+        offsets = _layout(self.capacity, self.dimensions, self.dtype)
+        self._offsets = offsets
+        with open(self.tmp_path, 'wb') as fh:
+            fh.truncate(offsets[3])
+        self._mmap = np.memmap(self.tmp_path, dtype=np.uint8, mode='r+') if offsets[3] else None
+        self.ids = self._section(offsets[0], np.int64, (self.capacity,))
+        self.matrix = self._section(offsets[2], self.dtype, (self.capacity, self.dimensions))
+        return self
+
+    def _section(self, offset, dtype, shape):
+        if self._mmap is None:
+            return np.empty(shape, dtype=dtype)
+        return np.ndarray(shape, dtype=dtype, buffer=self._mmap, offset=offset)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                n = self.count
+                norms = self._section(self._offsets[1], np.float32, (self.capacity,))
+                for start in range(0, n, 4096):
+                    block = self.matrix[start:min(n, start + 4096)].astype(np.float32)
+                    norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+                if self._mmap is not None:
+                    self._mmap.flush()
+                    del self.ids, self.matrix, norms
+                    self._mmap = None
+                with open(self.tmp_path, 'r+b') as fh:
+                    fh.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.dimensions,
+                                          self.dtype.str.encode('ascii'), n, *self._offsets[:3]))
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                os.replace(self.tmp_path, self.path)
+        finally:
+            self._mmap = None
+            if os.path.exists(self.tmp_path):
+                os.unlink(self.tmp_path)
+        return False
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped view of an embedding store file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            header = fh.read(_HEADER.size)
+            self._stat = os.fstat(fh.fileno())
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is not an embedding store (truncated header)")
+        magic, version, dimensions, dtype, count, ids_offset, norms_offset, matrix_offset = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an embedding store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store version {version}")
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype.rstrip(b'\x00').decode('ascii'))
+        self.ids = self._map(ids_offset, np.int64, (count,))
+        self.norms = self._map(norms_offset, np.float32, (count,))
+        self.matrix = self._map(matrix_offset, self.dtype, (count, dimensions))
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def _map(self, offset, dtype, shape):
+        if not shape[0]:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_stale(self):
+        """True once a newer export has been renamed over ``path``."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def reopen_if_stale(self):
+        """Return a store mapping the current file, or ``self`` if nothing changed."""
+        return EmbeddingStore(self.path) if self.is_stale() else self
+
+    def get(self, property_id):
+        """Return the vector for ``property_id`` (a view into the mapping) or ``None``."""
+        row = np.searchsorted(self.ids, property_id)
+        if row < len(self.ids) and self.ids[row] == property_id:
+            return self.matrix[row]
+        return None
+
+    def to_index(self, metric='cosine'):
+        """Exact search index over the mapped matrix, without copying it."""
+        return ExactIndex(self.ids, self.matrix, metric=metric, norms=self.norms)
@@ -0,0 +1,268 @@
+"""Entity relationship diagrams rendered straight from ``Base.metadata``.
+
+    python -m db.erd --output-dir db/erd --format svg mmd dot
+
+The eralchemy2/pygraphviz route reflects a live engine and lays the whole
+schema out through Graphviz on every run. This module reads the mapped tables
+instead and writes the diagram text itself, with no engine and no
+subprocess:
+
+* DOT (``.dot``), for anyone who still wants a Graphviz layout;
+* Mermaid ``erDiagram`` (``.mmd``), which GitHub and the docs site render;
+* SVG (``.svg``) with a simple deterministic grid layout, tables in
+  dependency order and one straight edge per foreign key.
+
+Besides the full schema (``erd.*``), one sub-diagram per domain in
+:data:`DOMAINS` is written (``erd_crm.*``, ``erd_listings.*`` ...). Tables a
+domain references but does not own appear as dashed stubs. Each diagram is
+keyed by a hash of the definitions of the tables it shows. Diagrams whose hash
+matches ``.erd_manifest.json`` are not rewritten, so changing a chat column
+only re-renders ``erd_chat`` and ``erd``.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+from xml.sax.saxutils import escape
+
+from .models import Base
+
+DOMAINS = {
+    'crm': ('users', 'leads', 'lead_notes'),
+    'listings': ('properties', 'property_features', 'property_images', 'embeddings'),
+    'proposals': ('proposals', 'proposal_sections'),
+    'chat': ('chat_sessions', 'chat_logs'),
+    'analytics': ('lead_matches', 'property_valuations', 'market_segment_stats', 'investment_analyses'),
+}
+FORMATS = ('svg', 'mmd', 'dot')
+MANIFEST = '.erd_manifest.json'
+DEFAULT_OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _foreign_keys(table):
+    """``[(column, referenced_table_name)]`` of ``table``."""
+    return [(column, fk.column.table.name) for column in table.columns for fk in column.foreign_keys]
+
+
+def select_tables(names=None, metadata=Base.metadata):
+    """``(tables, stubs)``: the named tables in dependency order, and names of tables they reference but omit."""
+    tables = [t for t in metadata.sorted_tables if names is None or t.name in names]
+    shown = {t.name for t in tables}
+    stubs = sorted({target for t in tables for _, target in _foreign_keys(t)} - shown)
+    return tables, stubs
+
+
+def diagram_hash(tables, stubs):
+    digest = hashlib.sha256()
+    for table in tables:
+        for column in table.columns:
+            digest.update(json.dumps([table.name, column.name, str(column.type), column.primary_key, column.nullable,
+                                      sorted(fk.target_fullname for fk in column.foreign_keys)]).encode())
+    digest.update(json.dumps(stubs).encode())
+    return digest.hexdigest()
+
+
+def _markers(column):
+    return [m for m, on in (('PK', column.primary_key), ('FK', column.foreign_keys)) if on]
+
+
+# DOT
+
+def to_dot(tables, stubs=(), title='erd'):
+    lines = [f'digraph "{title}" {{', '  graph [rankdir=LR, fontname="Helvetica"];',
+             '  node [shape=plaintext, fontname="Helvetica", fontsize=10];', '  edge [fontsize=9, arrowhead=crow];']
+    for table in tables:
+        rows = ''.join(
+            f'<tr><td align="left">{escape(" ".join(_markers(c)))}</td><td align="left">{escape(c.name)}</td>'
+            f'<td align="left">{escape(str(c.type))}</td></tr>' for c in table.columns)
+        lines.append(f'  "{table.name}" [label=<<table border="0" cellborder="1" cellspacing="0">'
+                     f'<tr><td colspan="3" bgcolor="#dbe7f3"><b>{escape(table.name)}</b></td></tr>{rows}</table>>];')
+    for name in stubs:
+        lines.append(f'  "{name}" [shape=box, style=dashed, label="{name}"];')
+    for table in tables:
+        for column, target in _foreign_keys(table):
+            lines.append(f'  "{target}" -> "{table.name}" [label="{column.name}"];')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Mermaid
+
+def _mermaid_type(column):
+    return ''.join(c if c.isalnum() else '_' for c in str(column.type)).strip('_')
+
+
+def to_mermaid(tables, stubs=()):
+    lines = ['erDiagram']
+    for table in tables:
+        lines.append(f'    {table.name} {{')
+        for column in table.columns:
+            keys = ', '.join(_markers(column))
+            comment = ' "{}"'.format(column.comment.replace('"', "'")) if column.comment else ''
+            lines.append(f'        {_mermaid_type(column)} {column.name}{" " + keys if keys else ""}{comment}')
+        lines.append('    }')
+    for name in stubs:
+        lines.append(f'    {name} {{')
+        lines.append('    }')
+    for table in tables:
+        for column, target in _foreign_keys(table):
+            # One-to-one when the foreign key alone is the primary key (embeddings.property_id)
+            one = column.primary_key and len(table.primary_key.columns) == 1
+            parent = '|o' if column.nullable else '||'
+            lines.append(f'    {target} {parent}--{"o|" if one else "o{"} {table.name} : "{column.name}"')
+    return '\n'.join(lines) + '\n'
+
+
+# SVG
+
+_CHAR_WIDTH = 7
+_LINE_HEIGHT = 18
+_HEADER_HEIGHT = 24
+_PADDING = 10
+_GAP_X = 70
+_GAP_Y = 50
+
+
+def _box_lines(table):
+    return [(f'{"/".join(_markers(c)):<5} {c.name}', str(c.type)) for c in table.columns]
+
+
+def _layout(tables, stubs):
+    """``{name: (x, y, width, height)}`` on a grid roughly as wide as it is tall."""
+    boxes = []
+    for table in tables:
+        lines = _box_lines(table)
+        name_width = max(len(n) for n, _ in lines)
+        type_width = max(len(t) for _, t in lines)
+        width = max(len(table.name) + 4, name_width + type_width + 3) * _CHAR_WIDTH + 2 * _PADDING
+        boxes.append((table.name, width, _HEADER_HEIGHT + len(lines) * _LINE_HEIGHT + _PADDING))
+    boxes += [(name, (len(name) + 4) * _CHAR_WIDTH + 2 * _PADDING, _HEADER_HEIGHT) for name in stubs]
+    per_row = max(1, math.ceil(math.sqrt(len(boxes))))
+    layout = {}
+    y = _GAP_Y / 2
+    for start in range(0, len(boxes), per_row):
+        row = boxes[start:start + per_row]
+        x = _GAP_X / 2
+        for name, width, height in row:
+            layout[name] = (x, y, width, height)
+            x += width + _GAP_X
+        y += max(height for _, _, height in row) + _GAP_Y
+    return layout
+
+
+def _centre(box):
+    x, y, width, height = box
+    return x + width / 2, y + height / 2
+
+
+def _border_point(box, towards):
+    """Where the segment from the centre of ``box`` to ``towards`` leaves the box."""
+    _, _, width, height = box
+    cx, cy = _centre(box)
+    dx, dy = towards[0] - cx, towards[1] - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    scale = min(width / 2 / abs(dx) if dx else math.inf, height / 2 / abs(dy) if dy else math.inf)
+    return cx + dx * scale, cy + dy * scale
+
+
+def to_svg(tables, stubs=()):
+    layout = _layout(tables, stubs)
+    width = max(x + w for x, _, w, _ in layout.values()) + _GAP_X / 2
+    height = max(y + h for _, y, _, h in layout.values()) + _GAP_Y / 2
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+           f'font-family="Helvetica, Arial, sans-serif" font-size="12">',
+           '<defs><marker id="many" markerWidth="10" markerHeight="10" refX="9" refY="5" orient="auto">'
+           '<path d="M0,0 L9,5 L0,10" fill="none" stroke="#555"/></marker></defs>']
+    for table in tables:
+        for column, target in _foreign_keys(table):
+            child, parent = layout[table.name], layout[target]
+            x1, y1 = _border_point(parent, _centre(child))
+            x2, y2 = _border_point(child, _centre(parent))
+            out.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="#555" '
+                       f'marker-end="url(#many)"><title>{escape(table.name)}.{escape(column.name)}</title></line>')
+    for table in tables:
+        x, y, w, h = layout[table.name]
+        out.append(f'<g><rect x="{x}" y="{y}" width="{w}" height="{h}" fill="#fff" stroke="#333"/>'
+                   f'<rect x="{x}" y="{y}" width="{w}" height="{_HEADER_HEIGHT}" fill="#dbe7f3" stroke="#333"/>'
+                   f'<text x="{x + _PADDING}" y="{y + 16}" font-weight="bold">{escape(table.name)}</text>')
+        type_x = x + w - _PADDING
+        for i, (name, type_name) in enumerate(_box_lines(table)):
+            line_y = y + _HEADER_HEIGHT + (i + 1) * _LINE_HEIGHT - 4
+            out.append(f'<text x="{x + _PADDING}" y="{line_y}" xml:space="preserve" font-family="monospace">'
+                       f'{escape(name)}</text><text x="{type_x}" y="{line_y}" text-anchor="end" fill="#666" '
+                       f'font-family="monospace">{escape(type_name)}</text>')
+        out.append('</g>')
+    for name in stubs:
+        x, y, w, h = layout[name]
+        out.append(f'<g><rect x="{x}" y="{y}" width="{w}" height="{h}" fill="#fafafa" stroke="#999" '
+                   f'stroke-dasharray="4 3"/><text x="{x + _PADDING}" y="{y + 16}" fill="#666">{escape(name)}</text></g>')
+    out.append('</svg>')
+    return '\n'.join(out) + '\n'
+
+
+RENDERERS = {'svg': to_svg, 'mmd': to_mermaid, 'dot': to_dot}
+
+
+def render(fmt, names=None, metadata=Base.metadata):
+    """Diagram text of the named tables (all by default) in ``fmt``."""
+    return RENDERERS[fmt](*select_tables(names, metadata))
+
+
+def diagrams(metadata=Base.metadata):
+    """``{diagram name: table names}``: the full schema plus one per domain (and 'other' for unassigned tables)."""
+    result = {'erd': None}
+    result.update({f'erd_{domain}': names for domain, names in DOMAINS.items()})
+    assigned = {name for names in DOMAINS.values() for name in names}
+    other = tuple(name for name in metadata.tables if name not in assigned)
+    if other:
+        result['erd_other'] = other
+    return result
+
+
+def generate(output_dir=DEFAULT_OUTPUT_DIR, formats=FORMATS, metadata=Base.metadata, force=False):
+    """Write every diagram whose tables changed since the last run; returns the paths written."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    written = []
+    for name, tables in diagrams(metadata).items():
+        selected = select_tables(tables, metadata)
+        current = diagram_hash(*selected)
+        for fmt in formats:
+            path = os.path.join(output_dir, f'{name}.{fmt}')
+            key = f'{name}.{fmt}'
+            if not force and manifest.get(key) == current and os.path.exists(path):
+                continue
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(RENDERERS[fmt](*selected))
+            os.replace(path + '.tmp', path)
+            manifest[key] = current
+            written.append(path)
+    if written:
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render ERDs of the database models as SVG, Mermaid and DOT")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--force', action='store_true', help="rewrite even if the tables are unchanged")
+    args = parser.parse_args()
+    written = generate(args.output_dir, args.format, force=args.force)
+    for path in written:
+        print(f"ERD generated at {path}")
+    if not written:
+        print("ERDs are up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""Full-text search over property, lead, note and chat message text.
+
+``LIKE '%word%'`` on the ``Text`` columns scans every row, and it matches
+neither inflections nor Arabic spelling variants. :func:`install` adds a real
+full-text index for each source in :data:`SOURCES`, and the index is kept in
+sync by the database itself:
+
+* SQLite: an FTS5 table per source (``fts_properties``, ``fts_chat_logs`` ...).
+  Rows are keyed by the source ``id`` and maintained by ``AFTER INSERT/UPDATE/
+  DELETE`` triggers, so Core bulk writes (``ChatLogWriter``,
+  ``listing_import``) are covered too. Messages moved to monthly archives by
+  ``ChatLogStore.compact`` leave the index with them.
+  The triggers are plain SQL (Arabic folding is a chain of ``replace()``
+  calls), so any connection can write to the indexed tables, including
+  engines that never called :func:`install` and the ``sqlite3`` shell;
+* PostgreSQL: a stored generated ``search_vector`` ``tsvector`` column with a
+  GIN index. Rows with a ``language`` column are parsed with the matching
+  ``english``/``french``/``arabic`` text search configuration (``arabic``
+  needs PostgreSQL 12+).
+
+:func:`normalize_text` handles the multilingual part of queries on SQLite. It
+case-folds, strips Latin accents and Arabic diacritics, tatweel and hamza
+carriers, unifies alef/ya/ta marbuta spellings and Arabic-Indic digits, and
+drops the French elisions (``l'``, ``d'``, ``qu'`` ...) and the Arabic definite
+article and its attached prepositions. The indexed side gets the same result
+from SQL: the triggers apply the Arabic letter folding, and the ``porter
+unicode61 remove_diacritics 2`` tokenizer folds case and Latin accents, splits
+elisions at the apostrophe and stems. The article cannot be split off in SQL,
+so :func:`fts_query` matches each Arabic query term with and without it.
+
+:func:`search` returns ``(id, score)`` pairs, best first. On SQLite the score
+is BM25 (``-bm25()``, with property titles weighted over descriptions). On
+PostgreSQL it is ``ts_rank_cd``, the closest built-in. These scores are not
+comparable with cosine similarities, so :func:`reciprocal_rank_fusion` combines
+rankings by position, and :func:`hybrid_property_search` fuses the text
+ranking with a :class:`db.hybrid_search.HybridSearcher` vector ranking.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from sqlalchemy import text
+
+Source = namedtuple('Source', ['table', 'columns', 'language_column', 'weights'])
+
+SOURCES = {
+    'property': Source('properties', ('title', 'description'), None, (4.0, 1.0)),
+    'lead': Source('leads', ('requirements',), None, (1.0,)),
+    'lead_note': Source('lead_notes', ('content',), None, (1.0,)),
+    'chat_message': Source('chat_logs', ('content',), 'language', (1.0,)),
+}
+
+# Proposal.language / ChatMessage.language -> PostgreSQL text search configuration
+PG_CONFIGS = {'en': 'english', 'fr': 'french', 'ar': 'arabic'}
+_PG_DEFAULT_CONFIG = 'english'
+_PG_WEIGHTS = 'ABCD'
+
+# Arabic-Indic digits, ta marbuta, alef maksura, alef wasla, tatweel, typographic apostrophe
+_LETTERS = str.maketrans({'ة': 'ه', 'ى': 'ي', 'ٱ': 'ا', 'ـ': None, '’': "'"})
+_LETTERS.update(str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789'))
+_FRENCH_ELISION = re.compile(r"(?<!\w)(?:qu|[cdjlmnst])'(?=\w)")
+_ARABIC_ARTICLE = re.compile(r'(?<!\w)(?:وال|فال|بال|كال|لل|ال)(?=\w\w)')
+_TOKEN = re.compile(r'\w+')
+_ARABIC = re.compile(r'[\u0600-\u06ff]')
+_ARABIC_PREFIXES = ('ال', 'وال', 'فال', 'بال', 'كال', 'لل')
+
+# The letter folding of normalize_text as (codepoint, replacement) pairs for SQL replace(): harakat and
+# superscript alef, tatweel, hamza carriers, alef wasla, ta marbuta, alef maksura, apostrophe, digits
+_SQL_FOLDS = ([(c, '') for c in list(range(0x064B, 0x0660)) + [0x0670, 0x0640]]
+              + [(c, 'ا') for c in (0x0622, 0x0623, 0x0625, 0x0671)]
+              + [(0x0624, 'و'), (0x0626, 'ي'), (0x0629, 'ه'), (0x0649, 'ي'), (0x2019, "'")]
+              + [(0x0660 + d, str(d)) for d in range(10)] + [(0x06F0 + d, str(d)) for d in range(10)])
+_FOLD_STAGE = 20
+
+
+def normalize_text(value, language=None):
+    """Language-folded form of query text (the triggers fold indexed text the same way); ``None`` stays ``None``."""
+    if value is None:
+        return None
+    # NFKD splits accents and hamza/madda from their base letters; dropping the marks folds them away
+    decomposed = unicodedata.normalize('NFKD', value.casefold())
+    folded = ''.join(c for c in decomposed if not unicodedata.combining(c)).translate(_LETTERS)
+    if language in (None, 'fr'):
+        folded = _FRENCH_ELISION.sub('', folded)
+    if language in (None, 'ar'):
+        folded = _ARABIC_ARTICLE.sub('', folded)
+    return folded
+
+
+def _sql_fold(expression, folds):
+    for codepoint, replacement in folds:
+        replacement = f"char({ord(replacement)})" if replacement else "''"
+        expression = f"replace({expression}, char({codepoint}), {replacement})"
+    return expression
+
+
+def _folded_select(source, rows_sql):
+    """SELECT of ``id``, the folded text columns and the language of the rows selected by ``rows_sql``.
+
+    SQLite's parser overflows at about 30 nested calls, so the ``replace()``
+    chain is split over nested sub-selects of :data:`_FOLD_STAGE` calls each.
+    """
+    spec = SOURCES[source]
+    language = f', {spec.language_column}' if spec.language_column else ''
+    select = rows_sql
+    for start in range(0, len(_SQL_FOLDS), _FOLD_STAGE):
+        folds = _SQL_FOLDS[start:start + _FOLD_STAGE]
+        columns = ', '.join(f'{_sql_fold(column, folds)} AS {column}' for column in spec.columns)
+        select = f"SELECT id, {columns}{language} FROM ({select})"
+    return select
+
+
+def fts_table(source):
+    return f"fts_{SOURCES[source].table}"
+
+
+# SQLite
+
+def _sqlite_ddl(source):
+    spec = SOURCES[source]
+    table = fts_table(source)
+    columns = list(spec.columns) + ([f'{spec.language_column} UNINDEXED'] if spec.language_column else [])
+    create = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({', '.join(columns)}, "
+              f"tokenize = 'porter unicode61 remove_diacritics 2')")
+
+    raw = ('id',) + spec.columns + ((spec.language_column,) if spec.language_column else ())
+    names = ', '.join(('rowid',) + raw[1:])
+    new_row = 'SELECT ' + ', '.join(f'new.{column} AS {column}' for column in raw)
+    insert = f"INSERT INTO {table}({names}) {_folded_select(source, new_row)};"
+    remove = f"DELETE FROM {table} WHERE rowid = old.id;"
+    watched = ', '.join(spec.columns + ((spec.language_column,) if spec.language_column else ()))
+    # Dropped and re-created on every install, so earlier trigger definitions are replaced
+    triggers = [
+        f"DROP TRIGGER IF EXISTS {table}_ai",
+        f"DROP TRIGGER IF EXISTS {table}_ad",
+        f"DROP TRIGGER IF EXISTS {table}_au",
+        f"CREATE TRIGGER {table}_ai AFTER INSERT ON {spec.table} BEGIN {insert} END",
+        f"CREATE TRIGGER {table}_ad AFTER DELETE ON {spec.table} BEGIN {remove} END",
+        f"CREATE TRIGGER {table}_au AFTER UPDATE OF {watched} ON {spec.table} "
+        f"BEGIN {remove} {insert} END",
+    ]
+    rows = f"SELECT {', '.join(raw)} FROM {spec.table}"
+    backfill = f"INSERT INTO {table}({names}) {_folded_select(source, rows)}"
+    return create, triggers, backfill
+
+
+def _sqlite_install(connection, sources):
+    created = []
+    for source in sources:
+        table = fts_table(source)
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': table}).first()
+        create, triggers, backfill = _sqlite_ddl(source)
+        connection.exec_driver_sql(create)
+        for trigger in triggers:
+            connection.exec_driver_sql(trigger)
+        if not exists:
+            connection.exec_driver_sql(backfill)
+            created.append(source)
+    return created
+
+
+def rebuild(engine, source):
+    """Re-index every row of ``source`` (after changing :func:`normalize_text`, for example)."""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DELETE FROM {fts_table(source)}")
+        connection.exec_driver_sql(_sqlite_ddl(source)[2])
+
+
+# PostgreSQL
+
+def _pg_vector(spec):
+    def vector(config):
+        parts = [f"setweight(to_tsvector('{config}'::regconfig, coalesce({column}, '')), '{weight}')"
+                 for column, weight in zip(spec.columns, _PG_WEIGHTS)]
+        return ' || '.join(parts)
+
+    if not spec.language_column:
+        return vector(_PG_DEFAULT_CONFIG)
+    branches = ' '.join(f"WHEN '{code}' THEN {vector(config)}" for code, config in PG_CONFIGS.items())
+    return f"CASE {spec.language_column} {branches} ELSE {vector(_PG_DEFAULT_CONFIG)} END"
+
+
+def _pg_install(connection, sources):
+    for source in sources:
+        spec = SOURCES[source]
+        connection.exec_driver_sql(
+            f"ALTER TABLE {spec.table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({_pg_vector(spec)}) STORED")
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{spec.table}_search_vector ON {spec.table} USING gin (search_vector)")
+    return list(sources)
+
+
+def install(engine, sources=None):
+    """Create (and on first install, fill) the full-text index of each source; returns the sources set up.
+
+    Re-running it is cheap and replaces the triggers with the current definitions.
+    """
+    sources = list(sources or SOURCES)
+    dialect = engine.dialect.name
+    if dialect == 'sqlite':
+        with engine.begin() as connection:
+            return _sqlite_install(connection, sources)
+    if dialect == 'postgresql':
+        with engine.begin() as connection:
+            return _pg_install(connection, sources)
+    raise ValueError(f"Full-text search is not implemented for {dialect}")
+
+
+# Querying
+
+def _term(token):
+    if not _ARABIC.search(token) or len(token) < 2:
+        return f'"{token}"'
+    # The index keeps the article attached, so look for the bare word and each prefixed form
+    return '(' + ' OR '.join(f'"{prefix}{token}"' for prefix in ('',) + _ARABIC_PREFIXES) + ')'
+
+
+def fts_query(value, match='all', language=None):
+    """FTS5 MATCH expression for free text: normalized, every token quoted, ``None`` if nothing is left."""
+    tokens = _TOKEN.findall(normalize_text(value, language) or '')
+    if not tokens:
+        return None
+    return (' OR ' if match == 'any' else ' ').join(_term(token) for token in tokens)
+
+
+def search(session, source, query, limit=20, language=None, match='all'):
+    """``[(id, score), ...]`` of rows of ``source`` matching ``query``, best first.
+
+    ``match='all'`` requires every term, ``'any'`` ranks rows with any of them.
+    ``language`` restricts sources that have a language column and picks the
+    PostgreSQL configuration for parsing the query.
+    """
+    spec = SOURCES[source]
+    dialect = session.get_bind().dialect.name
+    params = {'limit': limit}
+    if dialect == 'sqlite':
+        expression = fts_query(query, match, language)
+        if expression is None:
+            return []
+        table = fts_table(source)
+        where = f"{table} MATCH :query"
+        if language and spec.language_column:
+            where += f" AND {spec.language_column} = :language"
+            params['language'] = language
+        weights = ', '.join(str(w) for w in spec.weights)
+        stmt = text(f"SELECT rowid, -bm25({table}, {weights}) AS score FROM {table} "
+                    f"WHERE {where} ORDER BY bm25({table}, {weights}) LIMIT :limit")
+        params['query'] = expression
+    elif dialect == 'postgresql':
+        tokens = _TOKEN.findall(query or '')
+        if not tokens:
+            return []
+        configs = [PG_CONFIGS[language]] if language in PG_CONFIGS else (
+            list(PG_CONFIGS.values()) if spec.language_column else [_PG_DEFAULT_CONFIG])
+        tsquery = ' || '.join(f"websearch_to_tsquery('{config}'::regconfig, :query)" for config in configs)
+        where = "search_vector @@ q.query"
+        if language and spec.language_column:
+            where += f" AND {spec.language_column} = :language"
+            params['language'] = language
+        stmt = text(f"SELECT id, ts_rank_cd(search_vector, q.query) AS score FROM {spec.table}, "
+                    f"(SELECT {tsquery} AS query) AS q WHERE {where} ORDER BY score DESC, id LIMIT :limit")
+        params['query'] = ' or '.join(tokens) if match == 'any' else query
+    else:
+        raise ValueError(f"Full-text search is not implemented for {dialect}")
+    return [(row[0], float(row[1])) for row in session.execute(stmt, params)]
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None, limit=None):
+    """Fuse ``[(id, score), ...]`` rankings (best first) by ``sum(weight / (k + rank))``; best first."""
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, (item, _) in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank)
+    ranked = sorted(fused.items(), key=lambda pair: (-pair[1], pair[0]))
+    return ranked[:limit] if limit is not None else ranked
+
+
+def hybrid_property_search(session, query, query_vector, searcher, k=10, filters=None, fetch=50,
+                           text_weight=1.0, vector_weight=1.0):
+    """Properties ranked by fusing BM25 text matches with :class:`~db.hybrid_search.HybridSearcher` results.
+
+    Text matches are held to ``filters`` through the searcher's filter index;
+    with filters set, a text match without an embedding row cannot be checked
+    and is left out.
+    """
+    vector_hits = searcher.search(query_vector, fetch, filters) if query_vector is not None else []
+    text_hits = search(session, 'property', query, limit=fetch, match='any')
+    if filters and text_hits:
+        rows = searcher.vector_index.rows_for([pid for pid, _ in text_hits])
+        passed = rows >= 0
+        passed[passed] = searcher.filter_index.matches(rows[passed], filters)
+        text_hits = [hit for hit, keep in zip(text_hits, passed) if keep]
+    return reciprocal_rank_fusion([text_hits, vector_hits], weights=[text_weight, vector_weight], limit=k)
@@ -0,0 +1,273 @@
+"""Grid index over property coordinates for radius, bounding-box and nearest queries.
+
+Without a spatial structure, "within 2 km of Dubai Marina metro" computes the
+haversine distance to every listing. :class:`GeoIndex` buckets properties into
+a uniform latitude/longitude grid (about ``cell_km`` on a side at the
+reference latitude), so a query only computes exact distances for the points
+in the handful of cells its search area overlaps:
+
+* :meth:`GeoIndex.within_radius` - IDs and distances within ``radius_km``,
+  nearest first;
+* :meth:`GeoIndex.within_bbox` - IDs inside a latitude/longitude box;
+* :meth:`GeoIndex.nearest` - the ``k`` nearest IDs, by widening the radius
+  until it holds ``k`` points.
+
+Each query accepts ``candidates``, an array of property IDs already selected
+by other filters. :class:`db.hybrid_search.PropertyFilterIndex` also accepts a
+``near`` filter backed by this index. Updates are incremental: :meth:`upsert`
+and :meth:`delete` move single points between cells, :meth:`sync` applies
+``Property.updated_at`` changes since the last sync, and :meth:`listen`
+follows ORM writes in-process. The grid does not wrap at the antimeridian.
+"""
+import math
+
+import numpy as np
+from sqlalchemy import event, select
+
+from .models import Property
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; broadcasts over arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _Cell:
+    """Growable block of the points in one grid cell."""
+
+    def __init__(self, capacity=8):
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.coords = np.empty((capacity, 2), dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, ids, coords):
+        cell = cls(max(8, len(ids)))
+        cell.ids[:len(ids)] = ids
+        cell.coords[:len(ids)] = coords
+        cell.size = len(ids)
+        return cell
+
+    def append(self, property_id, lat, lon):
+        if self.size == len(self.ids):
+            capacity = 2 * len(self.ids)
+            self.ids = np.resize(self.ids, capacity)
+            coords = np.empty((capacity, 2), dtype=np.float64)
+            coords[:self.size] = self.coords[:self.size]
+            self.coords = coords
+        self.ids[self.size] = property_id
+        self.coords[self.size] = (lat, lon)
+        self.size += 1
+        return self.size - 1
+
+    def remove(self, position):
+        """Swap-remove the entry at ``position``; returns the ID moved into it, if any."""
+        last = self.size - 1
+        moved = None
+        if position != last:
+            self.ids[position] = self.ids[last]
+            self.coords[position] = self.coords[last]
+            moved = int(self.ids[position])
+        self.size = last
+        return moved
+
+
+class GeoIndex:
+    """Uniform lat/lon grid of property coordinates with incremental updates."""
+
+    def __init__(self, cell_km=1.0, reference_latitude=25.0):
+        self.cell_km = cell_km
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        self.cell_lon = cell_km / (KM_PER_DEGREE * math.cos(math.radians(reference_latitude)))
+        self.watermark = None  # newest Property.updated_at applied by sync()
+        self._cells = {}
+        self._location = {}  # property_id -> (cell key, position)
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._location)
+
+    def __contains__(self, property_id):
+        return property_id in self._location
+
+    @property
+    def n_cells(self):
+        """Number of occupied grid cells."""
+        return len(self._cells)
+
+    def _rows_cols(self, lat, lon):
+        return (np.floor((np.asarray(lat) + 90.0) / self.cell_lat).astype(np.int64),
+                np.floor((np.asarray(lon) + 180.0) / self.cell_lon).astype(np.int64))
+
+    @staticmethod
+    def _key(row, col):
+        return (row << 32) | col
+
+    # Writes
+
+    def build(self, ids, latitudes, longitudes):
+        """Replace the index contents with the given points in one vectorized pass."""
+        ids = np.asarray(ids, dtype=np.int64)
+        coords = np.column_stack([np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)])
+        keep = np.isfinite(coords).all(axis=1)
+        ids, coords = ids[keep], coords[keep]
+        keys = self._key(*self._rows_cols(coords[:, 0], coords[:, 1]))
+        order = np.argsort(keys, kind='stable')
+        ids, coords, keys = ids[order], coords[order], keys[order]
+        boundaries = np.flatnonzero(np.diff(keys)) + 1
+        self._cells = {}
+        self._location = {}
+        for start, end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(keys)]))):
+            key = int(keys[start])
+            self._cells[key] = _Cell.from_arrays(ids[start:end], coords[start:end])
+            self._location.update((int(pid), (key, position)) for position, pid in enumerate(ids[start:end]))
+        return self
+
+    def upsert(self, ids, latitudes, longitudes):
+        """Insert or move points; IDs with missing coordinates are removed."""
+        for property_id, lat, lon in zip(ids, latitudes, longitudes):
+            property_id = int(property_id)
+            if lat is None or lon is None or not (math.isfinite(lat) and math.isfinite(lon)):
+                self.delete([property_id])
+                continue
+            row, col = self._rows_cols(lat, lon)
+            key = self._key(int(row), int(col))
+            current = self._location.get(property_id)
+            if current is not None:
+                if current[0] == key:
+                    self._cells[key].coords[current[1]] = (lat, lon)
+                    continue
+                self.delete([property_id])
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = _Cell()
+            self._location[property_id] = (key, cell.append(property_id, lat, lon))
+
+    def delete(self, ids):
+        removed = 0
+        for property_id in ids:
+            location = self._location.pop(int(property_id), None)
+            if location is None:
+                continue
+            key, position = location
+            cell = self._cells[key]
+            moved = cell.remove(position)
+            if moved is not None:
+                self._location[moved] = (key, position)
+            if not cell.size:
+                del self._cells[key]
+            removed += 1
+        return removed
+
+    # Queries
+
+    def _gather(self, lat_range, lon_range):
+        """IDs and coordinates of every point in cells overlapping the given degree ranges."""
+        (row_lo, row_hi), (col_lo, col_hi) = self._rows_cols(np.array(lat_range), np.array(lon_range))
+        n_cells = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+        if n_cells <= len(self._cells):
+            keys = (self._key(r, c) for r in range(row_lo, row_hi + 1) for c in range(col_lo, col_hi + 1))
+        else:
+            keys = (k for k in self._cells if row_lo <= k >> 32 <= row_hi and col_lo <= k & 0xFFFFFFFF <= col_hi)
+        cells = [self._cells[k] for k in keys if k in self._cells]
+        if not cells:
+            return np.empty(0, dtype=np.int64), np.empty((0, 2))
+        return (np.concatenate([c.ids[:c.size] for c in cells]),
+                np.concatenate([c.coords[:c.size] for c in cells]))
+
+    @staticmethod
+    def _restrict(ids, coords, candidates):
+        if candidates is None:
+            return ids, coords
+        keep = np.isin(ids, np.asarray(candidates, dtype=np.int64))
+        return ids[keep], coords[keep]
+
+    def within_radius(self, lat, lon, radius_km, candidates=None):
+        """``(ids, distances_km)`` of points within ``radius_km`` of ``(lat, lon)``, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        widest = min(89.9, abs(lat) + dlat)
+        dlon = min(180.0, radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest))))
+        ids, coords = self._restrict(*self._gather((lat - dlat, lat + dlat), (lon - dlon, lon + dlon)), candidates)
+        distances = haversine_km(lat, lon, coords[:, 0], coords[:, 1])
+        inside = distances <= radius_km
+        ids, distances = ids[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return ids[order], distances[order]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, candidates=None):
+        """IDs of points inside the box (inclusive), in no particular order."""
+        ids, coords = self._restrict(*self._gather((min_lat, max_lat), (min_lon, max_lon)), candidates)
+        inside = ((coords[:, 0] >= min_lat) & (coords[:, 0] <= max_lat)
+                  & (coords[:, 1] >= min_lon) & (coords[:, 1] <= max_lon))
+        return ids[inside]
+
+    def nearest(self, lat, lon, k=10, candidates=None, max_radius_km=None):
+        """``(ids, distances_km)`` of the ``k`` nearest points, nearest first."""
+        total = len(self) if candidates is None else len(candidates)
+        radius = self.cell_km
+        limit = max_radius_km or math.pi * EARTH_RADIUS_KM
+        while True:
+            ids, distances = self.within_radius(lat, lon, radius, candidates)
+            if len(ids) >= min(k, total) or radius >= limit:
+                return ids[:k], distances[:k]
+            # Widen by the density seen so far, at least doubling
+            radius = min(limit, radius * max(2.0, math.sqrt(k / max(len(ids), 1))))
+
+    # Loading and maintenance
+
+    @classmethod
+    def from_session(cls, session, **options):
+        index = cls(**options)
+        index.sync(session)
+        return index
+
+    def sync(self, session, batch_size=10000):
+        """Apply properties changed since the last sync and drop deleted ones; returns ``(upserted, deleted)``."""
+        stmt = select(Property.id, Property.latitude, Property.longitude, Property.updated_at)
+        if self.watermark is not None:
+            stmt = stmt.where(Property.updated_at >= self.watermark)
+        if not len(self):
+            # First load: build the cells in one vectorized pass rather than point by point
+            rows = session.execute(stmt).all()
+            ids, lats, lons, updated = zip(*rows) if rows else ((), (), (), ())
+            self.build(ids, [np.nan if v is None else v for v in lats], [np.nan if v is None else v for v in lons])
+            upserted = len(rows)
+            watermark = max((u for u in updated if u is not None), default=self.watermark)
+        else:
+            upserted = 0
+            watermark = self.watermark
+            result = session.execute(stmt.execution_options(yield_per=batch_size))
+            for rows in result.partitions(batch_size):
+                ids, lats, lons, updated = zip(*rows)
+                self.upsert(ids, lats, lons)
+                upserted += len(rows)
+                newest = max((u for u in updated if u is not None), default=None)
+                if newest is not None and (watermark is None or newest > watermark):
+                    watermark = newest
+        self.watermark = watermark
+        live = set(session.scalars(select(Property.id)))
+        deleted = self.delete([pid for pid in list(self._location) if pid not in live])
+        return upserted, deleted
+
+    def listen(self):
+        """Follow ORM inserts, updates and deletes of ``Property`` in this process."""
+        def changed(mapper, connection, target):
+            self.upsert([target.id], [target.latitude], [target.longitude])
+
+        def deleted(mapper, connection, target):
+            self.delete([target.id])
+
+        for name, fn in (('after_insert', changed), ('after_update', changed), ('after_delete', deleted)):
+            event.listen(Property, name, fn)
+            self._listeners.append((name, fn))
+        return self
+
+    def close(self):
+        for name, fn in self._listeners:
+            event.remove(Property, name, fn)
+        self._listeners = []
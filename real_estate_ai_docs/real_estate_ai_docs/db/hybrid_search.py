@@ -0,0 +1,285 @@
+"""Semantic property search combined with relational filters.
+
+:class:`PropertyFilterIndex` keeps, for every filterable ``Property`` column, the
+row positions of each value (a sorted posting list per value) and a sorted
+price index, aligned with the rows of an :class:`~db.vector_search.ExactIndex`.
+
+:class:`HybridSearcher` estimates the selectivity of a ``PropertySearchFilters``
+input and picks a plan:
+
+* ``filter_then_score`` - start from the smallest posting list, check the other
+  predicates on just those rows, then score only the survivors. Used for narrow
+  queries, which therefore never touch the whole vector corpus.
+* ``score_then_filter`` - rank with the vector index (ANN if available) and drop
+  non-matching candidates, over-fetching by the inverse selectivity. Used when
+  most rows pass the filters anyway.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .models import Property
+
+CATEGORICAL_COLUMNS = ('type', 'status', 'category', 'bedrooms', 'city', 'community')
+
+# GraphQL PropertySearchFilters / properties() argument names -> index columns
+_FILTER_ALIASES = {
+    'minPrice': 'min_price',
+    'maxPrice': 'max_price',
+    'propertyType': 'type',
+    'property_type': 'type',
+}
+
+QueryPlan = namedtuple('QueryPlan', ['strategy', 'estimated_selectivity', 'estimated_rows'])
+
+
+def _normalize(value):
+    """Canonical form for categorical values: enum ``OFF_PLAN`` matches stored ``off-plan``."""
+    if isinstance(value, str):
+        return value.strip().lower().replace('_', '-')
+    return value
+
+
+def normalize_filters(filters):
+    """Map GraphQL-style filter keys to index column names and drop unset values."""
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        normalized[_FILTER_ALIASES.get(key, key)] = value
+    if 'near' in normalized and isinstance(normalized['near'], dict):
+        near = normalized['near']
+        normalized['near'] = (near['latitude'], near['longitude'], near.get('radiusKm', near.get('radius_km')))
+    unknown = set(normalized) - set(CATEGORICAL_COLUMNS) - {'min_price', 'max_price', 'location', 'near'}
+    if unknown:
+        raise ValueError(f"Unsupported property filters: {sorted(unknown)}")
+    return normalized
+
+
+class _PostingIndex:
+    """Row positions per distinct value of one column."""
+
+    def __init__(self, values):
+        keys = [_normalize(v) for v in values]
+        self.values = sorted(set(keys), key=lambda v: (v is None, str(v)))
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self.codes = np.fromiter((self._codes[k] for k in keys), dtype=np.int32, count=len(keys))
+        self.order = np.argsort(self.codes, kind='stable').astype(np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(self.codes, minlength=len(self.values)))))
+
+    def code(self, value):
+        return self._codes.get(_normalize(value), -1)
+
+    def count(self, value):
+        code = self.code(value)
+        return 0 if code < 0 else int(self.offsets[code + 1] - self.offsets[code])
+
+    def rows(self, value):
+        code = self.code(value)
+        if code < 0:
+            return np.empty(0, dtype=np.intp)
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def matches(self, rows, value):
+        return self.codes[rows] == self.code(value)
+
+
+class _RangeIndex:
+    """Sorted index over a numeric column for range predicates."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.order = np.argsort(self.values, kind='stable').astype(np.intp)
+        self.sorted = self.values[self.order]
+
+    def _bounds(self, low, high):
+        lo = 0 if low is None else np.searchsorted(self.sorted, low, side='left')
+        hi = len(self.sorted) if high is None else np.searchsorted(self.sorted, high, side='right')
+        return lo, max(lo, hi)
+
+    def count(self, low, high):
+        lo, hi = self._bounds(low, high)
+        return int(hi - lo)
+
+    def rows(self, low, high):
+        lo, hi = self._bounds(low, high)
+        return np.sort(self.order[lo:hi])
+
+    def matches(self, rows, low, high):
+        values = self.values[rows]
+        mask = np.ones(len(rows), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+
+class PropertyFilterIndex:
+    """Posting lists and a price index for ``Property`` filter columns, aligned with vector rows.
+
+    With a :class:`~db.geo_index.GeoIndex` and the property ID of each row, the
+    ``near`` filter ``(latitude, longitude, radius_km)`` (or the GraphQL-style
+    ``{'latitude', 'longitude', 'radiusKm'}``) is supported as well.
+    """
+
+    def __init__(self, columns, geo_index=None, row_ids=None):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("All filter columns must have one value per row")
+        self.n_rows = lengths.pop()
+        self.postings = {name: _PostingIndex(columns[name]) for name in CATEGORICAL_COLUMNS}
+        self.price = _RangeIndex(columns['price'])
+        self.geo_index = geo_index
+        if geo_index is not None:
+            if row_ids is None or len(row_ids) != self.n_rows:
+                raise ValueError("geo_index needs the property ID of every row")
+            self._row_ids = np.asarray(row_ids, dtype=np.int64)
+            self._id_order = np.argsort(self._row_ids, kind='stable')
+
+    def _near_rows(self, near):
+        """Sorted row positions of properties within the radius of ``near``."""
+        lat, lon, radius_km = near
+        ids, _ = self.geo_index.within_radius(lat, lon, radius_km)
+        sorted_ids = self._row_ids[self._id_order]
+        positions = np.searchsorted(sorted_ids, ids)
+        found = positions < len(sorted_ids)
+        found[found] = sorted_ids[positions[found]] == ids[found]
+        return np.sort(self._id_order[positions[found]])
+
+    @classmethod
+    def from_session(cls, session, vector_index, geo_index=None):
+        """Load filter columns for every property in ``vector_index``, in its row order."""
+        names = CATEGORICAL_COLUMNS + ('price',)
+        stmt = select(Property.id, *(getattr(Property, name) for name in names))
+        rows = session.execute(stmt).all()
+        positions = vector_index.rows_for([row[0] for row in rows]).tolist()
+        columns = {name: [None] * len(vector_index) for name in names}
+        for position, row in zip(positions, rows):
+            if position < 0:
+                continue
+            for name, value in zip(names, row[1:]):
+                columns[name][position] = value
+        columns['price'] = [np.nan if p is None else p for p in columns['price']]
+        return cls(columns, geo_index=geo_index, row_ids=vector_index.ids)
+
+    def _predicates(self, filters):
+        """Return ``(count, rows_fn, matches_fn)`` for each active predicate."""
+        predicates = []
+        for name in CATEGORICAL_COLUMNS:
+            if name in filters:
+                posting, value = self.postings[name], filters[name]
+                predicates.append((posting.count(value),
+                                   lambda p=posting, v=value: p.rows(v),
+                                   lambda rows, p=posting, v=value: p.matches(rows, v)))
+        if 'min_price' in filters or 'max_price' in filters:
+            low, high = filters.get('min_price'), filters.get('max_price')
+            predicates.append((self.price.count(low, high),
+                               lambda: self.price.rows(low, high),
+                               lambda rows: self.price.matches(rows, low, high)))
+        if 'location' in filters:
+            city, community, value = self.postings['city'], self.postings['community'], filters['location']
+            predicates.append((city.count(value) + community.count(value),
+                               lambda: np.union1d(city.rows(value), community.rows(value)),
+                               lambda rows: city.matches(rows, value) | community.matches(rows, value)))
+        if 'near' in filters:
+            if self.geo_index is None:
+                raise ValueError("The near filter needs a PropertyFilterIndex built with a geo_index")
+            # The grid query is exact and cheap, so its result doubles as the selectivity estimate
+            near_rows = self._near_rows(filters['near'])
+            predicates.append((len(near_rows),
+                               lambda: near_rows,
+                               lambda rows: np.isin(rows, near_rows)))
+        return predicates
+
+    def estimate_selectivity(self, filters):
+        """Fraction of rows expected to pass, assuming independent predicates."""
+        if not self.n_rows:
+            return 0.0
+        selectivity = 1.0
+        for count, _, _ in self._predicates(normalize_filters(filters)):
+            selectivity *= count / self.n_rows
+        return selectivity
+
+    def matching_rows(self, filters):
+        """Row positions passing every filter, computed from the smallest posting list."""
+        predicates = sorted(self._predicates(normalize_filters(filters)), key=lambda p: p[0])
+        if not predicates:
+            return np.arange(self.n_rows, dtype=np.intp)
+        rows = predicates[0][1]()
+        for _, _, matches in predicates[1:]:
+            if not len(rows):
+                break
+            rows = rows[matches(rows)]
+        return rows
+
+    def matches(self, rows, filters):
+        """Boolean mask of which ``rows`` pass every filter."""
+        rows = np.asarray(rows, dtype=np.intp)
+        mask = np.ones(len(rows), dtype=bool)
+        for _, _, matches in self._predicates(normalize_filters(filters)):
+            mask &= matches(rows)
+        return mask
+
+
+class HybridSearcher:
+    """Vector search with relational filters pushed down when they are selective."""
+
+    def __init__(self, vector_index, filter_index, ann_index=None, filter_first_selectivity=0.1, oversample=2.0):
+        if filter_index.n_rows != len(vector_index):
+            raise ValueError("filter_index must be aligned with vector_index rows")
+        self.vector_index = vector_index
+        self.filter_index = filter_index
+        self.ann_index = ann_index
+        self.filter_first_selectivity = filter_first_selectivity
+        self.oversample = oversample
+
+    @classmethod
+    def from_session(cls, session, vector_index, ann_index=None, geo_index=None, **options):
+        filter_index = PropertyFilterIndex.from_session(session, vector_index, geo_index=geo_index)
+        return cls(vector_index, filter_index, ann_index=ann_index, **options)
+
+    def plan(self, filters, k=10):
+        filters = normalize_filters(filters)
+        n_rows = len(self.vector_index)
+        if not filters:
+            return QueryPlan('vector_only', 1.0, n_rows)
+        selectivity = self.filter_index.estimate_selectivity(filters)
+        strategy = 'filter_then_score' if selectivity <= self.filter_first_selectivity else 'score_then_filter'
+        return QueryPlan(strategy, selectivity, int(round(selectivity * n_rows)))
+
+    def search(self, query, k=10, filters=None):
+        """Return up to ``k`` ``(property_id, score)`` pairs passing ``filters``, best first."""
+        filters = normalize_filters(filters)
+        plan = self.plan(filters, k)
+        if plan.strategy == 'vector_only':
+            return (self.ann_index or self.vector_index).search(query, k)
+        if plan.strategy == 'filter_then_score':
+            return self._filter_then_score(query, k, filters)
+        return self._score_then_filter(query, k, filters, plan.estimated_selectivity)
+
+    def _filter_then_score(self, query, k, filters):
+        rows = self.filter_index.matching_rows(filters)
+        if not len(rows):
+            return []
+        return self.vector_index.search_rows(query, rows, k)
+
+    def _score_then_filter(self, query, k, filters, selectivity):
+        if self.ann_index is None:
+            scores = self.vector_index.scores(query)[0]
+            rows = self.filter_index.matching_rows(filters)
+            best = rows[np.argsort(-scores[rows], kind='stable')[:k]]
+            return list(zip(self.vector_index.ids[best].tolist(), scores[best].tolist()))
+        fetch = min(len(self.vector_index), math.ceil(k / max(selectivity, 1e-9) * self.oversample))
+        candidates = self.ann_index.search(query, fetch)
+        if candidates:
+            rows = self.vector_index.rows_for([pid for pid, _ in candidates])
+            passed = np.zeros(len(rows), dtype=bool)
+            passed[rows >= 0] = self.filter_index.matches(rows[rows >= 0], filters)
+            kept = [candidate for candidate, keep in zip(candidates, passed) if keep]
+            if len(kept) >= k:
+                return kept[:k]
+        # The estimate was too optimistic for this query; fall back to the exact pushed-down plan
+        return self._filter_then_score(query, k, filters)
@@ -0,0 +1,335 @@
+"""Streaming importer for Bayut / Property Finder listing feeds.
+
+Feeds are parsed incrementally (CSV rows, JSON arrays or JSON Lines, XML
+elements via ``iterparse``), so memory use does not grow with feed size.
+Records are normalised to ``Property`` columns and written in chunks:
+
+* three queries reading what is stored for the chunk's references (the
+  property rows, their features and their images). Listings whose row,
+  features and images all match are skipped, so re-importing an unchanged
+  feed writes nothing and leaves ``updated_at`` and child row IDs alone;
+* one ``executemany`` upsert of the new and changed ``properties``, keyed on
+  ``Property.reference`` (duplicates inside a chunk keep the last occurrence);
+* one query mapping new references to property IDs;
+* one DELETE and one ``executemany`` INSERT each for ``property_features`` and
+  ``property_images`` of the changed listings.
+
+Run from the command line::
+
+    python -m db.listing_import feed.xml --database-url sqlite:///real_estate.db --source bayut
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.orm import Session
+
+from .bulk import upsert_rows
+from .models import Property, PropertyFeature, PropertyImage
+
+# Portal field names for each Property column, in order of preference
+FIELD_ALIASES = {
+    'reference': ('reference', 'reference_number', 'ref', 'listing_id', 'id'),
+    'title': ('title', 'title_en', 'name'),
+    'description': ('description', 'description_en'),
+    'type': ('type', 'property_type'),
+    'status': ('status', 'completion_status'),
+    'category': ('category', 'offering_type', 'purpose'),
+    'price': ('price', 'price_aed'),
+    'area': ('area', 'size', 'size_sqft'),
+    'bedrooms': ('bedrooms', 'beds'),
+    'bathrooms': ('bathrooms', 'baths'),
+    'address': ('address',),
+    'community': ('community', 'sub_community', 'location'),
+    'city': ('city', 'emirate'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lng', 'lon'),
+    'developer': ('developer',),
+    'completion_date': ('completion_date', 'handover_date'),
+}
+FEATURE_ALIASES = ('features', 'amenities')
+IMAGE_ALIASES = ('images', 'photos', 'image_urls')
+FLOOR_PLAN_ALIASES = ('floor_plans', 'floor_plan')
+REQUIRED_FIELDS = ('reference', 'title', 'type', 'price', 'area')
+
+_CATEGORY_VALUES = {'for-sale': 'sale', 'buy': 'sale', 'for-rent': 'rent', 'offplan': 'off-plan'}
+_STATUS_VALUES = {'ready': 'available', 'completed': 'available', 'offplan': 'off-plan'}
+_FLOAT_FIELDS = ('price', 'area', 'latitude', 'longitude')
+_INT_FIELDS = ('bedrooms', 'bathrooms')
+
+
+# Feed readers
+
+def iter_csv(fh):
+    """Yield one dict per CSV row."""
+    yield from csv.DictReader(fh)
+
+
+def iter_json(fh, read_size=1 << 16):
+    """Yield records from a JSON array or JSON Lines stream without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = fh.read(read_size), 0
+            eof = not buffer
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = fh.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield record
+        position = end
+
+
+def iter_xml(fh, record_tag='property'):
+    """Yield one dict per ``<record_tag>`` element; repeated child tags become lists."""
+    open_elements = []
+    for event, element in ET.iterparse(fh, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        if element.tag != record_tag:
+            continue
+        record = dict(element.attrib)
+        for child in element:
+            value = child.text.strip() if child.text and child.text.strip() else [
+                (grandchild.text or '').strip() for grandchild in child]
+            if child.tag in record:
+                existing = record[child.tag]
+                record[child.tag] = (existing if isinstance(existing, list) else [existing]) + (
+                    value if isinstance(value, list) else [value])
+            else:
+                record[child.tag] = value
+        # Detach the record from its parent too: a cleared element left in place still grows the tree
+        if open_elements:
+            open_elements[-1].remove(element)
+        element.clear()
+        yield record
+
+
+READERS = {'csv': iter_csv, 'json': iter_json, 'jsonl': iter_json, 'xml': iter_xml}
+
+
+# Normalisation
+
+def _first(record, aliases):
+    for alias in aliases:
+        value = record.get(alias)
+        if value not in (None, '', []):
+            return value
+    return None
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        separator = '|' if '|' in value else ','
+        return [part.strip() for part in value.split(separator) if part.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def normalize_listing(record):
+    """Map a portal record to ``(property_row, features, images)``; raises ValueError if unusable."""
+    row = {column: _first(record, aliases) for column, aliases in FIELD_ALIASES.items()}
+    missing = [field for field in REQUIRED_FIELDS if row[field] is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    for field in _FLOAT_FIELDS:
+        if row[field] is not None:
+            row[field] = float(str(row[field]).replace(',', ''))
+    for field in _INT_FIELDS:
+        if row[field] is not None:
+            value = str(row[field]).strip().lower()
+            row[field] = 0 if value == 'studio' else int(float(value))
+    row['reference'] = str(row['reference'])
+    row['type'] = str(row['type']).strip().lower()
+    category = str(row['category'] or 'sale').strip().lower().replace('_', '-')
+    row['category'] = _CATEGORY_VALUES.get(category, category)
+    status = str(row['status'] or ('off-plan' if row['category'] == 'off-plan' else 'available')).strip().lower().replace('_', '-')
+    row['status'] = _STATUS_VALUES.get(status, status)
+    row['completion_date'] = _as_datetime(row['completion_date'])
+    features = sorted(set(_as_list(_first(record, FEATURE_ALIASES))))
+    images = [(url, False) for url in _as_list(_first(record, IMAGE_ALIASES))]
+    images += [(url, True) for url in _as_list(_first(record, FLOOR_PLAN_ALIASES))]
+    return row, features, images
+
+
+# Writing
+
+class ImportStats:
+    """Counters for one import run."""
+
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self.errors = []  # first few rejection reasons, for the log
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / max(self.elapsed, 1e-9)
+
+    def __repr__(self):
+        return (f"ImportStats(read={self.read}, written={self.written}, unchanged={self.unchanged}, "
+                f"duplicates={self.duplicates}, rejected={self.rejected}, {self.rows_per_second:.0f} rows/s)")
+
+
+def _stored(session, references, columns):
+    """``{reference: (id, row, features, images)}`` as stored, in the shape :func:`normalize_listing` returns."""
+    table = Property.__table__
+    stored = {}
+    for row in session.execute(select(table.c.id, *(table.c[name] for name in columns))
+                               .where(table.c.reference.in_(references))).mappings():
+        stored[row['reference']] = (row['id'], {name: row[name] for name in columns}, [], [])
+    by_id = {entry[0]: entry for entry in stored.values()}
+    if by_id:
+        for property_id, feature in session.execute(
+                select(PropertyFeature.property_id, PropertyFeature.feature)
+                .where(PropertyFeature.property_id.in_(list(by_id))).order_by(PropertyFeature.feature)):
+            by_id[property_id][2].append(feature)
+        for property_id, url, is_floor_plan in session.execute(
+                select(PropertyImage.property_id, PropertyImage.url, PropertyImage.is_floor_plan)
+                .where(PropertyImage.property_id.in_(list(by_id))).order_by(PropertyImage.id)):
+            by_id[property_id][3].append((url, bool(is_floor_plan)))
+    return stored
+
+
+def _write_chunk(session, listings):
+    """Write the new and changed listings of a chunk; returns how many were written."""
+    columns = list(next(iter(listings.values()))[0])
+    stored = _stored(session, list(listings), columns)
+    # A listing repeated unchanged (row, features and images) is left alone, so its updated_at and child row
+    # ids stay put; change detection downstream relies on updated_at
+    changed = {ref: listing for ref, listing in listings.items()
+               if ref not in stored or stored[ref][1:] != tuple(listing)}
+    if not changed:
+        session.commit()
+        return 0
+    now = datetime.utcnow()
+    rows = [dict(row, created_at=now, updated_at=now) for row, _, _ in changed.values()]
+    update_columns = [name for name in rows[0] if name not in ('reference', 'created_at')]
+    upsert_rows(session, Property.__table__, rows, key_columns=['reference'], update_columns=update_columns)
+    ids = {ref: entry[0] for ref, entry in stored.items() if ref in changed}
+    new = [ref for ref in changed if ref not in stored]
+    if new:
+        ids.update(session.execute(select(Property.reference, Property.id).where(Property.reference.in_(new))).all())
+    property_ids = [ids[ref] for ref in changed if ref in stored]
+    if property_ids:
+        session.execute(delete(PropertyFeature).where(PropertyFeature.property_id.in_(property_ids)))
+        session.execute(delete(PropertyImage).where(PropertyImage.property_id.in_(property_ids)))
+    features = [{'property_id': ids[ref], 'feature': feature}
+                for ref, (_, listing_features, _) in changed.items() for feature in listing_features]
+    images = [{'property_id': ids[ref], 'url': url, 'is_floor_plan': is_floor_plan}
+              for ref, (_, _, listing_images) in changed.items() for url, is_floor_plan in listing_images]
+    if features:
+        session.execute(insert(PropertyFeature.__table__), features)
+    if images:
+        session.execute(insert(PropertyImage.__table__), images)
+    session.commit()
+    return len(changed)
+
+
+def import_listings(session, records, chunk_size=1000, progress=None):
+    """Upsert an iterable of raw portal records into properties, features and images."""
+    stats = ImportStats()
+    chunk = {}
+    for record in records:
+        stats.read += 1
+        try:
+            row, features, images = normalize_listing(record)
+        except (ValueError, TypeError) as exc:
+            stats.rejected += 1
+            if len(stats.errors) < 20:
+                stats.errors.append(f"record {stats.read}: {exc}")
+            continue
+        if row['reference'] in chunk:
+            stats.duplicates += 1
+        chunk[row['reference']] = (row, features, images)
+        if len(chunk) >= chunk_size:
+            written = _write_chunk(session, chunk)
+            stats.written += written
+            stats.unchanged += len(chunk) - written
+            stats.chunks += 1
+            chunk = {}
+            if progress:
+                progress(stats)
+    if chunk:
+        written = _write_chunk(session, chunk)
+        stats.written += written
+        stats.unchanged += len(chunk) - written
+        stats.chunks += 1
+        if progress:
+            progress(stats)
+    return stats
+
+
+def import_feed(session, path, feed_format=None, chunk_size=1000, record_tag='property', progress=None):
+    """Import a feed file; the format defaults to the file extension."""
+    feed_format = feed_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if feed_format not in READERS:
+        raise ValueError(f"Unsupported feed format {feed_format!r}, expected one of {sorted(READERS)}")
+    if feed_format == 'xml':
+        with open(path, 'rb') as fh:
+            return import_listings(session, iter_xml(fh, record_tag), chunk_size, progress)
+    with io.open(path, encoding='utf-8', newline='') as fh:
+        return import_listings(session, READERS[feed_format](fh), chunk_size, progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a Bayut / Property Finder listing feed")
+    parser.add_argument('feed')
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--format', choices=sorted(READERS))
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--record-tag', default='property', help="XML element holding one listing")
+    parser.add_argument('--source', choices=['bayut', 'property_finder', 'other'], default='other',
+                        help="portal the feed came from (used in log output)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with Session(engine) as session:
+        stats = import_feed(session, args.feed, args.format, args.chunk_size, args.record_tag,
+                            progress=lambda s: print(f"[{args.source}] {s.read} read, {s.written} written "
+                                                     f"({s.rows_per_second:.0f} rows/s)"))
+    print(f"[{args.source}] {stats}")
+    for error in stats.errors:
+        print(f"  rejected {error}")
+
+
+if __name__ == '__main__':
+    main()
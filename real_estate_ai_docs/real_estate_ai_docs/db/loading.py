@@ -0,0 +1,196 @@
+"""Named eager-loading profiles for the ORM relationship graph.
+
+All relationships in the models are lazy, so rendering a list of N properties
+or a proposal fires one query per row per relationship. Each profile here
+lists the relationships and columns a given view needs, loads them with
+``selectinload``/``joinedload`` and ``load_only``, and adds ``raiseload('*')``
+so anything the profile forgot fails loudly instead of silently becoming an
+N+1 query.
+
+    rows = session.scalars(select_profile('listing_card').where(Property.city == 'Dubai')).all()
+    cards = [render('listing_card', row) for row in rows]
+
+``max_queries`` is the query budget of each profile regardless of row count;
+:func:`assert_profile_queries` checks it in tests.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+
+from .models import ChatMessage, ChatSession, Lead, LeadNote, Property, PropertyFeature, PropertyImage, Proposal, ProposalSection, User
+
+
+class LoadingProfile:
+    """Loader options, query budget and render function for one view."""
+
+    def __init__(self, model, options, max_queries, render):
+        self.model = model
+        self.options = options
+        self.max_queries = max_queries
+        self.render = render
+
+
+def _property_card(p):
+    return {
+        'id': p.id, 'reference': p.reference, 'title': p.title, 'type': p.type, 'status': p.status,
+        'category': p.category, 'price': p.price, 'area': p.area, 'bedrooms': p.bedrooms,
+        'bathrooms': p.bathrooms, 'community': p.community, 'city': p.city,
+        'images': [image.url for image in p.images if not image.is_floor_plan],
+    }
+
+
+def _property_detail(p):
+    return dict(
+        _property_card(p),
+        description=p.description, address=p.address, latitude=p.latitude, longitude=p.longitude,
+        developer=p.developer, completion_date=p.completion_date,
+        created_at=p.created_at, updated_at=p.updated_at,
+        features=[f.feature for f in p.features],
+        floor_plans=[image.url for image in p.images if image.is_floor_plan],
+    )
+
+
+def _lead_detail(lead):
+    agent = lead.assigned_agent
+    return {
+        'id': lead.id, 'first_name': lead.first_name, 'last_name': lead.last_name, 'email': lead.email,
+        'phone': lead.phone, 'nationality': lead.nationality, 'status': lead.status, 'source': lead.source,
+        'assigned_to': lead.assigned_to, 'budget_min': lead.budget_min, 'budget_max': lead.budget_max,
+        'requirements': lead.requirements, 'created_at': lead.created_at, 'updated_at': lead.updated_at,
+        'last_contacted_at': lead.last_contacted_at,
+        'assigned_agent': None if agent is None else {'id': agent.id, 'first_name': agent.first_name, 'last_name': agent.last_name},
+        'notes': [{'content': n.content, 'created_at': n.created_at, 'created_by': n.created_by} for n in lead.notes],
+    }
+
+
+def _proposal_render(proposal):
+    lead, creator = proposal.lead, proposal.created_by
+    return {
+        'id': proposal.id, 'title': proposal.title, 'language': proposal.language, 'status': proposal.status,
+        'created_at': proposal.created_at, 'pdf_url': proposal.pdf_url, 'web_url': proposal.web_url,
+        'property': _property_detail(proposal.property),
+        'lead': {'id': lead.id, 'first_name': lead.first_name, 'last_name': lead.last_name,
+                 'nationality': lead.nationality, 'budget_min': lead.budget_min, 'budget_max': lead.budget_max},
+        'created_by': {'id': creator.id, 'first_name': creator.first_name, 'last_name': creator.last_name,
+                       'email': creator.email, 'agency': creator.agency},
+        'sections': [{'title': s.title, 'content': s.content, 'type': s.type, 'order': s.order} for s in proposal.sections],
+    }
+
+
+def _chat_transcript(session):
+    return {
+        'id': session.id, 'user_id': session.user_id, 'created_at': session.created_at,
+        'messages': [{'id': m.id, 'role': m.role, 'content': m.content, 'language': m.language, 'timestamp': m.timestamp}
+                     for m in session.messages],
+    }
+
+
+_CARD_COLUMNS = (Property.id, Property.reference, Property.title, Property.type, Property.status, Property.category,
+                 Property.price, Property.area, Property.bedrooms, Property.bathrooms, Property.community, Property.city)
+
+PROFILES = {
+    'listing_card': LoadingProfile(Property, [
+        load_only(*_CARD_COLUMNS),
+        selectinload(Property.images).load_only(PropertyImage.property_id, PropertyImage.url, PropertyImage.is_floor_plan),
+        raiseload('*'),
+    ], max_queries=2, render=_property_card),
+    'property_detail': LoadingProfile(Property, [
+        selectinload(Property.features).load_only(PropertyFeature.property_id, PropertyFeature.feature),
+        selectinload(Property.images).load_only(PropertyImage.property_id, PropertyImage.url, PropertyImage.is_floor_plan),
+        raiseload('*'),
+    ], max_queries=3, render=_property_detail),
+    'lead_detail': LoadingProfile(Lead, [
+        joinedload(Lead.assigned_agent).load_only(User.id, User.first_name, User.last_name),
+        selectinload(Lead.notes).load_only(LeadNote.lead_id, LeadNote.content, LeadNote.created_at, LeadNote.created_by),
+        raiseload('*'),
+    ], max_queries=2, render=_lead_detail),
+    'proposal_render': LoadingProfile(Proposal, [
+        joinedload(Proposal.property).options(
+            selectinload(Property.features).load_only(PropertyFeature.property_id, PropertyFeature.feature),
+            selectinload(Property.images).load_only(PropertyImage.property_id, PropertyImage.url, PropertyImage.is_floor_plan),
+        ),
+        joinedload(Proposal.lead).load_only(Lead.id, Lead.first_name, Lead.last_name, Lead.nationality, Lead.budget_min, Lead.budget_max),
+        joinedload(Proposal.created_by).load_only(User.id, User.first_name, User.last_name, User.email, User.agency),
+        selectinload(Proposal.sections).load_only(ProposalSection.proposal_id, ProposalSection.title, ProposalSection.content,
+                                                  ProposalSection.type, ProposalSection.order),
+        raiseload('*'),
+    ], max_queries=4, render=_proposal_render),
+    'chat_transcript': LoadingProfile(ChatSession, [
+        selectinload(ChatSession.messages).load_only(ChatMessage.session_id, ChatMessage.role, ChatMessage.content,
+                                                     ChatMessage.language, ChatMessage.timestamp),
+        raiseload('*'),
+    ], max_queries=2, render=_chat_transcript),
+}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown loading profile {name!r}, expected one of {sorted(PROFILES)}") from None
+
+
+def select_profile(name):
+    """``select()`` of the profile's model with its loader options applied."""
+    profile = get_profile(name)
+    return select(profile.model).options(*profile.options)
+
+
+def load_profile(session, name, ids):
+    """Load the rows with primary keys ``ids`` under profile ``name``, in the order given."""
+    profile = get_profile(name)
+    rows = session.scalars(select_profile(name).where(profile.model.id.in_(list(ids)))).unique().all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def render(name, obj):
+    """Serialize ``obj`` to the plain-dict shape of profile ``name``."""
+    return get_profile(name).render(obj)
+
+
+# Test helpers
+
+class QueryCounter:
+    """Records every SQL statement executed on an engine while active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail if the block executes more than ``limit`` statements on ``engine``."""
+    with count_queries(engine) as counter:
+        yield counter
+    if len(counter) > limit:
+        listing = '\n'.join(f"  {i + 1}. {s.splitlines()[0]}" for i, s in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {limit} queries, got {len(counter)}:\n{listing}")
+
+
+def assert_profile_queries(session, name, ids):
+    """Load and render ``ids`` under profile ``name`` within its query budget; returns the rendered rows.
+
+    Use a fresh session (or ``session.expire_all()``) so the identity map does
+    not hide queries.
+    """
+    profile = get_profile(name)
+    with assert_max_queries(session.get_bind(), profile.max_queries):
+        return [profile.render(row) for row in load_profile(session, name, ids)]
@@ -0,0 +1,356 @@
+"""SQLAlchemy models of the Real Estate AI platform.
+
+Importing this module only defines the mapped classes: no engine, no
+``create_all`` and no NumPy until a vector column is actually bound or
+loaded. The ERD and data dictionary are generated by ``python -m
+db.erd_generator``.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, LargeBinary, Index, text
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.types import TypeDecorator
+
+Base = declarative_base()
+
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_DTYPE = 'float32'
+
+_VECTOR_DTYPES = {'float16': '<f2', 'float32': '<f4', 'float64': '<f8'}
+
+class PackedVector(TypeDecorator):
+    """Fixed-size vector stored as packed little-endian floats (float32 or float16).
+
+    Binds any sequence or NumPy array and loads back a read-only NumPy array, so
+    rows can be copied straight into a search matrix without parsing text.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dimensions, dtype=EMBEDDING_DTYPE):
+        super().__init__()
+        if str(dtype) not in _VECTOR_DTYPES:
+            raise ValueError(f"PackedVector needs a float dtype, got {dtype}")
+        self.dimensions = dimensions
+        # NumPy dtype string ('<f4'), so defining the column does not import NumPy
+        self.dtype = _VECTOR_DTYPES[str(dtype)]
+        self.itemsize = int(self.dtype[2:])
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = bytes(value)
+            if len(value) != self.dimensions * self.itemsize:
+                raise ValueError(f"Packed vector has {len(value)} bytes, expected {self.dimensions * self.itemsize}")
+            return value
+        import numpy as np
+        array = np.asarray(value, dtype=self.dtype)
+        if array.shape != (self.dimensions,):
+            raise ValueError(f"Vector has shape {array.shape}, expected ({self.dimensions},)")
+        return array.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        import numpy as np
+        return np.frombuffer(value, dtype=self.dtype)
+
+# Define the models based on the requirements
+class User(Base):
+    __tablename__ = 'users'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the user')
+    email = Column(String(255), nullable=False, unique=True, comment='Email address of the user (used for login)')
+    password_hash = Column(String(255), nullable=False, comment='Hashed password for user authentication')
+    first_name = Column(String(100), nullable=False, comment='First name of the user')
+    last_name = Column(String(100), nullable=False, comment='Last name of the user')
+    role = Column(String(20), nullable=False, comment='Role of the user (admin, agent, manager, analyst)')
+    agency = Column(String(100), nullable=False, comment='Real estate agency the user belongs to')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the user was created')
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Timestamp when the user was last updated')
+    
+    # Relationships
+    leads = relationship("Lead", back_populates="assigned_agent")
+    proposals = relationship("Proposal", back_populates="created_by")
+
+class Lead(Base):
+    __tablename__ = 'leads'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the lead')
+    first_name = Column(String(100), nullable=False, comment='First name of the lead')
+    last_name = Column(String(100), nullable=False, comment='Last name of the lead')
+    email = Column(String(255), nullable=False, comment='Email address of the lead')
+    phone = Column(String(50), comment='Phone number of the lead')
+    nationality = Column(String(100), comment='Nationality of the lead (relevant for visa eligibility)')
+    status = Column(String(20), nullable=False, comment='Current status in the sales pipeline (new, contacted, qualified, proposal, negotiation, closed, lost)')
+    source = Column(String(20), comment='Source of the lead (website, bayut, property_finder, referral, direct, other)')
+    assigned_to = Column(Integer, ForeignKey('users.id'), comment='ID of the user (agent) assigned to this lead')
+    budget_min = Column(Float, comment='Minimum budget of the lead')
+    budget_max = Column(Float, comment='Maximum budget of the lead')
+    requirements = Column(Text, comment='Property requirements and preferences of the lead')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the lead was created')
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Timestamp when the lead was last updated')
+    last_contacted_at = Column(DateTime, comment='Timestamp when the lead was last contacted')
+    
+    # Indexes (each serves a canonical query in db/query_plans.py)
+    __table_args__ = (
+        Index('ix_leads_created_at_id', 'created_at', 'id'),
+        Index('ix_leads_status_created_at_id', 'status', 'created_at', 'id'),
+        Index('ix_leads_source_created_at_id', 'source', 'created_at', 'id'),
+        Index('ix_leads_assigned_to_status_created_at_id', 'assigned_to', 'status', 'created_at', 'id'),
+        Index('ix_leads_open_assigned_to', 'assigned_to', 'created_at', 'id',
+              sqlite_where=text("status NOT IN ('closed', 'lost')"),
+              postgresql_where=text("status NOT IN ('closed', 'lost')")),
+    )
+    
+    # Relationships
+    assigned_agent = relationship("User", back_populates="leads")
+    proposals = relationship("Proposal", back_populates="lead")
+    notes = relationship("LeadNote", back_populates="lead", order_by="LeadNote.created_at")
+    
+class LeadNote(Base):
+    __tablename__ = 'lead_notes'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the note')
+    lead_id = Column(Integer, ForeignKey('leads.id'), nullable=False, comment='ID of the lead this note belongs to')
+    content = Column(Text, nullable=False, comment='Content of the note')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the note was created')
+    created_by = Column(Integer, ForeignKey('users.id'), nullable=False, index=True, comment='ID of the user who created the note')
+    
+    __table_args__ = (
+        Index('ix_lead_notes_lead_id_created_at', 'lead_id', 'created_at'),
+    )
+    
+    # Relationships
+    lead = relationship("Lead", back_populates="notes")
+
+class Property(Base):
+    __tablename__ = 'properties'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the property')
+    reference = Column(String(50), unique=True, comment='External reference number for the property')
+    title = Column(String(255), nullable=False, comment='Title of the property listing')
+    description = Column(Text, comment='Detailed description of the property')
+    type = Column(String(20), nullable=False, comment='Type of property (apartment, villa, townhouse, penthouse, office, retail, land)')
+    status = Column(String(20), nullable=False, comment='Current status of the property (available, sold, rented, off-plan)')
+    category = Column(String(20), nullable=False, comment='Category of listing (sale, rent, off-plan)')
+    price = Column(Float, nullable=False, comment='Price of the property in AED')
+    area = Column(Float, nullable=False, comment='Area of the property in square feet')
+    bedrooms = Column(Integer, comment='Number of bedrooms')
+    bathrooms = Column(Integer, comment='Number of bathrooms')
+    address = Column(String(255), comment='Street address of the property')
+    community = Column(String(100), comment='Community or neighborhood of the property')
+    city = Column(String(100), comment='City where the property is located')
+    latitude = Column(Float, comment='Latitude coordinate for mapping')
+    longitude = Column(Float, comment='Longitude coordinate for mapping')
+    developer = Column(String(100), comment='Developer of the property (for off-plan properties)')
+    completion_date = Column(DateTime, comment='Expected completion date (for off-plan properties)')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the property was created')
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Timestamp when the property was last updated')
+    
+    # Indexes (each serves a canonical query in db/query_plans.py)
+    __table_args__ = (
+        Index('ix_properties_created_at_id', 'created_at', 'id'),
+        Index('ix_properties_status_category_price', 'status', 'category', 'price'),
+        Index('ix_properties_type_bedrooms_price', 'type', 'bedrooms', 'price'),
+        Index('ix_properties_city_community', 'city', 'community'),
+        Index('ix_properties_community_type_bedrooms', 'community', 'type', 'bedrooms'),
+        Index('ix_properties_available_category_price', 'category', 'price',
+              sqlite_where=text("status = 'available'"),
+              postgresql_where=text("status = 'available'")),
+    )
+    
+    # Relationships
+    features = relationship("PropertyFeature", back_populates="property")
+    images = relationship("PropertyImage", back_populates="property")
+    proposals = relationship("Proposal", back_populates="property")
+    embedding = relationship("Embedding", uselist=False, back_populates="property")
+
+class PropertyFeature(Base):
+    __tablename__ = 'property_features'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the feature')
+    property_id = Column(Integer, ForeignKey('properties.id'), nullable=False, index=True, comment='ID of the property this feature belongs to')
+    feature = Column(String(100), nullable=False, comment='Name of the feature or amenity')
+    
+    # Relationships
+    property = relationship("Property", back_populates="features")
+
+class PropertyImage(Base):
+    __tablename__ = 'property_images'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the image')
+    property_id = Column(Integer, ForeignKey('properties.id'), nullable=False, index=True, comment='ID of the property this image belongs to')
+    url = Column(String(255), nullable=False, comment='URL of the image')
+    is_floor_plan = Column(Boolean, default=False, comment='Flag indicating if the image is a floor plan')
+    
+    # Relationships
+    property = relationship("Property", back_populates="images")
+
+class Embedding(Base):
+    __tablename__ = 'embeddings'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the embedding')
+    property_id = Column(Integer, ForeignKey('properties.id'), nullable=False, unique=True, comment='ID of the property this embedding represents')
+    vector = Column(PackedVector(EMBEDDING_DIMENSIONS), nullable=False, comment='Vector embedding (1536 dimensions, packed float32) for semantic search')
+    content_hash = Column(String(64), comment='SHA-256 of the property title, description and features the embedding was computed from')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the embedding was created')
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Timestamp when the embedding was last updated')
+    
+    # Relationships
+    property = relationship("Property", back_populates="embedding")
+
+class Proposal(Base):
+    __tablename__ = 'proposals'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the proposal')
+    property_id = Column(Integer, ForeignKey('properties.id'), nullable=False, index=True, comment='ID of the property included in the proposal')
+    lead_id = Column(Integer, ForeignKey('leads.id'), nullable=False, comment='ID of the lead the proposal is for')
+    title = Column(String(255), nullable=False, comment='Title of the proposal')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the proposal was created')
+    created_by_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True, comment='ID of the user who created the proposal')
+    language = Column(String(2), nullable=False, default='en', comment='Language of the proposal (en, ar, fr)')
+    status = Column(String(20), nullable=False, default='draft', comment='Current status of the proposal (draft, sent, viewed, accepted, rejected)')
+    pdf_url = Column(String(255), comment='URL to the PDF version of the proposal')
+    web_url = Column(String(255), comment='URL to the web version of the proposal')
+    
+    __table_args__ = (
+        Index('ix_proposals_lead_id_created_at_id', 'lead_id', 'created_at', 'id'),
+        Index('ix_proposals_status_created_at_id', 'status', 'created_at', 'id'),
+        Index('ix_proposals_created_at_id', 'created_at', 'id'),
+    )
+    
+    # Relationships
+    property = relationship("Property", back_populates="proposals")
+    lead = relationship("Lead", back_populates="proposals")
+    created_by = relationship("User", back_populates="proposals")
+    sections = relationship("ProposalSection", back_populates="proposal", order_by="ProposalSection.order")
+
+class ProposalSection(Base):
+    __tablename__ = 'proposal_sections'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the section')
+    proposal_id = Column(Integer, ForeignKey('proposals.id'), nullable=False, comment='ID of the proposal this section belongs to')
+    title = Column(String(255), nullable=False, comment='Title of the section')
+    content = Column(Text, nullable=False, comment='Content of the section')
+    type = Column(String(50), nullable=False, comment='Type of section (property_details, financial_analysis, location_insights, payment_plan, visa_information)')
+    order = Column(Integer, nullable=False, comment='Order of the section within the proposal')
+    
+    __table_args__ = (
+        Index('ix_proposal_sections_proposal_id_order', 'proposal_id', 'order'),
+    )
+    
+    # Relationships
+    proposal = relationship("Proposal", back_populates="sections")
+
+class ChatSession(Base):
+    __tablename__ = 'chat_sessions'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the chat session')
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, comment='ID of the user participating in the chat')
+    created_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the chat session was created')
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Timestamp when the chat session was last updated')
+    
+    __table_args__ = (
+        Index('ix_chat_sessions_user_id_updated_at', 'user_id', 'updated_at'),
+        Index('ix_chat_sessions_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+    
+    # Relationships
+    messages = relationship("ChatMessage", back_populates="session", order_by="ChatMessage.timestamp")
+
+class ChatMessage(Base):
+    __tablename__ = 'chat_logs'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the chat message')
+    session_id = Column(Integer, ForeignKey('chat_sessions.id'), nullable=False, comment='ID of the chat session this message belongs to')
+    role = Column(String(10), nullable=False, comment='Role of the message sender (user or assistant)')
+    content = Column(Text, nullable=False, comment='Content of the message')
+    language = Column(String(2), nullable=False, comment='Language of the message (en, ar, fr)')
+    timestamp = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the message was sent')
+    
+    __table_args__ = (
+        Index('ix_chat_logs_session_id_timestamp_id', 'session_id', 'timestamp', 'id'),
+        # Compaction finds and walks the oldest messages by time (db/chat_log_store.py)
+        Index('ix_chat_logs_timestamp_id', 'timestamp', 'id'),
+    )
+    
+    # Relationships
+    session = relationship("ChatSession", back_populates="messages")
+
+# Ranked lead-to-property matches (written by services/lead_matching.py)
+class LeadMatch(Base):
+    __tablename__ = 'lead_matches'
+    
+    lead_id = Column(Integer, ForeignKey('leads.id'), primary_key=True, comment='ID of the matched lead')
+    property_id = Column(Integer, ForeignKey('properties.id'), primary_key=True, index=True, comment='ID of the matched property')
+    rank = Column(Integer, nullable=False, comment='Rank of the property among the matches of the lead (1 = best)')
+    score = Column(Float, nullable=False, comment='Combined match score')
+    similarity = Column(Float, nullable=False, comment='Cosine similarity of the lead requirements and the property embedding')
+    budget_fit = Column(Float, nullable=False, comment='How well the property price fits the lead budget: 1 inside it, falling to 0 at the tolerance edge')
+    listings_as_of = Column(DateTime, comment='Newest Property.updated_at seen by the matching run that wrote the match')
+    computed_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the match was computed')
+    
+    __table_args__ = (
+        Index('ix_lead_matches_lead_id_rank', 'lead_id', 'rank'),
+    )
+
+# Materialized analytics (refreshed incrementally by services/analytics.py)
+class PropertyValuation(Base):
+    __tablename__ = 'property_valuations'
+    
+    property_id = Column(Integer, ForeignKey('properties.id'), primary_key=True, comment='ID of the valued property')
+    community = Column(String(100), nullable=False, comment='Community of the market segment used for the valuation (empty when unknown)')
+    type = Column(String(20), nullable=False, comment='Property type of the market segment used for the valuation')
+    price_per_sqft = Column(Float, comment='Listed price divided by area')
+    estimated_value = Column(Float, nullable=False, comment='Value estimated from the price per square foot of comparable properties')
+    value_min = Column(Float, nullable=False, comment='Lower end of the estimated value range')
+    value_max = Column(Float, nullable=False, comment='Upper end of the estimated value range')
+    confidence = Column(Float, nullable=False, comment='Confidence of the estimate between 0 and 1')
+    comparable_ids = Column(Text, nullable=False, comment='IDs of the most similar properties in the segment, most similar first (JSON)')
+    comparable_scores = Column(Text, nullable=False, comment='Similarity scores of the comparable properties, in (0, 1] (JSON)')
+    property_updated_at = Column(DateTime, comment='Property.updated_at the valuation was computed from')
+    computed_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the valuation was computed')
+    
+    __table_args__ = (
+        Index('ix_property_valuations_type_community', 'type', 'community'),
+    )
+
+class MarketSegmentStats(Base):
+    __tablename__ = 'market_segment_stats'
+    
+    id = Column(Integer, primary_key=True, comment='Unique identifier for the segment')
+    community = Column(String(100), nullable=False, comment='Community of the segment')
+    type = Column(String(20), nullable=False, comment='Property type of the segment')
+    listings = Column(Integer, nullable=False, comment='Number of sale and off-plan listings with a valid price per square foot')
+    ppsf_min = Column(Float, comment="Price per square foot (min) across the segment's sale listings")
+    ppsf_p25 = Column(Float, comment="Price per square foot (p25) across the segment's sale listings")
+    ppsf_median = Column(Float, comment="Price per square foot (median) across the segment's sale listings")
+    ppsf_p75 = Column(Float, comment="Price per square foot (p75) across the segment's sale listings")
+    ppsf_max = Column(Float, comment="Price per square foot (max) across the segment's sale listings")
+    ppsf_mean = Column(Float, comment="Price per square foot (mean) across the segment's sale listings")
+    gross_yield = Column(Float, nullable=False, comment='Gross rental yield (median rent over median sale price per square foot)')
+    annual_growth = Column(Float, nullable=False, comment='Change in median price per square foot over the last year')
+    quarterly_growth = Column(Float, nullable=False, comment='Change in median price per square foot over the last quarter')
+    forecast_growth = Column(Float, nullable=False, comment='Forecast annual growth blended from annual and quarterly growth')
+    computed_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the statistics were computed')
+    
+    __table_args__ = (
+        Index('ux_market_segment_stats_type_community', 'type', 'community', unique=True),
+    )
+
+class InvestmentAnalysis(Base):
+    __tablename__ = 'investment_analyses'
+    
+    property_id = Column(Integer, ForeignKey('properties.id'), primary_key=True, comment='ID of the analysed property')
+    investment_period = Column(Integer, primary_key=True, comment='Holding period in years')
+    financing_percentage = Column(Integer, primary_key=True, comment='Share of the price financed by a mortgage (loan-to-value), in percent')
+    purchase_price = Column(Float, nullable=False, comment='Purchase price in AED')
+    estimated_rental_yield = Column(Float, nullable=False, comment='Estimated gross rental yield')
+    net_yield = Column(Float, nullable=False, comment='First-year rental yield after running costs')
+    leveraged_irr = Column(Float, comment='Internal rate of return on the equity invested')
+    unleveraged_irr = Column(Float, comment='Internal rate of return without financing')
+    break_even_point = Column(Float, comment='Years of operating cash flow needed to recover the initial outlay')
+    cash_flows = Column(Text, nullable=False, comment='Yearly rental income, expenses and cash flow (JSON list of CashFlowYear objects)')
+    computed_at = Column(DateTime, default=datetime.utcnow, comment='Timestamp when the analysis was computed')
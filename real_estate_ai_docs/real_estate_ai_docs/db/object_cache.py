@@ -0,0 +1,265 @@
+"""Read-through cache of rendered properties and leads for the hot detail queries.
+
+``property(id)`` and ``lead(id)`` are the most frequent GraphQL queries, and
+each costs the profile's query budget (:mod:`db.loading`: the row plus
+``features``/``images``, or the lead plus ``notes`` and agent). This cache
+serves the rendered ``property_detail`` and ``lead_detail`` dicts instead:
+
+* two tiers, both :mod:`db.cache` backends. A small in-process LRU is checked
+  first, then an optional shared backend (Redis). A shared hit is copied into
+  the local tier, and a miss loads every missing ID with one
+  :func:`db.loading.load_profile` call and fills both tiers. Errors writing
+  the shared tier are logged, not raised, so an outage only costs caching;
+* request coalescing: concurrent misses for the same key wait for the thread
+  already loading it instead of each querying the database, so an expired hot
+  key costs one load rather than a stampede;
+* invalidation from mapper events on the models each view is rendered from.
+  That covers ``Property``, ``Lead`` and the child rows ``PropertyFeature``,
+  ``PropertyImage`` and ``LeadNote``, which invalidate their parent. Keys
+  touched in a flush are dropped when the ORM transaction commits. A load that
+  overlaps an invalidation is returned but not stored, so a pre-commit read
+  cannot be written back over the invalidation.
+
+Writes that bypass the ORM (Core bulk imports) and renames of the assigned
+agent are not seen by the events. ``ttl`` bounds how long such entries can
+live. With a shared tier, other processes only see an invalidation in the
+shared backend, so their local copies live at most ``local_ttl`` seconds.
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .cache import CacheStats, LocalBackend
+from .loading import load_profile, render
+from .models import Lead, LeadNote, Property, PropertyFeature, PropertyImage
+
+log = logging.getLogger(__name__)
+
+CACHED_PROFILES = ('property_detail', 'lead_detail')
+
+# model -> (profile, attribute holding the ID of the cached row) whose entries a write to it makes stale
+_DEPENDENCIES = (
+    (Property, 'property_detail', 'id'),
+    (PropertyFeature, 'property_detail', 'property_id'),
+    (PropertyImage, 'property_detail', 'property_id'),
+    (Lead, 'lead_detail', 'id'),
+    (LeadNote, 'lead_detail', 'lead_id'),
+)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and '$datetime' in obj:
+        return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+
+def dumps(rendered):
+    return json.dumps(rendered, default=_encode, separators=(',', ':')).encode()
+
+
+def loads(payload):
+    return json.loads(payload, object_hook=_decode)
+
+
+class _Flight:
+    """One in-progress load that other threads wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Set by invalidate() while the load runs: its result must not be stored
+        self.stale = False
+
+
+class ObjectCache:
+    """Two-tier read-through cache of ``property_detail``/``lead_detail`` renders with coalesced misses."""
+
+    def __init__(self, shared=None, local=None, ttl=3600, local_ttl=5.0, track_orm_writes=True):
+        self.shared = shared
+        self.local = local if local is not None else LocalBackend(max_bytes=32 * 1024 * 1024)
+        self.ttl = ttl
+        # Without a shared tier the local tier is authoritative and only needs the overall ttl
+        self.local_ttl = local_ttl if shared is not None else ttl
+        self.stats = CacheStats()
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        if track_orm_writes:
+            self._listen_for_orm_writes()
+
+    @staticmethod
+    def key(profile, object_id):
+        return f'object:{profile}:{object_id}'
+
+    # Reads
+
+    def _cached(self, key):
+        payload = self.local.get(key)
+        if payload is None and self.shared is not None:
+            payload = self.shared.get(key)
+            if payload is not None:
+                self.local.set(key, payload, ex=self.local_ttl)
+        return payload
+
+    def get(self, session, profile, object_id):
+        """The rendered row, or ``None`` if it does not exist."""
+        return self.get_many(session, profile, [object_id])[0]
+
+    def get_many(self, session, profile, ids):
+        """Rendered rows for ``ids`` in the given order, ``None`` for missing ones."""
+        if profile not in CACHED_PROFILES:
+            raise ValueError(f"Unknown cached profile {profile!r}, expected one of {CACHED_PROFILES}")
+        ids = list(ids)
+        results = {}
+        missing = []
+        for object_id in dict.fromkeys(ids):
+            payload = self._cached(self.key(profile, object_id))
+            if payload is None:
+                missing.append(object_id)
+            else:
+                self.stats.hits += 1
+                self.stats.bytes_saved += len(payload)
+                results[object_id] = loads(payload)
+        if missing:
+            results.update(self._load(session, profile, missing))
+        return [results.get(object_id) for object_id in ids]
+
+    def _load(self, session, profile, ids):
+        """Load ``ids`` once across threads: claim the keys nobody is loading, wait for the rest."""
+        owned, waiting = {}, {}
+        with self._lock:
+            for object_id in ids:
+                key = self.key(profile, object_id)
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    owned[object_id] = (key, flight)
+                else:
+                    waiting[object_id] = flight
+        results = {}
+        if owned:
+            self.stats.misses += len(owned)
+            # Waiters block on the flights until they land, so they must land whatever fails below
+            error = None
+            try:
+                rows = load_profile(session, profile, list(owned))
+                rendered = {row.id: render(profile, row) for row in rows}
+                for object_id, (key, flight) in owned.items():
+                    value = rendered.get(object_id)
+                    results[object_id] = value
+                    if value is None or flight.stale:
+                        continue
+                    payload = dumps(value)
+                    self._shared_write(key, payload)
+                    # invalidate() marks the flight under the lock before deleting, so either it sees our local
+                    # entry and deletes it, or we see the mark and undo the shared write
+                    with self._lock:
+                        stale = flight.stale
+                        if not stale:
+                            self.local.set(key, payload, ex=self.local_ttl)
+                    if stale:
+                        self._shared_write(key, None)
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                self._land(owned, values=None if error else results, error=error)
+        for object_id, flight in waiting.items():
+            self.coalesced += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            results[object_id] = flight.value
+        return results
+
+    def _shared_write(self, key, payload):
+        """Store ``payload`` (or delete the key when None) in the shared tier; an outage only costs the caching."""
+        if self.shared is None:
+            return
+        try:
+            if payload is None:
+                self.shared.delete(key)
+            else:
+                self.shared.set(key, payload, ex=self.ttl)
+        except Exception:
+            log.exception("shared cache write failed for %s", key)
+
+    def _land(self, owned, values=None, error=None):
+        with self._lock:
+            for object_id, (key, flight) in owned.items():
+                flight.value = (values or {}).get(object_id)
+                flight.error = error
+                del self._flights[key]
+                flight.done.set()
+
+    def property(self, session, property_id):
+        return self.get(session, 'property_detail', property_id)
+
+    def lead(self, session, lead_id):
+        return self.get(session, 'lead_detail', lead_id)
+
+    # Invalidation
+
+    def invalidate(self, profile, *ids):
+        keys = [self.key(profile, object_id) for object_id in ids]
+        with self._lock:
+            for key in keys:
+                flight = self._flights.get(key)
+                if flight is not None:
+                    flight.stale = True
+        self.stats.invalidations += len(keys)
+        self.local.delete(*keys)
+        if self.shared is not None:
+            self.shared.delete(*keys)
+
+    def _listen_for_orm_writes(self):
+        dirty_key = f'object_cache_dirty:{id(self)}'
+
+        def marker(profile, attribute):
+            def mark(mapper, connection, target):
+                object_id = getattr(target, attribute)
+                if object_id is None:
+                    return
+                session = object_session(target)
+                if session is None:
+                    self.invalidate(profile, object_id)
+                else:
+                    session.info.setdefault(dirty_key, set()).add((profile, object_id))
+            return mark
+
+        def committed(session):
+            for profile, object_id in session.info.pop(dirty_key, ()):
+                self.invalidate(profile, object_id)
+
+        def rolled_back(session):
+            session.info.pop(dirty_key, None)
+
+        listeners = [(Session, 'after_commit', committed), (Session, 'after_rollback', rolled_back)]
+        for model, profile, attribute in _DEPENDENCIES:
+            mark = marker(profile, attribute)
+            # Child rows change the parent's render when added, too
+            names = ('after_update', 'after_delete') if attribute == 'id' else ('after_insert', 'after_update', 'after_delete')
+            listeners.extend((model, name, mark) for name in names)
+        for target, name, fn in listeners:
+            event.listen(target, name, fn)
+            self._listeners.append((target, name, fn))
+
+    def close(self):
+        for target, name, fn in self._listeners:
+            event.remove(target, name, fn)
+        self._listeners = []
+
+    def metrics(self):
+        return dict(self.stats.as_dict(), coalesced=self.coalesced, **self.local.stats())
@@ -0,0 +1,134 @@
+"""Keyset (cursor) pagination for the list fields of ``api/schema.graphql``.
+
+``LIMIT/OFFSET`` makes the database walk and discard every row before the
+requested page, so deep pages of long lead lists or chat histories get
+linearly slower. Here each page instead continues from the sort key of the
+last row returned, ``(created_at, id)`` or ``(timestamp, id)``. That key is
+opaque to clients as the ``endCursor`` of ``PageInfo``, and every page is one
+index range scan whatever its depth.
+
+The ``paginate_*`` functions take the GraphQL arguments and return the
+``LeadConnection``/``PropertyConnection`` shape::
+
+    {'edges': [...], 'pageInfo': {'hasNextPage', 'hasPreviousPage', 'startCursor', 'endCursor'}, 'totalCount': n}
+
+Pass ``after=page['pageInfo']['endCursor']`` to fetch the next page.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import func, or_, select, tuple_
+
+from .loading import get_profile
+from .models import ChatMessage, ChatSession, Lead, Property, Proposal
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """Opaque cursor for a sort key tuple."""
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return tuple(datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in payload)
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor(f"Invalid pagination cursor {cursor!r}") from exc
+
+
+def paginate(session, stmt, sort_columns, first=20, after=None, descending=True, include_total=True, profile=None):
+    """Return one page of ``stmt`` ordered by ``sort_columns``, starting after cursor ``after``.
+
+    ``sort_columns`` must end with a unique column (the primary key) and be
+    covered by an index together with the equality filters of ``stmt``. Sort
+    columns are assumed non-null. ``profile`` names a loading profile from
+    :mod:`db.loading` to apply to the rows.
+    """
+    if first < 0:
+        raise ValueError("first must be non-negative")
+    total = None
+    if include_total:
+        total = session.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+    key = tuple_(*sort_columns)
+    if after is not None:
+        values = decode_cursor(after)
+        if len(values) != len(sort_columns):
+            raise InvalidCursor(f"Cursor {after!r} does not match this list")
+        stmt = stmt.where(key < tuple_(*values) if descending else key > tuple_(*values))
+    stmt = stmt.order_by(*(c.desc() if descending else c.asc() for c in sort_columns)).limit(first + 1)
+    if profile is not None:
+        stmt = stmt.options(*get_profile(profile).options)
+    # Select the sort key alongside each row so cursors never depend on which columns a profile loads
+    results = session.execute(stmt.add_columns(*sort_columns)).unique().all()
+    has_next = len(results) > first
+    results = results[:first]
+    rows = [result[0] for result in results]
+    cursors = [encode_cursor(tuple(result[1:])) for result in (results[:1] + results[-1:])]
+    return {
+        'edges': rows,
+        'pageInfo': {
+            'hasNextPage': has_next,
+            'hasPreviousPage': after is not None,
+            'startCursor': cursors[0] if cursors else None,
+            'endCursor': cursors[-1] if cursors else None,
+        },
+        'totalCount': total,
+    }
+
+
+def paginate_leads(session, status=None, source=None, assigned_to=None, first=20, after=None, **options):
+    """``Query.leads``: newest first."""
+    stmt = select(Lead)
+    if status is not None:
+        stmt = stmt.where(Lead.status == status.lower())
+    if source is not None:
+        stmt = stmt.where(Lead.source == source.lower())
+    if assigned_to is not None:
+        stmt = stmt.where(Lead.assigned_to == assigned_to)
+    return paginate(session, stmt, (Lead.created_at, Lead.id), first, after, **options)
+
+
+def paginate_properties(session, type=None, status=None, category=None, min_price=None, max_price=None,
+                        bedrooms=None, location=None, first=20, after=None, **options):
+    """``Query.properties``: newest listings first."""
+    stmt = select(Property)
+    for column, value in ((Property.type, type), (Property.status, status), (Property.category, category)):
+        if value is not None:
+            stmt = stmt.where(column == value.lower().replace('_', '-'))
+    if min_price is not None:
+        stmt = stmt.where(Property.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Property.price <= max_price)
+    if bedrooms is not None:
+        stmt = stmt.where(Property.bedrooms == bedrooms)
+    if location is not None:
+        stmt = stmt.where(or_(Property.city == location, Property.community == location))
+    return paginate(session, stmt, (Property.created_at, Property.id), first, after, **options)
+
+
+def paginate_proposals(session, lead_id=None, status=None, first=10, after=None, **options):
+    """``Query.proposals``: newest first."""
+    stmt = select(Proposal)
+    if lead_id is not None:
+        stmt = stmt.where(Proposal.lead_id == lead_id)
+    if status is not None:
+        stmt = stmt.where(Proposal.status == status.lower())
+    return paginate(session, stmt, (Proposal.created_at, Proposal.id), first, after, **options)
+
+
+def paginate_chat_sessions(session, user_id, first=10, after=None, **options):
+    """``Query.chatSessions`` for one user: newest first."""
+    stmt = select(ChatSession).where(ChatSession.user_id == user_id)
+    return paginate(session, stmt, (ChatSession.created_at, ChatSession.id), first, after, **options)
+
+
+def paginate_chat_messages(session, session_id, first=20, after=None, **options):
+    """``Query.chatMessages`` / ``ChatSession.messages``: most recent first, paging back through history."""
+    stmt = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    return paginate(session, stmt, (ChatMessage.timestamp, ChatMessage.id), first, after, **options)
@@ -0,0 +1,173 @@
+"""Compressed embedding encodings with exact re-ranking.
+
+Two encodings of ``Embedding.vector`` are available:
+
+* :class:`ScalarQuantizer` - one byte per dimension (4x smaller than float32),
+  using a per-dimension min/max range.
+* :class:`ProductQuantizer` - the vector is split into ``m`` sub-vectors, each
+  replaced by the index of its nearest of 256 k-means centroids (``m`` bytes
+  per vector).
+
+:class:`QuantizedIndex` scans the compact codes to shortlist ``rerank``
+candidates, then re-scores only those rows at full precision with an
+:class:`~db.vector_search.ExactIndex`. That index can be backed by an
+:class:`~db.embedding_store.EmbeddingStore`, so full vectors stay on disk / in
+the page cache rather than in every worker's heap.
+"""
+import numpy as np
+
+from .ann_index import assign_nearest, kmeans
+from .vector_search import METRICS, top_k
+
+
+def _prepare(vectors, metric):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if metric == 'cosine':
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    return vectors
+
+
+class ScalarQuantizer:
+    """Per-dimension linear quantisation to ``uint8``."""
+
+    name = 'int8'
+
+    def __init__(self):
+        self.low = None
+        self.scale = None
+
+    @property
+    def dimensions(self):
+        return len(self.low)
+
+    @property
+    def bytes_per_vector(self):
+        return self.dimensions
+
+    def train(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.low = vectors.min(axis=0)
+        span = vectors.max(axis=0) - self.low
+        self.scale = np.where(span > 0, span / 255.0, 1.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return self.low + codes.astype(np.float32) * self.scale
+
+    def scores(self, codes, query, chunk_size=16384):
+        """Approximate inner products of ``query`` with every encoded row."""
+        # q . (low + scale * code) == q . low + (q * scale) . code
+        weights = query * self.scale
+        offset = float(query @ self.low)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            block = codes[start:start + chunk_size].astype(np.float32)
+            scores[start:start + chunk_size] = block @ weights + offset
+        return scores
+
+
+class ProductQuantizer:
+    """Product quantisation with ``m`` sub-spaces of 256 centroids each."""
+
+    def __init__(self, m=96, n_iter=15, seed=0, sample_size=50_000):
+        self.m = m
+        self.n_iter = n_iter
+        self.seed = seed
+        self.sample_size = sample_size
+        self.codebooks = None  # (m, 256, dimensions // m)
+
+    @property
+    def name(self):
+        return f'pq{self.m}'
+
+    @property
+    def dimensions(self):
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    @property
+    def bytes_per_vector(self):
+        return self.m
+
+    def _split(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[1] % self.m:
+            raise ValueError(f"{vectors.shape[1]} dimensions cannot be split into {self.m} sub-vectors")
+        return vectors.reshape(len(vectors), self.m, -1)
+
+    def train(self, vectors):
+        parts = self._split(vectors)
+        if len(parts) < 256:
+            raise ValueError("Product quantisation needs at least 256 training vectors")
+        self.codebooks = np.stack([
+            kmeans(parts[:, j], 256, n_iter=self.n_iter, seed=self.seed + j, sample_size=self.sample_size)
+            for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, vectors):
+        parts = self._split(vectors)
+        codes = np.empty((len(parts), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign_nearest(np.ascontiguousarray(parts[:, j]), self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        return self.codebooks[np.arange(self.m), codes].reshape(len(codes), -1)
+
+    def scores(self, codes, query, chunk_size=65536):
+        """Asymmetric distance computation: sum per-sub-space lookup-table entries."""
+        table = np.einsum('jcd,jd->jc', self.codebooks, query.reshape(self.m, -1))
+        columns = np.arange(self.m)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            scores[start:start + chunk_size] = table[columns, codes[start:start + chunk_size]].sum(axis=1)
+        return scores
+
+
+class QuantizedIndex:
+    """Two-stage search: scan compressed codes, re-rank the shortlist at full precision."""
+
+    def __init__(self, quantizer, exact_index, rerank=100):
+        if exact_index.metric not in METRICS:
+            raise ValueError(f"Unsupported metric {exact_index.metric!r}")
+        self.quantizer = quantizer
+        self.exact_index = exact_index
+        self.metric = exact_index.metric
+        self.rerank = rerank
+        self.codes = None
+
+    @classmethod
+    def build(cls, quantizer, exact_index, rerank=100, train_size=100_000, seed=0, chunk_size=16384):
+        """Train ``quantizer`` on a sample of ``exact_index`` and encode every row."""
+        matrix = exact_index.matrix
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(matrix), min(train_size, len(matrix)), replace=False))
+        quantizer.train(_prepare(matrix[sample], exact_index.metric))
+        index = cls(quantizer, exact_index, rerank=rerank)
+        index.codes = np.concatenate([
+            quantizer.encode(_prepare(matrix[start:start + chunk_size], exact_index.metric))
+            for start in range(0, len(matrix), chunk_size)
+        ]) if len(matrix) else np.empty((0, quantizer.bytes_per_vector), dtype=np.uint8)
+        return index
+
+    @property
+    def bytes_per_vector(self):
+        return self.quantizer.bytes_per_vector
+
+    def __len__(self):
+        return len(self.codes)
+
+    def search(self, query, k=10, rerank=None):
+        """Return up to ``k`` ``(property_id, score)`` pairs; ``rerank=0`` skips the exact stage."""
+        rerank = self.rerank if rerank is None else rerank
+        approximate = self.quantizer.scores(self.codes, _prepare(query, self.metric)[0])
+        if not rerank:
+            rows = top_k(approximate, k)
+            return list(zip(self.exact_index.ids[rows].tolist(), approximate[rows].tolist()))
+        shortlist = top_k(approximate, max(k, rerank))
+        return self.exact_index.search_rows(query, shortlist, k)
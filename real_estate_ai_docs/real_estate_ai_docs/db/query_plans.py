@@ -0,0 +1,181 @@
+"""Query-plan check for the canonical GraphQL/REST queries.
+
+Each entry in :data:`CANONICAL_QUERIES` is the SQL behind one field of
+``api/schema.graphql`` (``leads``, ``properties``, ``chatMessages``, ...) with
+representative filter values. :func:`check_query_plans` runs ``EXPLAIN`` for
+each of them on a seeded database and flags any plan that reads a table with a
+full scan:
+
+* SQLite - a ``SCAN <table>`` step without ``USING INDEX`` (the scratch
+  database is not ANALYZEd, so the planner judges by index shape rather than
+  by the statistics of a few seed rows);
+* PostgreSQL - a ``Seq Scan`` node, checked with ``enable_seqscan = off`` so a
+  small seeded database does not hide a missing index.
+
+Run it against a scratch SQLite database (created and seeded automatically) or
+an existing one::
+
+    python -m db.query_plans
+    python -m db.query_plans --database-url postgresql://localhost/real_estate
+
+The process exits non-zero when any canonical query falls back to a full scan.
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .models import (Base, ChatMessage, ChatSession, Embedding, Lead, LeadNote, Property, PropertyFeature,
+                     PropertyImage, Proposal, ProposalSection, User)
+
+PAGE_SIZE = 20
+
+CANONICAL_QUERIES = {
+    # Query.leads(status, source, assignedTo)
+    'leads': lambda: select(Lead).order_by(Lead.created_at.desc()).limit(PAGE_SIZE),
+    'leads_by_status': lambda: select(Lead).where(Lead.status == 'new').order_by(Lead.created_at.desc()).limit(PAGE_SIZE),
+    'leads_by_source': lambda: select(Lead).where(Lead.source == 'bayut').order_by(Lead.created_at.desc()).limit(PAGE_SIZE),
+    'leads_by_agent_status': lambda: select(Lead).where(Lead.assigned_to == 1, Lead.status == 'qualified')
+        .order_by(Lead.created_at.desc()).limit(PAGE_SIZE),
+    'open_leads_by_agent': lambda: select(Lead).where(Lead.assigned_to == 1, Lead.status.notin_(['closed', 'lost']))
+        .order_by(Lead.created_at.desc()).limit(PAGE_SIZE),
+    # Lead.notes / Lead.proposals
+    'lead_notes': lambda: select(LeadNote).where(LeadNote.lead_id == 1).order_by(LeadNote.created_at),
+    'lead_proposals': lambda: select(Proposal).where(Proposal.lead_id == 1).order_by(Proposal.created_at.desc()),
+    # Query.properties(type, status, category, minPrice, maxPrice, bedrooms, location)
+    'properties': lambda: select(Property).order_by(Property.created_at.desc()).limit(PAGE_SIZE),
+    'properties_by_status_category_price': lambda: select(Property)
+        .where(Property.status == 'sold', Property.category == 'sale', Property.price.between(1_000_000, 5_000_000))
+        .limit(PAGE_SIZE),
+    'available_properties_by_price': lambda: select(Property)
+        .where(Property.status == 'available', Property.category == 'sale', Property.price <= 5_000_000)
+        .order_by(Property.price).limit(PAGE_SIZE),
+    'properties_by_type_bedrooms': lambda: select(Property)
+        .where(Property.type == 'villa', Property.bedrooms == 3, Property.price <= 5_000_000).limit(PAGE_SIZE),
+    'properties_by_location': lambda: select(Property)
+        .where(or_(Property.city == 'Arabian Ranches', Property.community == 'Arabian Ranches')).limit(PAGE_SIZE),
+    'properties_by_community_type_bedrooms': lambda: select(Property)
+        .where(Property.community == 'Arabian Ranches', Property.type == 'villa', Property.bedrooms == 3).limit(PAGE_SIZE),
+    # Property.features / Property.images / embedding lookup
+    'property_features': lambda: select(PropertyFeature).where(PropertyFeature.property_id.in_([1, 2, 3])),
+    'property_images': lambda: select(PropertyImage).where(PropertyImage.property_id.in_([1, 2, 3])),
+    'property_embedding': lambda: select(Embedding).where(Embedding.property_id == 1),
+    # Query.proposals(leadId, status) / Proposal.sections
+    'proposals_by_status': lambda: select(Proposal).where(Proposal.status == 'sent')
+        .order_by(Proposal.created_at.desc()).limit(PAGE_SIZE),
+    'proposals_by_property': lambda: select(Proposal).where(Proposal.property_id == 1),
+    'proposal_sections': lambda: select(ProposalSection).where(ProposalSection.proposal_id == 1)
+        .order_by(ProposalSection.order),
+    # Query.chatSessions / Query.chatMessages(sessionId)
+    'chat_sessions': lambda: select(ChatSession).where(ChatSession.user_id == 1)
+        .order_by(ChatSession.updated_at.desc()).limit(PAGE_SIZE),
+    'chat_messages': lambda: select(ChatMessage).where(ChatMessage.session_id == 1)
+        .order_by(ChatMessage.timestamp.desc()).limit(PAGE_SIZE),
+    # Keyset pages (db/pagination.py): continue after a (created_at, id) / (timestamp, id) cursor
+    'leads_by_status_page': lambda: select(Lead)
+        .where(Lead.status == 'new', tuple_(Lead.created_at, Lead.id) < tuple_(datetime(2024, 1, 1), 1000))
+        .order_by(Lead.created_at.desc(), Lead.id.desc()).limit(PAGE_SIZE + 1),
+    'chat_messages_page': lambda: select(ChatMessage)
+        .where(ChatMessage.session_id == 1, tuple_(ChatMessage.timestamp, ChatMessage.id) < tuple_(datetime(2024, 1, 1), 1000))
+        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(PAGE_SIZE + 1),
+}
+
+_SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def seed_minimal(session, rows=200):
+    """Insert a few rows per table so plans are produced against real data."""
+    now = datetime.utcnow()
+    session.add(User(id=1, email='agent@example.com', password_hash='x', first_name='Agent', last_name='One',
+                     role='agent', agency='Example Realty'))
+    statuses = ['new', 'contacted', 'qualified', 'closed', 'lost']
+    communities = ['Arabian Ranches', 'Dubai Marina', 'Downtown Dubai', 'Jumeirah Village Circle', 'Al Reem Island']
+    cities = ['Dubai', 'Dubai', 'Dubai', 'Dubai', 'Abu Dhabi']
+    for i in range(1, rows + 1):
+        created = now - timedelta(hours=i)
+        session.add(Lead(id=i, first_name='Lead', last_name=str(i), email=f'lead{i}@example.com',
+                         status=statuses[i % len(statuses)], source='bayut', assigned_to=1, created_at=created))
+        session.add(LeadNote(lead_id=i, content='Called', created_by=1, created_at=created))
+        session.add(Property(id=i, reference=f'REF-{i}', title=f'Property {i}', type='villa', status='available',
+                             category='sale', price=1_000_000 + 10_000 * i, area=2000, bedrooms=i % 5,
+                             community=communities[i % len(communities)], city=cities[i % len(cities)],
+                             created_at=created))
+        session.add(PropertyFeature(property_id=i, feature='Pool'))
+        session.add(PropertyImage(property_id=i, url=f'https://example.com/{i}.jpg'))
+        session.add(Proposal(id=i, property_id=i, lead_id=i, title='Proposal', created_by_id=1, created_at=created))
+        session.add(ProposalSection(proposal_id=i, title='Details', content='...', type='property_details', order=1))
+        session.add(ChatSession(id=i, user_id=1, created_at=created, updated_at=created))
+        session.add(ChatMessage(session_id=i, role='user', content='Hello', language='en', timestamp=created))
+    session.commit()
+
+
+def explain(connection, stmt):
+    """Return ``(plan_lines, full_scan_tables)`` for ``stmt`` on the connection's dialect."""
+    sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        lines = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        scans = [m.group(1) for m in map(_SQLITE_FULL_SCAN.match, lines) if m]
+        return lines, scans
+    if dialect == 'postgresql':
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        lines, scans = [], []
+
+        def walk(node, depth=0):
+            lines.append('  ' * depth + node['Node Type'] + (f" on {node['Relation Name']}" if 'Relation Name' in node else '')
+                         + (f" using {node['Index Name']}" if 'Index Name' in node else ''))
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+
+        walk(plan[0]['Plan'])
+        return lines, scans
+    raise ValueError(f"Query plan check is not implemented for {dialect}")
+
+
+def check_query_plans(engine, queries=None):
+    """Explain every canonical query; returns ``{name: (plan_lines, full_scan_tables)}``."""
+    results = {}
+    with engine.connect() as connection:
+        for name, build in (queries or CANONICAL_QUERIES).items():
+            with connection.begin():
+                results[name] = explain(connection, build())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a canonical query falls back to a full table scan")
+    parser.add_argument('--database-url', help="database to check (default: seeded in-memory SQLite)")
+    parser.add_argument('--verbose', '-v', action='store_true', help="print every plan, not just failures")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed_minimal(session)
+
+    failures = 0
+    for name, (lines, scans) in check_query_plans(engine).items():
+        status = 'FULL SCAN ' + ', '.join(scans) if scans else 'ok'
+        failures += bool(scans)
+        print(f"{name:<40} {status}")
+        if scans or args.verbose:
+            for line in lines:
+                print(f"    {line}")
+    if failures:
+        print(f"{failures} canonical queries fall back to a full scan")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
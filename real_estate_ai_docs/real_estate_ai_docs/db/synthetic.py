@@ -0,0 +1,458 @@
+"""Deterministic synthetic data for the whole schema, at production scale.
+
+    python -m db.synthetic --database-url sqlite:///scale.db --properties 1000000 --leads 1000000
+
+Rows are drawn from distributions shaped like the Dubai market rather than
+uniform noise, so the planner and the caches see realistic selectivities:
+
+* properties sit in :data:`COMMUNITIES` (weighted by listing volume), with a
+  type mix, bedrooms by type, area by bedrooms and an AED price of area times
+  the community's price per sqft with log-normal spread (rentals are priced
+  as annual rent);
+* leads have log-normal AED budgets, a skewed pipeline status and source, and
+  a negative-binomial number of notes (most leads have a few notes, a few
+  have dozens), as do agents' chat sessions and their messages;
+* free text (requirements, notes, proposal sections, chat) is written in
+  English, Arabic or French according to :data:`LANGUAGES`;
+* each property gets a unit 1536-dimensional embedding near its community's
+  centroid, so nearest-neighbour queries return sensible neighbourhoods.
+
+The same ``seed`` always produces the same rows: each table draws from its
+own generator seeded with ``(seed, table)``, so changing one table's count
+does not shift the others. IDs are assigned explicitly from 1, so
+:func:`generate` expects empty tables. Rows are written with Core
+``executemany`` in batches, never through the ORM, and the secondary indexes of
+each loaded table are dropped during the load and rebuilt afterwards, which is
+much cheaper than maintaining them row by row.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+
+from .models import (EMBEDDING_DIMENSIONS, Base, ChatMessage, ChatSession, Embedding, Lead, LeadNote, Property,
+                     PropertyFeature, PropertyImage, Proposal, ProposalSection, User)
+
+# (community, city, latitude, longitude, AED per sqft, relative listing volume)
+COMMUNITIES = (
+    ('Dubai Marina', 'Dubai', 25.0805, 55.1403, 1850, 14),
+    ('Downtown Dubai', 'Dubai', 25.1972, 55.2744, 2600, 12),
+    ('Jumeirah Village Circle', 'Dubai', 25.0587, 55.2094, 1050, 16),
+    ('Business Bay', 'Dubai', 25.1851, 55.2632, 1900, 11),
+    ('Palm Jumeirah', 'Dubai', 25.1124, 55.1390, 3300, 6),
+    ('Arabian Ranches', 'Dubai', 25.0553, 55.2687, 1400, 5),
+    ('Dubai Hills Estate', 'Dubai', 25.1029, 55.2416, 2000, 8),
+    ('Jumeirah Lake Towers', 'Dubai', 25.0693, 55.1413, 1300, 7),
+    ('Dubai Creek Harbour', 'Dubai', 25.2006, 55.3448, 2100, 5),
+    ('Damac Hills', 'Dubai', 25.0231, 55.2514, 1150, 5),
+    ('Al Furjan', 'Dubai', 25.0260, 55.1443, 1200, 4),
+    ('Mohammed Bin Rashid City', 'Dubai', 25.1686, 55.3063, 2200, 3),
+    ('Al Reem Island', 'Abu Dhabi', 24.4991, 54.4066, 1250, 3),
+    ('Saadiyat Island', 'Abu Dhabi', 24.5437, 54.4350, 2300, 1),
+)
+DEVELOPERS = ('Emaar', 'Nakheel', 'Damac', 'Meraas', 'Sobha', 'Ellington', 'Select Group', 'Aldar')
+
+# (type, weight, possible bedrooms, sqft at 0 bedrooms, sqft per bedroom)
+PROPERTY_TYPES = (
+    ('apartment', 55, (0, 1, 2, 3, 4), 450, 420),
+    ('villa', 14, (3, 4, 5, 6), 1200, 650),
+    ('townhouse', 12, (2, 3, 4), 900, 520),
+    ('penthouse', 3, (3, 4, 5), 2000, 700),
+    ('office', 8, (0,), 1400, 0),
+    ('retail', 4, (0,), 1100, 0),
+    ('land', 4, (0,), 8000, 0),
+)
+PROPERTY_STATUSES = (('available', 70), ('sold', 15), ('rented', 10), ('off-plan', 5))
+CATEGORIES = (('sale', 65), ('rent', 28), ('off-plan', 7))
+FEATURES = ('Pool', 'Gym', 'Balcony', 'Sea View', 'Burj Khalifa View', 'Maid Room', 'Covered Parking',
+            'Private Garden', 'Concierge', 'Pets Allowed', 'Study', 'Built-in Wardrobes', 'Kids Play Area')
+
+LEAD_STATUSES = (('new', 30), ('contacted', 25), ('qualified', 15), ('proposal', 10), ('negotiation', 5),
+                 ('closed', 5), ('lost', 10))
+LEAD_SOURCES = (('website', 25), ('bayut', 30), ('property_finder', 25), ('referral', 10), ('direct', 6), ('other', 4))
+NATIONALITIES = (('Indian', 20), ('British', 12), ('Emirati', 8), ('Russian', 9), ('Pakistani', 7), ('Egyptian', 6),
+                 ('Saudi', 6), ('French', 5), ('Chinese', 6), ('Lebanese', 4), ('German', 4), ('Canadian', 3),
+                 ('Moroccan', 3), ('Italian', 3), ('Nigerian', 4))
+FIRST_NAMES = ('Ahmed', 'Fatima', 'Mohammed', 'Aisha', 'Omar', 'Layla', 'Raj', 'Priya', 'James', 'Emma', 'Olga',
+               'Dmitri', 'Pierre', 'Camille', 'Wei', 'Mei', 'Youssef', 'Nour', 'Hans', 'Sofia')
+LAST_NAMES = ('Al Mansouri', 'Khan', 'Sharma', 'Smith', 'Ivanov', 'Dubois', 'Hassan', 'Chen', 'Haddad', 'Müller',
+              'Rossi', 'Okafor', 'Patel', 'Al Falasi', 'Martin', 'Benali', 'Brown', 'Nair', 'Petrova', 'Farouk')
+
+LANGUAGES = (('en', 60), ('ar', 25), ('fr', 15))
+PROPOSAL_STATUSES = (('draft', 25), ('sent', 35), ('viewed', 20), ('accepted', 8), ('rejected', 12))
+SECTION_TYPES = ('property_details', 'financial_analysis', 'location_insights', 'payment_plan', 'visa_information')
+
+TEXT = {
+    'en': {
+        'requirements': "Looking for a {bedrooms}-bedroom {type} in {community}, budget around AED {budget:,.0f}.",
+        'notes': ("Called, interested in {community}.", "Sent listings in {community}, waiting for feedback.",
+                  "Viewing booked for a {type} in {community}.", "Asked about payment plans and mortgage options."),
+        'section': "{title}: {type} of {area:,.0f} sqft in {community}, priced at AED {price:,.0f}.",
+        'user': ("Show me {type}s in {community} under AED {price:,.0f}.", "What is the rental yield in {community}?",
+                 "Is {community} eligible for the golden visa?"),
+        'assistant': ("Here are three {type}s in {community} within your budget.",
+                      "Gross yields in {community} are around 6-7% for this type of unit."),
+    },
+    'ar': {
+        'requirements': "يبحث عن {type} من {bedrooms} غرف نوم في {community} بميزانية حوالي {budget:,.0f} درهم.",
+        'notes': ("تم الاتصال، مهتم بمنطقة {community}.", "تم إرسال العروض في {community} بانتظار الرد.",
+                  "تم حجز معاينة لـ {type} في {community}.", "استفسر عن خطط الدفع والتمويل العقاري."),
+        'section': "{title}: {type} بمساحة {area:,.0f} قدم مربع في {community} بسعر {price:,.0f} درهم.",
+        'user': ("أرني {type} في {community} بأقل من {price:,.0f} درهم.", "ما هو العائد الإيجاري في {community}؟",
+                 "هل {community} مؤهلة للإقامة الذهبية؟"),
+        'assistant': ("إليك ثلاثة عقارات من نوع {type} في {community} ضمن ميزانيتك.",
+                      "العائد الإجمالي في {community} حوالي 6-7% لهذا النوع من الوحدات."),
+    },
+    'fr': {
+        'requirements': "Recherche un(e) {type} de {bedrooms} chambres à {community}, budget d'environ {budget:,.0f} AED.",
+        'notes': ("Appelé, intéressé par {community}.", "Annonces envoyées pour {community}, en attente de retour.",
+                  "Visite prévue pour un(e) {type} à {community}.", "A demandé les plans de paiement et le crédit immobilier."),
+        'section': "{title} : {type} de {area:,.0f} pieds carrés à {community}, au prix de {price:,.0f} AED.",
+        'user': ("Montrez-moi des {type}s à {community} à moins de {price:,.0f} AED.",
+                 "Quel est le rendement locatif à {community} ?", "{community} est-il éligible au visa doré ?"),
+        'assistant': ("Voici trois {type}s à {community} dans votre budget.",
+                      "Le rendement brut à {community} est d'environ 6-7 % pour ce type de bien."),
+    },
+}
+
+EPOCH = datetime(2022, 1, 1)
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+# Rows are drawn in fixed-size chunks so the data does not depend on the insert batch size
+CHUNK_SIZE = 10_000
+_TABLE_SEEDS = {name: i for i, name in enumerate(
+    ('users', 'properties', 'features', 'images', 'embeddings', 'leads', 'notes', 'proposals', 'chat'))}
+
+
+def _rng(seed, table):
+    return np.random.default_rng([seed, _TABLE_SEEDS[table]])
+
+
+def _choice(rng, weighted, size):
+    """Indices into ``weighted`` (``(value, weight, ...)`` tuples) drawn by weight."""
+    weights = np.array([item[1] for item in weighted], dtype=np.float64)
+    return rng.choice(len(weighted), size=size, p=weights / weights.sum())
+
+
+def _counts(rng, mean, size, dispersion=1.5):
+    """Negative-binomial counts with the given mean: mostly small, with a long tail."""
+    return rng.negative_binomial(dispersion, dispersion / (dispersion + mean), size=size)
+
+
+def _skewed(rng, n, size):
+    """IDs ``1..n`` where low IDs are more likely (density ~ 1/sqrt): a few agents carry big books."""
+    return np.floor(n * rng.random(size) ** 2).astype(np.int64) + 1
+
+
+def _timestamps(rng, size):
+    return rng.integers(0, SPAN_SECONDS, size=size)
+
+
+def _datetime(seconds):
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+class _Loader:
+    """Batches rows per table into Core ``executemany`` inserts and counts them."""
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def __call__(self, table, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(table, batch)
+                batch = []
+        if batch:
+            self._flush(table, batch)
+
+    def _flush(self, table, batch):
+        self.connection.execute(insert(table), batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+
+
+def _users(seed, count):
+    rng = _rng(seed, 'users')
+    first = rng.integers(len(FIRST_NAMES), size=count)
+    last = rng.integers(len(LAST_NAMES), size=count)
+    for i in range(count):
+        yield {'id': i + 1, 'email': f'agent{i + 1}@example.com', 'password_hash': 'x',
+               'first_name': FIRST_NAMES[first[i]], 'last_name': LAST_NAMES[last[i]],
+               'role': 'admin' if i == count - 1 else 'agent', 'agency': f'Agency {i % 25 + 1}',
+               'created_at': EPOCH, 'updated_at': EPOCH}
+
+
+def _property_chunk(rng, start, size):
+    """Column arrays for properties ``start + 1 .. start + size``."""
+    community = _choice(rng, [(c[0], c[5]) for c in COMMUNITIES], size)
+    kind = _choice(rng, PROPERTY_TYPES, size)
+    bedrooms = np.array([PROPERTY_TYPES[k][2][j % len(PROPERTY_TYPES[k][2])]
+                         for k, j in zip(kind, rng.integers(0, 60, size=size))])
+    base = np.array([PROPERTY_TYPES[k][3] for k in kind])
+    per_bedroom = np.array([PROPERTY_TYPES[k][4] for k in kind])
+    area = np.round((base + per_bedroom * bedrooms) * rng.lognormal(0, 0.2, size=size))
+    ppsf = np.array([COMMUNITIES[c][4] for c in community]) * rng.lognormal(0, 0.18, size=size)
+    category = _choice(rng, CATEGORIES, size)
+    price = area * ppsf
+    # Rentals are listed at their annual rent (gross yield of 5-8%)
+    price = np.where(category == 1, price * rng.uniform(0.05, 0.08, size=size), price)
+    return {
+        'id': np.arange(start + 1, start + size + 1), 'community': community, 'kind': kind, 'bedrooms': bedrooms,
+        'area': area, 'price': np.round(price, -3), 'category': category,
+        'status': _choice(rng, PROPERTY_STATUSES, size),
+        'developer': rng.integers(len(DEVELOPERS), size=size),
+        'jitter': rng.normal(0, 0.008, size=(size, 2)),
+        'created': _timestamps(rng, size),
+    }
+
+
+def _properties(seed, count):
+    rng = _rng(seed, 'properties')
+    for start in range(0, count, CHUNK_SIZE):
+        c = _property_chunk(rng, start, min(CHUNK_SIZE, count - start))
+        for i in range(len(c['id'])):
+            community = COMMUNITIES[c['community'][i]]
+            kind = PROPERTY_TYPES[c['kind'][i]][0]
+            bedrooms = int(c['bedrooms'][i])
+            created = _datetime(c['created'][i])
+            off_plan = CATEGORIES[c['category'][i]][0] == 'off-plan'
+            yield {
+                'id': int(c['id'][i]), 'reference': f'REF-{int(c["id"][i]):08d}',
+                'title': f'{bedrooms}BR {kind.title()} in {community[0]}' if bedrooms else f'{kind.title()} in {community[0]}',
+                'description': f'{kind.title()} of {c["area"][i]:,.0f} sqft in {community[0]}, {community[1]}.',
+                'type': kind, 'status': 'off-plan' if off_plan else PROPERTY_STATUSES[c['status'][i]][0],
+                'category': CATEGORIES[c['category'][i]][0], 'price': float(c['price'][i]),
+                'area': float(c['area'][i]), 'bedrooms': bedrooms, 'bathrooms': bedrooms + 1 if bedrooms else 1,
+                'address': f'{community[0]}, {community[1]}', 'community': community[0], 'city': community[1],
+                'latitude': community[2] + float(c['jitter'][i][0]), 'longitude': community[3] + float(c['jitter'][i][1]),
+                'developer': DEVELOPERS[c['developer'][i]],
+                'completion_date': created + timedelta(days=720) if off_plan else None,
+                'created_at': created, 'updated_at': created,
+            }
+
+
+def _features_and_images(seed, count):
+    features_rng, images_rng = _rng(seed, 'features'), _rng(seed, 'images')
+    features, images = [], []
+    for property_id in range(1, count + 1):
+        for feature in features_rng.choice(len(FEATURES), size=int(features_rng.integers(2, 7)), replace=False):
+            features.append({'property_id': property_id, 'feature': FEATURES[feature]})
+        for n in range(int(images_rng.integers(3, 12))):
+            images.append({'property_id': property_id, 'url': f'https://cdn.example.com/properties/{property_id}/{n}.jpg',
+                           'is_floor_plan': n == 0})
+        if len(images) >= 10_000:
+            yield features, images
+            features, images = [], []
+    yield features, images
+
+
+def _embeddings(seed, count):
+    """Unit vectors near the centroid of each property's community, as packed float32 bytes."""
+    rng = _rng(seed, 'embeddings')
+    centroids = rng.standard_normal((len(COMMUNITIES), EMBEDDING_DIMENSIONS)).astype(np.float32)
+    # Re-draw the community column exactly as _properties did
+    property_rng = _rng(seed, 'properties')
+    created = EPOCH
+    for start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - start)
+        community = _property_chunk(property_rng, start, size)['community']
+        vectors = centroids[community] + 1.5 * rng.standard_normal((size, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for i in range(size):
+            yield {'property_id': start + i + 1, 'vector': vectors[i].tobytes(), 'content_hash': None,
+                   'created_at': created, 'updated_at': created}
+
+
+def _leads(seed, count, agents):
+    rng = _rng(seed, 'leads')
+    for start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - start)
+        first, last = rng.integers(len(FIRST_NAMES), size=size), rng.integers(len(LAST_NAMES), size=size)
+        status, source = _choice(rng, LEAD_STATUSES, size), _choice(rng, LEAD_SOURCES, size)
+        nationality = _choice(rng, NATIONALITIES, size)
+        language = _choice(rng, LANGUAGES, size)
+        agent = _skewed(rng, agents, size)
+        budget = np.round(rng.lognormal(np.log(2_500_000), 0.7, size=size), -4)
+        community = _choice(rng, [(c[0], c[5]) for c in COMMUNITIES], size)
+        kind = _choice(rng, PROPERTY_TYPES[:4], size)
+        bedrooms = rng.integers(1, 5, size=size)
+        created = _timestamps(rng, size)
+        contacted = created + rng.integers(3600, 30 * 86400, size=size)
+        for i in range(size):
+            lead_id = start + i + 1
+            status_name = LEAD_STATUSES[status[i]][0]
+            language_name = LANGUAGES[language[i]][0]
+            yield {
+                'id': lead_id, 'first_name': FIRST_NAMES[first[i]], 'last_name': LAST_NAMES[last[i]],
+                'email': f'lead{lead_id}@example.com', 'phone': f'+9715{lead_id % 100_000_000:08d}',
+                'nationality': NATIONALITIES[nationality[i]][0], 'status': status_name,
+                'source': LEAD_SOURCES[source[i]][0], 'assigned_to': int(agent[i]),
+                'budget_min': float(budget[i] * 0.8), 'budget_max': float(budget[i] * 1.1),
+                'requirements': TEXT[language_name]['requirements'].format(
+                    bedrooms=int(bedrooms[i]), type=PROPERTY_TYPES[kind[i]][0], community=COMMUNITIES[community[i]][0],
+                    budget=budget[i]),
+                'created_at': _datetime(created[i]), 'updated_at': _datetime(max(created[i], contacted[i])),
+                'last_contacted_at': None if status_name == 'new' else _datetime(contacted[i]),
+                # Not columns: carried to the note and proposal generators
+                '_language': language_name, '_community': COMMUNITIES[community[i]][0],
+                '_type': PROPERTY_TYPES[kind[i]][0], '_created': int(created[i]),
+            }
+
+
+def _lead_children(lead, properties, notes_mean, proposals_mean, counters):
+    """Notes, proposals and proposal sections of one lead (``counters`` holds the next IDs)."""
+    rng = counters['rng']
+    text = TEXT[lead['_language']]
+    notes, proposals, sections = [], [], []
+    values = {'community': lead['_community'], 'type': lead['_type']}
+    for n in range(int(_counts(rng, notes_mean, None))):
+        notes.append({'lead_id': lead['id'], 'content': text['notes'][(lead['id'] + n) % len(text['notes'])].format(**values),
+                      'created_by': lead['assigned_to'],
+                      'created_at': _datetime(min(SPAN_SECONDS - 1, lead['_created'] + 3600 * (n + 1) * 24))})
+    if lead['status'] in ('new', 'contacted'):
+        return notes, proposals, sections
+    for n in range(int(rng.poisson(proposals_mean))):
+        counters['proposal'] += 1
+        proposal_id = counters['proposal']
+        property_id = int(rng.integers(1, properties + 1))
+        created = _datetime(min(SPAN_SECONDS - 1, lead['_created'] + 86400 * (n + 2)))
+        proposals.append({'id': proposal_id, 'property_id': property_id, 'lead_id': lead['id'],
+                          'title': f'Proposal for {lead["first_name"]} {lead["last_name"]}', 'created_at': created,
+                          'created_by_id': lead['assigned_to'], 'language': lead['_language'],
+                          'status': PROPOSAL_STATUSES[_choice(rng, PROPOSAL_STATUSES, None)][0],
+                          'pdf_url': f'https://cdn.example.com/proposals/{proposal_id}.pdf',
+                          'web_url': f'https://proposals.example.com/{proposal_id}'})
+        price = lead['budget_max'] * 0.9
+        for order, section_type in enumerate(SECTION_TYPES, start=1):
+            title = section_type.replace('_', ' ').title()
+            sections.append({'proposal_id': proposal_id, 'title': title, 'type': section_type, 'order': order,
+                             'content': text['section'].format(title=title, area=1000 + 250 * order, price=price, **values)})
+    return notes, proposals, sections
+
+
+def _chat(seed, sessions, agents, messages_mean):
+    rng = _rng(seed, 'chat')
+    session_rows, message_rows = [], []
+    for session_id in range(1, sessions + 1):
+        language = LANGUAGES[_choice(rng, LANGUAGES, None)][0]
+        community = COMMUNITIES[_choice(rng, [(c[0], c[5]) for c in COMMUNITIES], None)][0]
+        kind = PROPERTY_TYPES[_choice(rng, PROPERTY_TYPES[:4], None)][0]
+        started = int(_timestamps(rng, None))
+        count = max(1, int(_counts(rng, messages_mean, None)))
+        for n in range(count):
+            role = 'user' if n % 2 == 0 else 'assistant'
+            templates = TEXT[language][role]
+            message_rows.append({'session_id': session_id, 'role': role, 'language': language,
+                                 'content': templates[(session_id + n) % len(templates)].format(
+                                     type=kind, community=community, price=2_000_000 + 250_000 * (session_id % 20)),
+                                 'timestamp': _datetime(started + 30 * n)})
+        session_rows.append({'id': session_id, 'user_id': int(_skewed(rng, agents, None)),
+                             'created_at': _datetime(started), 'updated_at': _datetime(started + 30 * (count - 1))})
+        if len(message_rows) >= 10_000:
+            yield session_rows, message_rows
+            session_rows, message_rows = [], []
+    yield session_rows, message_rows
+
+
+def generate(engine, properties=10_000, leads=10_000, agents=None, chat_sessions=None, notes_per_lead=4.0,
+             proposals_per_lead=0.8, messages_per_session=8.0, embeddings=True, seed=0, batch_size=5_000,
+             rebuild_indexes=True, progress=None):
+    """Load a synthetic data set into the (empty) tables of ``engine``; returns ``{table: rows}``.
+
+    ``agents`` defaults to one per 500 leads and ``chat_sessions`` to one per
+    10 leads. ``progress(table, rows, seconds)`` is called after each table.
+    """
+    agents = agents or max(10, leads // 500)
+    chat_sessions = leads // 10 if chat_sessions is None else chat_sessions
+    tables = [User.__table__, Property.__table__, PropertyFeature.__table__, PropertyImage.__table__,
+              Lead.__table__, LeadNote.__table__, Proposal.__table__, ProposalSection.__table__,
+              ChatSession.__table__, ChatMessage.__table__] + ([Embedding.__table__] if embeddings else [])
+    # Parents are loaded before their children, so foreign keys hold throughout the load
+    with engine.begin() as connection:
+        indexes = [index for table in tables for index in table.indexes] if rebuild_indexes else []
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        load = _Loader(connection, batch_size)
+
+        def step(name, fn):
+            started = time.perf_counter()
+            fn()
+            if progress:
+                progress(name, sum(load.counts.get(t, 0) for t in name.split('+')), time.perf_counter() - started)
+
+        step('users', lambda: load(User.__table__, _users(seed, agents)))
+        step('properties', lambda: load(Property.__table__, _properties(seed, properties)))
+
+        def features_and_images():
+            for features, images in _features_and_images(seed, properties):
+                load(PropertyFeature.__table__, features)
+                load(PropertyImage.__table__, images)
+
+        step('property_features+property_images', features_and_images)
+        if embeddings:
+            step('embeddings', lambda: load(Embedding.__table__, _embeddings(seed, properties)))
+
+        def leads_and_children():
+            counters = {'rng': _rng(seed, 'notes'), 'proposal': 0}
+            lead_columns = set(Lead.__table__.columns.keys())
+            lead_rows, notes, proposals, sections = [], [], [], []
+            for lead in _leads(seed, leads, agents):
+                lead_notes, lead_proposals, lead_sections = _lead_children(
+                    lead, properties, notes_per_lead, proposals_per_lead, counters)
+                lead_rows.append({k: v for k, v in lead.items() if k in lead_columns})
+                notes += lead_notes
+                proposals += lead_proposals
+                sections += lead_sections
+                if len(lead_rows) >= batch_size:
+                    for table, rows in ((Lead.__table__, lead_rows), (LeadNote.__table__, notes),
+                                        (Proposal.__table__, proposals), (ProposalSection.__table__, sections)):
+                        load(table, rows)
+                    lead_rows, notes, proposals, sections = [], [], [], []
+            for table, rows in ((Lead.__table__, lead_rows), (LeadNote.__table__, notes),
+                                (Proposal.__table__, proposals), (ProposalSection.__table__, sections)):
+                load(table, rows)
+
+        step('leads+lead_notes+proposals+proposal_sections', leads_and_children)
+
+        def chat():
+            for session_rows, message_rows in _chat(seed, chat_sessions, agents, messages_per_session):
+                load(ChatSession.__table__, session_rows)
+                load(ChatMessage.__table__, message_rows)
+
+        step('chat_sessions+chat_logs', chat)
+
+        started = time.perf_counter()
+        for index in indexes:
+            index.create(connection)
+        if indexes and progress:
+            progress('indexes', len(indexes), time.perf_counter() - started)
+    return load.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic data set into an empty database")
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--properties', type=int, default=10_000)
+    parser.add_argument('--leads', type=int, default=10_000)
+    parser.add_argument('--agents', type=int)
+    parser.add_argument('--chat-sessions', type=int)
+    parser.add_argument('--no-embeddings', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=5_000)
+    args = parser.parse_args()
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    counts = generate(engine, args.properties, args.leads, args.agents, args.chat_sessions,
+                      embeddings=not args.no_embeddings, seed=args.seed, batch_size=args.batch_size,
+                      progress=lambda name, rows, seconds: print(f"{name:<48} {rows:>10} rows {seconds:8.1f} s"))
+    print(f"{sum(counts.values())} rows in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
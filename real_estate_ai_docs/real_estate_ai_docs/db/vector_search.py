@@ -0,0 +1,148 @@
+"""Exact in-process similarity search over property embeddings.
+
+All rows of ``embeddings`` are copied into one contiguous matrix so a query is a
+single matrix product instead of a per-row parse-and-score loop. This gives the
+SQLite and test backends semantic property search without pgvector.
+"""
+import numpy as np
+from sqlalchemy import LargeBinary, func, select, type_coerce
+
+from .models import Embedding
+
+METRICS = ('cosine', 'ip')
+
+
+def top_k(scores, k):
+    """Return indices of the ``k`` largest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def count_embeddings(session):
+    return session.scalar(select(func.count()).select_from(Embedding))
+
+
+def fill_embedding_matrix(session, ids, matrix, batch_size=1000):
+    """Copy stored embeddings, ordered by property ID, into preallocated ``ids``/``matrix``.
+
+    Vectors are read as raw bytes, so no per-row NumPy or ORM objects are kept
+    alive. Returns the number of rows written (at most ``len(ids)``).
+    """
+    stored_dtype = Embedding.__table__.c.vector.type.dtype
+    stmt = (
+        select(Embedding.property_id, type_coerce(Embedding.vector, LargeBinary))
+        .order_by(Embedding.property_id)
+        .execution_options(yield_per=batch_size)
+    )
+    n = 0
+    for property_id, blob in session.execute(stmt):
+        if n == len(ids):
+            break
+        ids[n] = property_id
+        matrix[n] = np.frombuffer(blob, dtype=stored_dtype)
+        n += 1
+    return n
+
+
+def load_embedding_matrix(session, dtype=np.float32, batch_size=1000):
+    """Return ``(property_ids, matrix)`` for every stored embedding, ordered by property ID."""
+    count = count_embeddings(session)
+    ids = np.empty(count, dtype=np.int64)
+    matrix = np.empty((count, Embedding.__table__.c.vector.type.dimensions), dtype=dtype)
+    n = fill_embedding_matrix(session, ids, matrix, batch_size=batch_size)
+    return ids[:n], matrix[:n]
+
+
+class ExactIndex:
+    """Brute-force top-k search over a dense embedding matrix.
+
+    The matrix is used as given (it may be a read-only or memory-mapped view);
+    cosine similarity divides by row norms (computed here unless passed in)
+    rather than normalising a copy of the matrix.
+    """
+
+    def __init__(self, ids, matrix, metric='cosine', norms=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+        matrix = np.asarray(matrix)
+        if matrix.ndim != 2 or len(ids) != matrix.shape[0]:
+            raise ValueError("ids and matrix rows must line up")
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = matrix
+        self.metric = metric
+        self._inv_norms = None
+        self._sorted_ids = None
+        self._id_order = None
+        if metric == 'cosine':
+            norms = np.linalg.norm(matrix, axis=1) if norms is None else np.asarray(norms, dtype=matrix.dtype)
+            self._inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    @classmethod
+    def from_session(cls, session, metric='cosine', dtype=np.float32):
+        ids, matrix = load_embedding_matrix(session, dtype=dtype)
+        return cls(ids, matrix, metric=metric)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimensions(self):
+        return self.matrix.shape[1]
+
+    def _prepare_queries(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=self.matrix.dtype))
+        if queries.shape[1] != self.dimensions:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions, index has {self.dimensions}")
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+        return queries
+
+    def scores(self, queries, rows=None):
+        """Return the ``(n_queries, n_rows)`` similarity matrix, optionally for the given row positions only."""
+        if rows is None:
+            scores = self._prepare_queries(queries) @ self.matrix.T
+            if self._inv_norms is not None:
+                scores *= self._inv_norms
+            return scores
+        rows = np.asarray(rows, dtype=np.intp)
+        scores = self._prepare_queries(queries) @ self.matrix[rows].T
+        if self._inv_norms is not None:
+            scores *= self._inv_norms[rows]
+        return scores
+
+    def search_batch(self, queries, k=10):
+        """Return ``(property_ids, scores)`` arrays of shape ``(n_queries, k)``."""
+        scores = self.scores(queries)
+        rows = top_k(scores, k)
+        return self.ids[rows], np.take_along_axis(scores, rows, axis=-1)
+
+    def search(self, query, k=10):
+        """Return up to ``k`` ``(property_id, score)`` pairs for a single query, best first."""
+        ids, scores = self.search_batch(query, k)
+        return list(zip(ids[0].tolist(), scores[0].tolist()))
+
+    def search_rows(self, query, rows, k=10):
+        """Like :meth:`search`, but only score the given row positions."""
+        rows = np.asarray(rows, dtype=np.intp)
+        scores = self.matrix[rows] @ self._prepare_queries(query)[0]
+        if self._inv_norms is not None:
+            scores *= self._inv_norms[rows]
+        best = top_k(scores, k)
+        return list(zip(self.ids[rows[best]].tolist(), scores[best].tolist()))
+
+    def rows_for(self, property_ids):
+        """Return row positions for ``property_ids``; IDs not in the index map to -1."""
+        if self._sorted_ids is None:
+            self._id_order = np.argsort(self.ids, kind='stable')
+            self._sorted_ids = self.ids[self._id_order]
+        property_ids = np.asarray(property_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(property_ids.shape, -1, dtype=np.intp)
+        found = np.minimum(np.searchsorted(self._sorted_ids, property_ids), len(self._sorted_ids) - 1)
+        rows = self._id_order[found]
+        return np.where(self._sorted_ids[found] == property_ids, rows, -1)
@@ -0,0 +1,162 @@
+"""Render every diagram definition in this directory, in parallel, skipping unchanged ones.
+
+    python diagrams/build.py --output-dir build/diagrams
+
+A definition is any ``*.py`` file here with a module-level ``OUTPUT_NAME``
+and a ``build(output_dir)`` function. They are found by parsing the source, so
+finding stale diagrams costs no ``diagrams`` import. Stale definitions are
+rendered in a process pool (each render is a Graphviz subprocess plus icon
+loading, and they are independent of each other).
+
+A diagram is stale unless ``.diagrams_manifest.json`` in the output directory
+records the same source hash, ``diagrams`` package version and Graphviz
+version, and its ``<OUTPUT_NAME>.png`` still exists. The ``dot -V`` result is
+cached in the manifest too, keyed by the path and mtime of ``dot``, so an
+up-to-date build starts no subprocess at all.
+"""
+import argparse
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DIAGRAMS_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = '.diagrams_manifest.json'
+OUTPUT_FORMAT = 'png'
+
+
+def find_definitions(directory=DIAGRAMS_DIR):
+    """``{OUTPUT_NAME: (path, source_hash)}`` for every diagram definition in ``directory``."""
+    definitions = {}
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if not filename.endswith('.py') or path == os.path.abspath(__file__):
+            continue
+        with open(path, 'rb') as f:
+            source = f.read()
+        tree = ast.parse(source, filename=path)
+        output_name = None
+        has_build = False
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and node.name == 'build':
+                has_build = True
+            elif (isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant)
+                  and any(isinstance(t, ast.Name) and t.id == 'OUTPUT_NAME' for t in node.targets)):
+                output_name = node.value.value
+        if output_name and has_build:
+            definitions[output_name] = (path, hashlib.sha256(source).hexdigest())
+    return definitions
+
+
+def diagrams_version():
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+        return version('diagrams')
+    except PackageNotFoundError:
+        return None
+
+
+def graphviz_version(cached=None):
+    """``{'path', 'mtime', 'version'}`` of ``dot``, reusing ``cached`` while the binary is unchanged."""
+    path = shutil.which('dot')
+    if path is None:
+        return {'path': None, 'mtime': None, 'version': None}
+    mtime = os.stat(path).st_mtime
+    if cached and cached.get('path') == path and cached.get('mtime') == mtime:
+        return cached
+    result = subprocess.run([path, '-V'], capture_output=True, text=True)
+    # dot prints its version on stderr: "dot - graphviz version 9.0.0 (20230911.1827)"
+    return {'path': path, 'mtime': mtime, 'version': (result.stderr or result.stdout).strip()}
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def render_one(name, path, output_dir):
+    """Import the definition at ``path`` and call its ``build``; returns ``(name, seconds)``. Runs in a worker."""
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(f'_diagram_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.build(output_dir)
+    return name, time.perf_counter() - start
+
+
+def build_all(output_dir=DIAGRAMS_DIR, names=None, workers=None, force=False, directory=DIAGRAMS_DIR):
+    """Render stale diagrams into ``output_dir``; returns ``(rendered, skipped, errors)``."""
+    os.makedirs(output_dir, exist_ok=True)
+    definitions = find_definitions(directory)
+    unknown = set(names or ()) - set(definitions)
+    if unknown:
+        raise ValueError(f"Unknown diagrams {sorted(unknown)}, expected some of {sorted(definitions)}")
+    manifest = _read_manifest(output_dir)
+    graphviz = graphviz_version(manifest.get('graphviz'))
+    toolchain = {'diagrams': diagrams_version(), 'graphviz': graphviz['version']}
+
+    stale, skipped = [], []
+    for name, (path, source_hash) in definitions.items():
+        if names and name not in names:
+            continue
+        entry = manifest.get('diagrams', {}).get(name)
+        output = os.path.join(output_dir, f'{name}.{OUTPUT_FORMAT}')
+        if not force and entry == dict(toolchain, source=source_hash) and os.path.exists(output):
+            skipped.append(name)
+        else:
+            stale.append(name)
+
+    rendered, errors = [], {}
+    if stale:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(stale))) as pool:
+            futures = {pool.submit(render_one, name, definitions[name][0], output_dir): name for name in stale}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    errors[name] = error
+                    manifest.setdefault('diagrams', {}).pop(name, None)
+                else:
+                    rendered.append(name)
+                    manifest.setdefault('diagrams', {})[name] = dict(toolchain, source=definitions[name][1])
+    manifest['graphviz'] = graphviz
+    _write_manifest(output_dir, manifest)
+    return rendered, skipped, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the diagram definitions in this directory")
+    parser.add_argument('names', nargs='*', help="OUTPUT_NAMEs to consider (default: all)")
+    parser.add_argument('--output-dir', default=DIAGRAMS_DIR)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--force', action='store_true', help="re-render even if nothing changed")
+    args = parser.parse_args()
+    rendered, skipped, errors = build_all(args.output_dir, args.names, args.workers, args.force)
+    for name in sorted(rendered):
+        print(f"rendered  {name}.{OUTPUT_FORMAT}")
+    for name in sorted(skipped):
+        print(f"unchanged {name}.{OUTPUT_FORMAT}")
+    for name, error in sorted(errors.items()):
+        print(f"FAILED    {name}: {error}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
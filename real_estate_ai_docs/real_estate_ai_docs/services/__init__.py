@@ -0,0 +1 @@
+"""Application services (proposal generation, rendering, analytics) built on the ``db`` helpers."""
@@ -0,0 +1,525 @@
+"""Precomputed valuation and investment analytics for every property.
+
+``propertyValuation`` and ``investmentAnalysis`` in ``api/schema.graphql``
+used to be computed per request. :func:`refresh_analytics` computes them for
+all properties in one batch with NumPy and materializes the results, so the
+resolvers (:func:`property_valuation`, :func:`investment_analysis`) only do
+lookups:
+
+* ``market_segment_stats`` - per ``(type, community)`` segment: price per sqft
+  distribution (min/p25/median/p75/max/mean) of sale and off-plan listings,
+  gross rental yield (median rent per sqft of rent listings over median sale
+  price per sqft), and annual, quarterly and forecast growth of the median
+  price per sqft of recently listed properties;
+* ``property_valuations`` - per property: the ``k`` most similar listings of
+  the same segment and category (log area, bedrooms, bathrooms, location), the
+  value implied by their price per sqft, a range and a confidence;
+* ``investment_analyses`` - per sale/off-plan property: an ROI grid over
+  :data:`INVESTMENT_PERIODS` x :data:`FINANCING_PERCENTAGES` with net yield,
+  leveraged and unleveraged IRR, break-even point and yearly cash flows.
+
+The refresh is incremental. A property whose ``updated_at`` differs from the
+one its valuation was computed from, a new property or a deleted one marks its
+segment as affected. Only affected segments are recomputed, because
+comparables and segment statistics never cross segments.
+
+The ROI model uses the assumptions in the constants below (running costs,
+transaction and selling costs, mortgage rate and term). Rents and values grow
+at the segment's annual growth.
+"""
+import argparse
+import json
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, delete, func, or_, select, tuple_
+from sqlalchemy.orm import Session, load_only
+
+from db.bulk import upsert_rows
+from db.models import InvestmentAnalysis, MarketSegmentStats, Property, PropertyValuation
+
+INVESTMENT_PERIODS = (1, 3, 5, 7, 10)
+FINANCING_PERCENTAGES = (0, 25, 50, 75, 80)
+COMPARABLES = 5
+
+EXPENSE_RATIO = 0.25        # service charges, maintenance, management and vacancy, as a share of rent
+TRANSACTION_COST = 0.06     # DLD transfer fee, agency and registration fees, as a share of the price
+SELLING_COST = 0.02         # agency fee on exit
+MORTGAGE_RATE = 0.045
+MORTGAGE_TERM = 25
+DEFAULT_GROSS_YIELD = 0.06
+DEFAULT_GROWTH = 0.03
+MIN_GROWTH_SAMPLE = 5
+BREAK_EVEN_HORIZON = 40
+
+# Feature scales for comparables: one unit of distance is roughly "noticeably different"
+_AREA_SCALE = 0.25          # log(area)
+_ROOM_SCALE = 1.0           # bedrooms, bathrooms
+_DISTANCE_SCALE_KM = 2.0
+
+
+# Grouped statistics
+
+def group_percentiles(codes, values, n_groups, quantiles):
+    """Linear-interpolated percentiles of ``values`` per group code; NaN for groups without values.
+
+    Returns ``(percentiles, counts)`` with percentiles of shape ``(n_groups, len(quantiles))``.
+    """
+    valid = np.isfinite(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    present = counts > 0
+    for j, q in enumerate(quantiles):
+        position = q * (counts[present] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low = values[starts[present] + lower]
+        high = values[starts[present] + upper]
+        result[present, j] = low + (high - low) * (position - lower)
+    return result, counts
+
+
+def _growth(codes, ppsf, created, n_groups, as_of, days):
+    """Change of the median price per sqft between the last ``days`` and the ``days`` before; NaN if too few."""
+    recent_start = np.datetime64(as_of - timedelta(days=days))
+    previous_start = np.datetime64(as_of - timedelta(days=2 * days))
+    recent = created >= recent_start
+    previous = (created >= previous_start) & ~recent
+    recent_median, recent_n = group_percentiles(codes[recent], ppsf[recent], n_groups, [0.5])
+    previous_median, previous_n = group_percentiles(codes[previous], ppsf[previous], n_groups, [0.5])
+    growth = recent_median[:, 0] / previous_median[:, 0] - 1
+    growth[(recent_n < MIN_GROWTH_SAMPLE) | (previous_n < MIN_GROWTH_SAMPLE)] = np.nan
+    return growth
+
+
+# Comparables
+
+def _features(area, bedrooms, bathrooms, latitude, longitude):
+    lat = np.where(np.isfinite(latitude), latitude, np.nanmean(latitude) if np.isfinite(latitude).any() else 0.0)
+    lon = np.where(np.isfinite(longitude), longitude, np.nanmean(longitude) if np.isfinite(longitude).any() else 0.0)
+    km_per_degree = 111.0
+    return np.column_stack([
+        np.log(np.maximum(area, 1.0)) / _AREA_SCALE,
+        bedrooms / _ROOM_SCALE,
+        bathrooms / _ROOM_SCALE,
+        lat * km_per_degree / _DISTANCE_SCALE_KM,
+        lon * km_per_degree * np.cos(np.radians(lat)) / _DISTANCE_SCALE_KM,
+    ])
+
+
+def comparables(features, k, chunk_size=1024):
+    """Indices and similarity scores of the ``k`` nearest other rows of ``features``.
+
+    Returns ``(indices, scores)`` of shape ``(n, min(k, n - 1))``, most similar
+    first; similarity is ``1 / (1 + distance)``. Distances are computed in
+    ``chunk_size`` x ``chunk_size`` blocks, keeping a running top ``k`` per row,
+    so memory stays bounded however large the segment is.
+    """
+    n = len(features)
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k))
+    if k <= 0:
+        return indices, scores
+    norms = np.einsum('ij,ij->i', features, features)
+    for start in range(0, n, chunk_size):
+        block = features[start:start + chunk_size]
+        best_distances = np.full((len(block), k), np.inf)
+        best = np.zeros((len(block), k), dtype=np.int64)
+        for column in range(0, n, chunk_size):
+            others = features[column:column + chunk_size]
+            distances = np.maximum(norms[start:start + len(block), None] + norms[None, column:column + len(others)]
+                                   - 2 * block @ others.T, 0.0)
+            own = np.arange(max(start, column), min(start + len(block), column + len(others)))
+            distances[own - start, own - column] = np.inf
+            candidates = np.concatenate([best_distances, distances], axis=1)
+            candidate_indices = np.concatenate(
+                [best, np.broadcast_to(np.arange(column, column + len(others)), distances.shape)], axis=1)
+            keep = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(candidates, keep, axis=1)
+            best = np.take_along_axis(candidate_indices, keep, axis=1)
+        order = np.argsort(best_distances, axis=1)
+        indices[start:start + len(block)] = np.take_along_axis(best, order, axis=1)
+        scores[start:start + len(block)] = 1.0 / (1.0 + np.sqrt(np.take_along_axis(best_distances, order, axis=1)))
+    return indices, scores
+
+
+# Investment grid
+
+def _annuity_payment(loan, rate, years):
+    return loan * rate / (1 - (1 + rate) ** -years)
+
+
+def irr(flows, low=-0.99, high=1.0, iterations=64):
+    """Vectorized IRR of each row of ``flows`` (year 0 first) by bisection; NaN where NPV keeps one sign."""
+    years = np.arange(flows.shape[1])
+
+    def npv(rate):
+        return (flows / (1 + rate[:, None]) ** years).sum(axis=1)
+
+    low = np.full(len(flows), low)
+    high = np.full(len(flows), high)
+    npv_low = npv(low)
+    bracketed = np.sign(npv_low) != np.sign(npv(high))
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        npv_middle = npv(middle)
+        same = np.sign(npv_middle) == np.sign(npv_low)
+        low = np.where(same, middle, low)
+        npv_low = np.where(same, npv_middle, npv_low)
+        high = np.where(same, high, middle)
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def check_investment_terms(period, financing_percentage):
+    """Raise ``ValueError`` unless ``period`` is 1..BREAK_EVEN_HORIZON years and financing is in [0, 100)."""
+    if not isinstance(period, (int, np.integer)) or not 1 <= period <= BREAK_EVEN_HORIZON:
+        raise ValueError(f"Investment period must be whole years from 1 to {BREAK_EVEN_HORIZON}, got {period!r}")
+    if not 0 <= financing_percentage < 100:
+        raise ValueError(f"Financing percentage must be at least 0 and below 100, got {financing_percentage!r}")
+
+
+def investment_grid(price, gross_yield, growth, period, financing_percentage):
+    """ROI figures for arrays of properties at one period and financing level.
+
+    Returns a dict of arrays: ``equity``, ``net_yield``, ``leveraged_irr``,
+    ``break_even_point`` and the yearly ``rental_income``/``expenses``/``cash_flow``
+    of shape ``(n, period)``. Raises ``ValueError`` for terms rejected by
+    :func:`check_investment_terms`.
+    """
+    check_investment_terms(period, financing_percentage)
+    loan = price * financing_percentage / 100
+    equity = price - loan + price * TRANSACTION_COST
+    payment = _annuity_payment(loan, MORTGAGE_RATE, MORTGAGE_TERM)
+    years = np.arange(1, BREAK_EVEN_HORIZON + 1)
+    rental_income = (price * gross_yield)[:, None] * (1 + growth[:, None]) ** (years - 1)
+    expenses = rental_income * EXPENSE_RATIO
+    cash_flow = rental_income - expenses - np.where(years <= MORTGAGE_TERM, payment[:, None], 0.0)
+
+    # Break-even: years of operating cash flow until the initial outlay is recovered, interpolated within the year
+    cumulative = np.cumsum(cash_flow, axis=1)
+    recovered = cumulative >= equity[:, None]
+    first = recovered.argmax(axis=1)
+    previous = np.where(first > 0, cumulative[np.arange(len(price)), first - 1], 0.0)
+    fraction = (equity - previous) / cash_flow[np.arange(len(price)), first]
+    break_even = np.where(recovered.any(axis=1), first + fraction, np.nan)
+
+    growth_factor = (1 + MORTGAGE_RATE) ** period
+    balance = np.maximum(loan * growth_factor - payment * (growth_factor - 1) / MORTGAGE_RATE, 0.0)
+    sale = price * (1 + growth) ** period * (1 - SELLING_COST)
+    flows = np.concatenate([-equity[:, None], cash_flow[:, :period]], axis=1)
+    flows[:, -1] += sale - balance
+    return {
+        'equity': equity,
+        'net_yield': gross_yield * (1 - EXPENSE_RATIO),
+        'leveraged_irr': irr(flows),
+        'break_even_point': break_even,
+        'rental_income': rental_income[:, :period],
+        'expenses': expenses[:, :period],
+        'cash_flow': cash_flow[:, :period],
+    }
+
+
+def _finite(value):
+    return None if value is None or not math.isfinite(value) else float(value)
+
+
+def _cash_flow_json(equity, rental_income, expenses, cash_flow):
+    cumulative = -equity + np.cumsum(cash_flow)
+    return json.dumps([
+        {'year': year + 1, 'rentalIncome': round(float(r), 2), 'expenses': round(float(e), 2),
+         'cashFlow': round(float(c), 2), 'cumulativeCashFlow': round(float(t), 2)}
+        for year, (r, e, c, t) in enumerate(zip(rental_income, expenses, cash_flow, cumulative))
+    ], separators=(',', ':'))
+
+
+# Refresh
+
+_COLUMNS = (Property.id, Property.category, Property.type, func.coalesce(Property.community, ''), Property.price,
+            Property.area, Property.bedrooms, Property.bathrooms, Property.latitude, Property.longitude,
+            Property.created_at, Property.updated_at)
+
+
+def affected_segments(session):
+    """``(type, community)`` segments with new, changed or deleted properties since the last refresh."""
+    changed = session.execute(
+        select(Property.type, func.coalesce(Property.community, ''), PropertyValuation.type, PropertyValuation.community)
+        .outerjoin(PropertyValuation, PropertyValuation.property_id == Property.id)
+        .where(or_(PropertyValuation.property_id.is_(None),
+                   PropertyValuation.property_updated_at.is_(None),
+                   PropertyValuation.property_updated_at != Property.updated_at))
+    ).all()
+    deleted = session.execute(
+        select(PropertyValuation.type, PropertyValuation.community)
+        .where(PropertyValuation.property_id.notin_(select(Property.id)))
+    ).all()
+    segments = {(row[0], row[1]) for row in changed}
+    segments |= {(row[2], row[3]) for row in changed if row[2] is not None}
+    segments |= {tuple(row) for row in deleted}
+    return segments
+
+
+def _load(session, segments):
+    if segments is None:
+        rows = session.execute(select(*_COLUMNS).order_by(Property.id)).all()
+    else:
+        # Chunked like the deletes in refresh_analytics, to stay under the bind parameter limit
+        rows = []
+        key = tuple_(Property.type, func.coalesce(Property.community, ''))
+        for chunk in (sorted(segments)[i:i + 500] for i in range(0, len(segments), 500)):
+            rows += session.execute(select(*_COLUMNS).where(key.in_(chunk))).all()
+        rows.sort(key=lambda row: row[0])
+    columns = list(zip(*rows)) if rows else [()] * len(_COLUMNS)
+    as_float = lambda values: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return {
+        'id': np.array(columns[0], dtype=np.int64),
+        'category': np.array(columns[1], dtype=object),
+        'type': np.array(columns[2], dtype=object),
+        'community': np.array(columns[3], dtype=object),
+        'price': as_float(columns[4]),
+        'area': as_float(columns[5]),
+        'bedrooms': np.nan_to_num(as_float(columns[6])),
+        'bathrooms': np.nan_to_num(as_float(columns[7])),
+        'latitude': as_float(columns[8]),
+        'longitude': as_float(columns[9]),
+        'created_at': np.array(columns[10], dtype='datetime64[us]'),
+        'updated_at': list(columns[11]),
+    }
+
+
+def _segment_stats(data, as_of):
+    keys = np.array([f"{t}\x1f{c}" for t, c in zip(data['type'], data['community'])], dtype=object)
+    segment_keys, codes = np.unique(keys, return_inverse=True) if len(keys) else (np.array([], dtype=object), keys)
+    n_groups = len(segment_keys)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ppsf = np.where(data['area'] > 0, data['price'] / data['area'], np.nan)
+    sale = data['category'] != 'rent'
+    distribution, listings = group_percentiles(codes[sale], ppsf[sale], n_groups, [0.0, 0.25, 0.5, 0.75, 1.0])
+    sums = np.bincount(codes[sale & np.isfinite(ppsf)], ppsf[sale & np.isfinite(ppsf)], minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sums / listings
+        rent_median, _ = group_percentiles(codes[~sale], ppsf[~sale], n_groups, [0.5])
+        gross_yield = np.clip(rent_median[:, 0] / distribution[:, 2], 0.02, 0.15)
+        annual = _growth(codes[sale], ppsf[sale], data['created_at'][sale], n_groups, as_of, 365)
+        quarterly = _growth(codes[sale], ppsf[sale], data['created_at'][sale], n_groups, as_of, 91)
+    gross_yield = np.where(np.isfinite(gross_yield), gross_yield, DEFAULT_GROSS_YIELD)
+    annual = np.where(np.isfinite(annual), annual, DEFAULT_GROWTH)
+    quarterly = np.where(np.isfinite(quarterly), quarterly, (1 + annual) ** 0.25 - 1)
+    forecast = np.clip(0.5 * annual + 0.5 * ((1 + quarterly) ** 4 - 1), -0.1, 0.15)
+    return codes, segment_keys, ppsf, {
+        'distribution': distribution, 'listings': listings, 'mean': mean, 'gross_yield': gross_yield,
+        'annual': annual, 'quarterly': quarterly, 'forecast': forecast,
+    }
+
+
+def _valuations(data, codes, ppsf, k):
+    """Comparables-based valuation arrays for every loaded property."""
+    n = len(data['id'])
+    estimate = data['price'].copy()
+    value_min, value_max = estimate.copy(), estimate.copy()
+    confidence = np.zeros(n)
+    comparable_ids = [[] for _ in range(n)]
+    comparable_scores = [[] for _ in range(n)]
+    valid = np.isfinite(ppsf)
+    features = _features(data['area'], data['bedrooms'], data['bathrooms'], data['latitude'], data['longitude'])
+    groups = {}
+    for i in np.flatnonzero(valid):
+        groups.setdefault((codes[i], data['category'][i]), []).append(i)
+    for members in groups.values():
+        members = np.array(members)
+        if len(members) < 2:
+            continue
+        neighbours, scores = comparables(features[members], k)
+        comp_ppsf = ppsf[members][neighbours]
+        weights = scores / scores.sum(axis=1, keepdims=True)
+        estimated_ppsf = (comp_ppsf * weights).sum(axis=1)
+        low, high = np.percentile(comp_ppsf, [25, 75], axis=1)
+        area = data['area'][members]
+        estimate[members] = estimated_ppsf * area
+        value_min[members] = np.minimum(low, estimated_ppsf) * area
+        value_max[members] = np.maximum(high, estimated_ppsf) * area
+        dispersion = comp_ppsf.std(axis=1) / estimated_ppsf
+        confidence[members] = (neighbours.shape[1] / k) * scores.mean(axis=1) ** 0.5 / (1 + dispersion)
+        member_ids = data['id'][members]
+        for row, i in enumerate(members):
+            comparable_ids[i] = member_ids[neighbours[row]].tolist()
+            comparable_scores[i] = np.round(scores[row], 4).tolist()
+    return estimate, value_min, value_max, np.clip(confidence, 0.0, 1.0), comparable_ids, comparable_scores
+
+
+def refresh_analytics(session, full=False, as_of=None, k=COMPARABLES):
+    """Recompute analytics for affected segments (or all with ``full``); returns counts of what was written."""
+    as_of = as_of or datetime.utcnow()
+    segments = None if full else affected_segments(session)
+    if segments is not None and not segments:
+        return {'segments': 0, 'valuations': 0, 'analyses': 0}
+    data = _load(session, segments)
+    codes, segment_keys, ppsf, stats = _segment_stats(data, as_of)
+    computed_at = datetime.utcnow()
+
+    # Rows of deleted properties and of properties that moved out of these segments go first
+    if full:
+        session.execute(delete(InvestmentAnalysis))
+        session.execute(delete(PropertyValuation))
+        session.execute(delete(MarketSegmentStats))
+    else:
+        for chunk in (sorted(segments)[i:i + 500] for i in range(0, len(segments), 500)):
+            stale = select(PropertyValuation.property_id).where(
+                tuple_(PropertyValuation.type, PropertyValuation.community).in_(chunk))
+            session.execute(delete(InvestmentAnalysis).where(InvestmentAnalysis.property_id.in_(stale)))
+            session.execute(delete(PropertyValuation).where(PropertyValuation.property_id.in_(stale)))
+            session.execute(delete(MarketSegmentStats).where(
+                tuple_(MarketSegmentStats.type, MarketSegmentStats.community).in_(chunk)))
+        session.execute(delete(InvestmentAnalysis).where(InvestmentAnalysis.property_id.notin_(select(Property.id))))
+
+    distribution = stats['distribution']
+    segment_rows = []
+    for g, key in enumerate(segment_keys):
+        property_type, community = key.split('\x1f')
+        segment_rows.append({
+            'type': property_type, 'community': community, 'listings': int(stats['listings'][g]),
+            'ppsf_min': _finite(distribution[g, 0]), 'ppsf_p25': _finite(distribution[g, 1]),
+            'ppsf_median': _finite(distribution[g, 2]), 'ppsf_p75': _finite(distribution[g, 3]),
+            'ppsf_max': _finite(distribution[g, 4]), 'ppsf_mean': _finite(stats['mean'][g]),
+            'gross_yield': float(stats['gross_yield'][g]), 'annual_growth': float(stats['annual'][g]),
+            'quarterly_growth': float(stats['quarterly'][g]), 'forecast_growth': float(stats['forecast'][g]),
+            'computed_at': computed_at,
+        })
+    upsert_rows(session, MarketSegmentStats.__table__, segment_rows, ['type', 'community'])
+
+    estimate, value_min, value_max, confidence, comparable_ids, comparable_scores = _valuations(data, codes, ppsf, k)
+    valuation_rows = [{
+        'property_id': int(data['id'][i]), 'type': data['type'][i], 'community': data['community'][i],
+        'price_per_sqft': _finite(ppsf[i]), 'estimated_value': float(estimate[i]),
+        'value_min': float(value_min[i]), 'value_max': float(value_max[i]), 'confidence': float(confidence[i]),
+        'comparable_ids': json.dumps(comparable_ids[i]), 'comparable_scores': json.dumps(comparable_scores[i]),
+        'property_updated_at': data['updated_at'][i], 'computed_at': computed_at,
+    } for i in range(len(data['id']))]
+    upsert_rows(session, PropertyValuation.__table__, valuation_rows, ['property_id'])
+
+    investable = np.flatnonzero((data['category'] != 'rent') & (data['price'] > 0))
+    price = data['price'][investable]
+    gross_yield = stats['gross_yield'][codes[investable]]
+    growth = stats['annual'][codes[investable]]
+    analysis_rows = []
+    for period in INVESTMENT_PERIODS:
+        unleveraged = investment_grid(price, gross_yield, growth, period, 0)['leveraged_irr']
+        for financing in FINANCING_PERCENTAGES:
+            grid = investment_grid(price, gross_yield, growth, period, financing)
+            for row, i in enumerate(investable):
+                analysis_rows.append({
+                    'property_id': int(data['id'][i]), 'investment_period': period,
+                    'financing_percentage': financing, 'purchase_price': float(price[row]),
+                    'estimated_rental_yield': float(gross_yield[row]), 'net_yield': float(grid['net_yield'][row]),
+                    'leveraged_irr': _finite(grid['leveraged_irr'][row]), 'unleveraged_irr': _finite(unleveraged[row]),
+                    'break_even_point': _finite(grid['break_even_point'][row]),
+                    'cash_flows': _cash_flow_json(grid['equity'][row], grid['rental_income'][row],
+                                                  grid['expenses'][row], grid['cash_flow'][row]),
+                    'computed_at': computed_at,
+                })
+    upsert_rows(session, InvestmentAnalysis.__table__, analysis_rows,
+                ['property_id', 'investment_period', 'financing_percentage'])
+    session.commit()
+    return {'segments': len(segment_rows), 'valuations': len(valuation_rows), 'analyses': len(analysis_rows)}
+
+
+# Lookups for the GraphQL resolvers
+
+_COMPARABLE_OPTIONS = (load_only(Property.id, Property.title, Property.price, Property.area, Property.bedrooms,
+                                 Property.bathrooms),)
+
+
+def property_valuation(session, property_id):
+    """``ValuationResult`` for a property from the materialized tables, or ``None`` if not computed yet."""
+    row = session.execute(
+        select(PropertyValuation, MarketSegmentStats)
+        .join(MarketSegmentStats, (MarketSegmentStats.type == PropertyValuation.type)
+              & (MarketSegmentStats.community == PropertyValuation.community))
+        .where(PropertyValuation.property_id == property_id)
+    ).first()
+    if row is None:
+        return None
+    valuation, segment = row
+    ids, scores = json.loads(valuation.comparable_ids), json.loads(valuation.comparable_scores)
+    found = {p.id: p for p in session.scalars(
+        select(Property).where(Property.id.in_(ids)).options(*_COMPARABLE_OPTIONS))} if ids else {}
+    return {
+        'propertyId': property_id,
+        'estimatedValue': valuation.estimated_value,
+        'valueRange': {'min': valuation.value_min, 'max': valuation.value_max},
+        'comparableProperties': [{
+            'id': p.id, 'title': p.title, 'price': p.price, 'area': p.area, 'bedrooms': p.bedrooms or 0,
+            # No transaction data is stored; Property.updated_at is a listing edit, not a sale date
+            'bathrooms': p.bathrooms or 0, 'similarityScore': score, 'transactionDate': None,
+        } for p, score in ((found.get(i), s) for i, s in zip(ids, scores)) if p is not None],
+        'marketTrends': {'annualGrowth': segment.annual_growth, 'quarterlyGrowth': segment.quarterly_growth,
+                         'forecastGrowth': segment.forecast_growth},
+        'confidence': valuation.confidence,
+    }
+
+
+def _analysis_result(property_id, analysis):
+    return {
+        'propertyId': property_id,
+        'purchasePrice': analysis['purchase_price'],
+        'estimatedRentalYield': analysis['estimated_rental_yield'],
+        'netYield': analysis['net_yield'],
+        'leveragedIRR': analysis['leveraged_irr'],
+        'unleveragedIRR': analysis['unleveraged_irr'],
+        'breakEvenPoint': analysis['break_even_point'],
+        'cashFlowAnalysis': json.loads(analysis['cash_flows']),
+        # Bank offers are not modelled; the field is kept for schema compatibility
+        'financingOptions': [],
+    }
+
+
+def investment_analysis(session, property_id, investment_period=5, financing_percentage=0):
+    """``InvestmentAnalysis`` for a property; off-grid periods and financing levels are computed from stored inputs.
+
+    Raises ``ValueError`` for terms rejected by :func:`check_investment_terms`.
+    """
+    check_investment_terms(investment_period, financing_percentage)
+    row = session.execute(select(InvestmentAnalysis.__table__).where(
+        InvestmentAnalysis.property_id == property_id,
+        InvestmentAnalysis.investment_period == investment_period,
+        InvestmentAnalysis.financing_percentage == financing_percentage,
+    )).mappings().first()
+    if row is not None:
+        return _analysis_result(property_id, row)
+    inputs = session.execute(
+        select(Property.price, MarketSegmentStats.gross_yield, MarketSegmentStats.annual_growth)
+        .join(PropertyValuation, PropertyValuation.property_id == Property.id)
+        .join(MarketSegmentStats, (MarketSegmentStats.type == PropertyValuation.type)
+              & (MarketSegmentStats.community == PropertyValuation.community))
+        .where(Property.id == property_id, Property.category != 'rent')
+    ).first()
+    if inputs is None:
+        return None
+    price, gross_yield, growth = (np.array([value], dtype=np.float64) for value in inputs)
+    grid = investment_grid(price, gross_yield, growth, investment_period, financing_percentage)
+    unleveraged = investment_grid(price, gross_yield, growth, investment_period, 0)['leveraged_irr']
+    return _analysis_result(property_id, {
+        'purchase_price': float(price[0]), 'estimated_rental_yield': float(gross_yield[0]),
+        'net_yield': float(grid['net_yield'][0]), 'leveraged_irr': _finite(grid['leveraged_irr'][0]),
+        'unleveraged_irr': _finite(unleveraged[0]), 'break_even_point': _finite(grid['break_even_point'][0]),
+        'cash_flows': _cash_flow_json(grid['equity'][0], grid['rental_income'][0], grid['expenses'][0],
+                                      grid['cash_flow'][0]),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the materialized valuation and investment analytics")
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--full', action='store_true', help="recompute every segment, not just changed ones")
+    args = parser.parse_args()
+    with Session(create_engine(args.database_url)) as session:
+        print(refresh_analytics(session, full=args.full))
+
+
+if __name__ == '__main__':
+    main()
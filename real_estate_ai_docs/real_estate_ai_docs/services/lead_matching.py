@@ -0,0 +1,265 @@
+"""Batch matching of open leads to available properties.
+
+Finding the best properties for every open lead one search at a time costs a
+query and a vector scan per lead. :class:`LeadMatcher` instead scores blocks of
+leads against all available properties at once:
+
+* budget fit is a broadcast comparison of the ``(leads, 1)`` budget bounds
+  with the ``(properties,)`` prices. It is 1 inside ``[budget_min,
+  budget_max]`` and falls linearly to 0 at ``tolerance`` beyond either bound.
+  Properties outside that band are excluded;
+* similarity is one matrix product of the embedded lead ``requirements`` with
+  the embeddings of just those properties, taken from the
+  :class:`~db.vector_search.ExactIndex` (listings without an embedding score 0);
+* ``score = similarity_weight * similarity + (1 - similarity_weight) * budget_fit``,
+  and the top ``k`` per lead are written to ``lead_matches`` with their rank.
+
+:meth:`LeadMatcher.match_incremental` handles new listings without a full run.
+It scores only properties updated since the newest ``listings_as_of`` in
+``lead_matches`` and merges them into each lead's stored top ``k``. It fully
+rescores leads that are new or were edited since their matches were written,
+and drops matches for leads that closed and for listings that are no longer
+available, or that changed and no longer qualify for a lead (repriced out of
+its budget, for example). A periodic :meth:`LeadMatcher.match_all` refills
+lists that lost entries that way.
+
+Requirements are embedded with the same embedder as the property documents
+(:class:`db.embedding_backfill.HashingEmbedder` by default), so both sides
+live in one vector space. Unless an index is passed in, the matcher builds the
+:class:`~db.vector_search.ExactIndex` itself and rebuilds it at the start of a
+run whenever ``embeddings`` changed (newest ``updated_at`` or row count), so a
+long-lived matcher scores new and re-embedded listings against current vectors.
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, delete, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from db.embedding_backfill import HashingEmbedder, _load_embedder
+from db.models import Embedding, Lead, LeadMatch, Property
+from db.vector_search import ExactIndex
+
+OPEN_STATUSES = ('new', 'contacted', 'qualified')
+
+
+def budget_fit(prices, budget_min, budget_max, tolerance=0.1):
+    """``(leads, properties)`` budget fit in [0, 1]; NaN bounds are open."""
+    prices = prices[None, :]
+    low = np.where(np.isnan(budget_min), -np.inf, budget_min)[:, None]
+    high = np.where(np.isnan(budget_max), np.inf, budget_max)[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        below = np.where(prices < low, (low - prices) / (low * tolerance), 0.0)
+        above = np.where(prices > high, (prices - high) / (high * tolerance), 0.0)
+    return np.clip(1.0 - np.nan_to_num(below) - np.nan_to_num(above), 0.0, 1.0)
+
+
+class LeadMatcher:
+    """Scores open leads against available properties in blocks and stores the top ``k`` per lead."""
+
+    def __init__(self, vector_index=None, embedder=None, k=20, tolerance=0.1, similarity_weight=0.7,
+                 max_block_cells=2 ** 24):
+        self.vector_index = vector_index
+        self._own_index = vector_index is None
+        self._index_as_of = None  # (newest Embedding.updated_at, row count) the owned index was built from
+        self.embedder = embedder or HashingEmbedder()
+        self.k = k
+        self.tolerance = tolerance
+        self.similarity_weight = similarity_weight
+        self.max_block_cells = max_block_cells
+
+    def _index(self, session):
+        if self._own_index:
+            stmt = select(func.max(Embedding.updated_at), func.count()).select_from(Embedding)
+            as_of = tuple(session.execute(stmt).one())
+            if self.vector_index is None or as_of != self._index_as_of:
+                self.vector_index = ExactIndex.from_session(session)
+                self._index_as_of = as_of
+        return self.vector_index
+
+    # Loading
+
+    @staticmethod
+    def _properties(session, since=None):
+        stmt = select(Property.id, Property.price, Property.updated_at).where(Property.status == 'available')
+        if since is not None:
+            # >= rather than >: a listing committed with the same timestamp as the watermark after the last
+            # run would otherwise be skipped for good; re-merging the ones already seen is harmless
+            stmt = stmt.where(Property.updated_at >= since)
+        rows = session.execute(stmt.order_by(Property.id)).all()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        prices = np.array([r[1] for r in rows], dtype=np.float64)
+        newest = max((r[2] for r in rows if r[2] is not None), default=None)
+        return ids, prices, newest
+
+    @staticmethod
+    def _leads(session, stmt):
+        rows = session.execute(stmt.order_by(Lead.id)).all()
+        as_float = lambda values: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return (np.array([r[0] for r in rows], dtype=np.int64), as_float([r[1] for r in rows]),
+                as_float([r[2] for r in rows]), [r[3] or '' for r in rows])
+
+    def _embed(self, texts):
+        vectors = np.zeros((len(texts), self._dimensions), dtype=np.float32)
+        present = [i for i, text in enumerate(texts) if text.strip()]
+        if present:
+            vectors[present] = np.asarray(self.embedder([texts[i] for i in present]), dtype=np.float32)
+        return vectors
+
+    @property
+    def _dimensions(self):
+        return self.vector_index.dimensions if len(self.vector_index) else getattr(self.embedder, 'dimensions', 1)
+
+    # Scoring
+
+    def rank(self, leads, property_ids, prices):
+        """Top ``k`` ``(lead_id, property_id, score, similarity, budget_fit)`` tuples per lead, best first."""
+        lead_ids, budget_min, budget_max, requirements = leads
+        if not len(lead_ids) or not len(property_ids):
+            return []
+        index = self.vector_index
+        rows = index.rows_for(property_ids) if len(index) else np.full(len(property_ids), -1)
+        embedded = rows >= 0
+        block = max(1, self.max_block_cells // len(property_ids))
+        results = []
+        for start in range(0, len(lead_ids), block):
+            stop = start + block
+            fit = budget_fit(prices, budget_min[start:stop], budget_max[start:stop], self.tolerance)
+            similarity = np.zeros(fit.shape, dtype=np.float32)
+            if embedded.any():
+                vectors = self._embed(requirements[start:stop])
+                similarity[:, embedded] = index.scores(vectors, rows[embedded])
+            score = self.similarity_weight * similarity + (1 - self.similarity_weight) * fit
+            score[fit <= 0] = -np.inf
+            k = min(self.k, len(property_ids))
+            best = np.argpartition(-score, k - 1, axis=1)[:, :k]
+            for i, columns in enumerate(best):
+                columns = columns[np.isfinite(score[i, columns])]
+                columns = columns[np.lexsort((property_ids[columns], -score[i, columns]))]
+                lead_id = int(lead_ids[start + i])
+                results.extend((lead_id, int(property_ids[c]), float(score[i, c]), float(similarity[i, c]),
+                                float(fit[i, c])) for c in columns)
+        return results
+
+    @staticmethod
+    def _write(session, matches, listings_as_of):
+        now = datetime.utcnow()
+        ranks = {}
+        rows = []
+        for lead_id, property_id, score, similarity, fit in matches:
+            ranks[lead_id] = ranks.get(lead_id, 0) + 1
+            rows.append({'lead_id': lead_id, 'property_id': property_id, 'rank': ranks[lead_id], 'score': score,
+                         'similarity': similarity, 'budget_fit': fit, 'listings_as_of': listings_as_of,
+                         'computed_at': now})
+        if rows:
+            session.execute(insert(LeadMatch), rows)
+        return len(rows)
+
+    @staticmethod
+    def _delete_leads(session, lead_ids):
+        for start in range(0, len(lead_ids), 500):
+            chunk = [int(i) for i in lead_ids[start:start + 500]]
+            session.execute(delete(LeadMatch).where(LeadMatch.lead_id.in_(chunk)))
+
+    _LEAD_COLUMNS = (Lead.id, Lead.budget_min, Lead.budget_max, Lead.requirements)
+
+    def match_all(self, session):
+        """Recompute the matches of every open lead; returns counts of leads and matches written."""
+        self._index(session)
+        property_ids, prices, newest = self._properties(session)
+        leads = self._leads(session, select(*self._LEAD_COLUMNS).where(Lead.status.in_(OPEN_STATUSES)))
+        session.execute(delete(LeadMatch))
+        written = self._write(session, self.rank(leads, property_ids, prices), newest)
+        session.commit()
+        return {'leads': len(leads[0]), 'properties': len(property_ids), 'matches': written}
+
+    def match_incremental(self, session):
+        """Fold listings changed since the last run into stored matches; returns counts of what changed."""
+        watermark = session.scalar(select(func.max(LeadMatch.listings_as_of)))
+        if watermark is None:
+            return self.match_all(session)
+        self._index(session)
+
+        # Matches of closed leads and of listings that are gone or no longer available
+        session.execute(delete(LeadMatch).where(~exists().where(
+            Lead.id == LeadMatch.lead_id, Lead.status.in_(OPEN_STATUSES))))
+        session.execute(delete(LeadMatch).where(~exists().where(
+            Property.id == LeadMatch.property_id, Property.status == 'available')))
+
+        # New leads and leads edited after their matches were written: rescore against everything
+        stale = select(*self._LEAD_COLUMNS).where(
+            Lead.status.in_(OPEN_STATUSES),
+            ~exists().where(LeadMatch.lead_id == Lead.id, LeadMatch.computed_at >= Lead.updated_at))
+        stale_leads = self._leads(session, stale)
+        property_ids, prices, newest = self._properties(session)
+        rescored_at = datetime.utcnow()
+        self._delete_leads(session, stale_leads[0])
+        written = self._write(session, self.rank(stale_leads, property_ids, prices), newest or watermark)
+
+        # Everyone else: score only the changed listings and merge into the stored top k. Leads holding a
+        # stored match on a changed listing are rewritten too, so a listing repriced out of their budget
+        # does not keep its old score
+        new_ids, new_prices, new_newest = self._properties(session, since=watermark)
+        merged_leads = 0
+        if len(new_ids):
+            rescored = set(stale_leads[0].tolist())
+            # Leads just rescored hold matches written after rescored_at; excluding them that way rather than
+            # by id keeps the statement small after a bulk lead import (rescored leads that found no match
+            # are scored here too, then dropped with the rest of `rescored` below)
+            current = self._leads(session, select(*self._LEAD_COLUMNS).where(
+                Lead.status.in_(OPEN_STATUSES),
+                ~exists().where(LeadMatch.lead_id == Lead.id, LeadMatch.computed_at >= rescored_at)))
+            candidates = {}
+            for match in self.rank(current, new_ids, new_prices):
+                candidates.setdefault(match[0], []).append(match)
+            changed = [int(i) for i in new_ids]
+            affected = set(candidates)
+            for start in range(0, len(changed), 500):
+                affected.update(session.scalars(select(LeadMatch.lead_id).distinct().where(
+                    LeadMatch.property_id.in_(changed[start:start + 500]))))
+            affected = sorted(affected - rescored)
+            if affected:
+                changed = set(changed)
+                stored = {}
+                for start in range(0, len(affected), 500):
+                    for row in session.execute(
+                            select(LeadMatch.lead_id, LeadMatch.property_id, LeadMatch.score, LeadMatch.similarity,
+                                   LeadMatch.budget_fit).where(LeadMatch.lead_id.in_(affected[start:start + 500]))):
+                        if row.property_id not in changed:
+                            stored.setdefault(row.lead_id, []).append(tuple(row))
+                merged = []
+                for lead_id in affected:
+                    ranked = sorted(stored.get(lead_id, []) + candidates.get(lead_id, []),
+                                    key=lambda m: (-m[2], m[1]))[:self.k]
+                    merged.extend(ranked)
+                self._delete_leads(session, affected)
+                written += self._write(session, merged, max(new_newest, watermark))
+                merged_leads = len(affected)
+        session.commit()
+        return {'rescored_leads': len(stale_leads[0]), 'new_listings': len(new_ids), 'merged_leads': merged_leads,
+                'matches': written}
+
+
+def matches_for_lead(session, lead_id, limit=None):
+    """Stored matches of a lead, best first: ``[(property_id, score), ...]``."""
+    stmt = select(LeadMatch.property_id, LeadMatch.score).where(LeadMatch.lead_id == lead_id).order_by(LeadMatch.rank)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [tuple(row) for row in session.execute(stmt)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match open leads to available properties")
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--full', action='store_true', help="recompute all matches instead of folding in new listings")
+    parser.add_argument('-k', type=int, default=20, help="matches kept per lead")
+    parser.add_argument('--embedder', help="module:callable producing embeddings (default: local hashing stub)")
+    args = parser.parse_args()
+    matcher = LeadMatcher(embedder=_load_embedder(args.embedder) if args.embedder else None, k=args.k)
+    with Session(create_engine(args.database_url)) as session:
+        print(matcher.match_all(session) if args.full else matcher.match_incremental(session))
+
+
+if __name__ == '__main__':
+    main()
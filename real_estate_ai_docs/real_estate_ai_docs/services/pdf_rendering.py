@@ -0,0 +1,365 @@
+"""Batched proposal PDF rendering on a local process pool.
+
+``diagrams/deployment_diagram.py`` routes PDF generation through one Lambda
+invocation per proposal. When a manager sends a proposal to a whole campaign
+of leads, cold starts and per-proposal setup dominate. :class:`PdfRenderPool`
+renders batches of proposal IDs on a long-lived process pool instead:
+
+* every proposal of a batch is loaded with one ``proposal_render`` profile
+  query set, not one lookup per proposal;
+* property images are fetched once per batch into a shared directory, however
+  many proposals use them, and workers read them through the page cache;
+* each worker builds its renderer (fonts, templates) once, in the pool
+  initializer, and reuses it for every proposal it renders;
+* PDFs go to a pluggable object store (:class:`LocalObjectStore` for tests and
+  single hosts) and ``Proposal.pdf_url`` is updated with one executemany UPDATE.
+
+The built-in :class:`MinimalPdfRenderer` writes text with the standard
+Helvetica font and embeds JPEG images, with no third-party dependency. It only
+covers Latin text. Proposals in Arabic need a renderer with an embedded
+Unicode font, passed as ``renderer='package.module:Factory'``.
+"""
+import importlib
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from hashlib import sha256
+
+from sqlalchemy import bindparam, update
+
+from db.loading import load_profile, render
+from db.models import Proposal
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+
+
+# Minimal PDF writer
+
+def _pdf_string(text):
+    data = text.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def jpeg_info(data):
+    """``(width, height, colour_space)`` of a baseline or progressive JPEG, or ``None``."""
+    if data[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker, length = data[i + 1], int.from_bytes(data[i + 2:i + 4], 'big')
+        if marker in (0xC0, 0xC1, 0xC2):
+            height, width = int.from_bytes(data[i + 5:i + 7], 'big'), int.from_bytes(data[i + 7:i + 9], 'big')
+            space = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}.get(data[i + 9])
+            return (width, height, space) if space else None
+        i += 2 + length
+    return None
+
+
+def wrap_text(text, font_size, width):
+    """Greedy word wrap assuming Helvetica's average glyph width of about half the font size."""
+    max_chars = max(1, int(width / (font_size * 0.5)))
+    lines = []
+    for paragraph in text.splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if len(candidate) > max_chars and line:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+class PdfWriter:
+    """Pages of positioned text and JPEG images, serialized as a PDF 1.4 file."""
+
+    def __init__(self):
+        self.pages = []
+        self.images = []
+
+    def add_page(self):
+        self.pages.append([])
+
+    def text(self, x, y, text, size=11, bold=False):
+        font = '/F2' if bold else '/F1'
+        self.pages[-1].append(b'BT %s %d Tf %.2f %.2f Td %s Tj ET' % (font.encode(), size, x, y, _pdf_string(text)))
+
+    def image(self, x, y, width, height, data, info):
+        self.images.append((data, info))
+        name = b'/Im%d' % len(self.images)
+        self.pages[-1].append(b'q %.2f 0 0 %.2f %.2f %.2f cm %s Do Q' % (width, height, x, y, name))
+
+    def tobytes(self):
+        objects = [None, None,
+                   b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+                   b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>']
+        image_refs = []
+        for data, (width, height, space) in self.images:
+            objects.append(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s '
+                           b'/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n%s\nendstream'
+                           % (width, height, space.encode(), len(data), data))
+            image_refs.append(b'/Im%d %d 0 R' % (len(image_refs) + 1, len(objects)))
+        resources = b'<< /Font << /F1 3 0 R /F2 4 0 R >> /XObject << %s >> >>' % b' '.join(image_refs)
+        page_refs = []
+        for commands in self.pages:
+            content = b'\n'.join(commands)
+            objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+            objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>'
+                           % (PAGE_WIDTH, PAGE_HEIGHT, resources, len(objects)))
+            page_refs.append(b'%d 0 R' % len(objects))
+        objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(page_refs), len(page_refs))
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(out)
+
+
+class MinimalPdfRenderer:
+    """Default renderer: title, hero image, key facts and the generated sections."""
+
+    def __init__(self):
+        self._images = {}
+
+    def _load_image(self, path):
+        # Parsed images are reused across the proposals this worker renders
+        if path not in self._images:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(self._images) >= 64:
+                self._images.pop(next(iter(self._images)))
+            self._images[path] = (data, jpeg_info(data))
+        return self._images[path]
+
+    def render(self, proposal, image_paths):
+        pdf = PdfWriter()
+        pdf.add_page()
+        y = PAGE_HEIGHT - MARGIN
+        width = PAGE_WIDTH - 2 * MARGIN
+
+        def line(text, size=11, bold=False, gap=4):
+            nonlocal y
+            for chunk in wrap_text(text, size, width):
+                if y < MARGIN + size:
+                    pdf.add_page()
+                    y = PAGE_HEIGHT - MARGIN
+                y -= size
+                pdf.text(MARGIN, y, chunk, size, bold)
+                y -= gap
+
+        prop, lead, agent = proposal['property'], proposal['lead'], proposal['created_by']
+        line(proposal['title'], size=18, bold=True, gap=8)
+        line(f"Prepared for {lead['first_name']} {lead['last_name']} by {agent['first_name']} {agent['last_name']}"
+             f"{', ' + agent['agency'] if agent.get('agency') else ''}")
+        for path in image_paths[:1]:
+            data, info = self._load_image(path)
+            if info is not None:
+                height = min(width * info[1] / info[0], 300)
+                y -= height + 8
+                pdf.image(MARGIN, y, height * info[0] / info[1], height, data, info)
+        line(f"{prop['title']} - {prop['community']}, {prop['city']}", size=14, bold=True, gap=6)
+        line(f"{prop['type'].title()} | {prop['bedrooms'] or 'Studio'} bedrooms | {prop['area']:,.0f} sq ft | "
+             f"AED {prop['price']:,.0f}")
+        if prop.get('features'):
+            line('Features: ' + ', '.join(prop['features']))
+        for section in proposal['sections']:
+            y -= 8
+            line(section['title'], size=14, bold=True, gap=6)
+            line(section['content'])
+        return pdf.tobytes()
+
+
+# Object stores
+
+class LocalObjectStore:
+    """Object store on the local filesystem; ``base_url`` prefixes returned URLs (default ``file://`` paths)."""
+
+    def __init__(self, root, base_url=None):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url
+
+    def put(self, key, data, content_type='application/pdf'):
+        path = os.path.join(self.root, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return f"{self.base_url.rstrip('/')}/{key}" if self.base_url else 'file://' + path
+
+
+class S3ObjectStore:
+    """Object store over a boto3 S3 client."""
+
+    def __init__(self, client, bucket, prefix='', base_url=None):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.base_url = base_url or f"https://{bucket}.s3.amazonaws.com"
+
+    def put(self, key, data, content_type='application/pdf'):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, ContentType=content_type)
+        return f"{self.base_url}/{self.prefix}{key}"
+
+
+def fetch_image(url):
+    """Image bytes from an http(s) URL or a local path."""
+    if url.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.read()
+    with open(url[len('file://'):] if url.startswith('file://') else url, 'rb') as f:
+        return f.read()
+
+
+# Worker process side
+
+_renderer = None
+
+
+def _load_factory(spec):
+    module, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+
+def _init_worker(renderer_spec):
+    global _renderer
+    _renderer = _load_factory(renderer_spec)()
+
+
+def _render_in_worker(proposal, image_paths):
+    started = time.perf_counter()
+    data = _renderer.render(proposal, image_paths)
+    return data, time.perf_counter() - started
+
+
+# Parent side
+
+class RenderMetrics:
+    """Throughput and latency of rendered proposals; latency is submit-to-stored per proposal."""
+
+    def __init__(self):
+        self.latencies = []
+        self.render_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.failures = 0
+
+    @property
+    def rendered(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.rendered / self.wall_seconds if self.wall_seconds else 0.0
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        # Nearest-rank percentile
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    def as_dict(self):
+        return {'rendered': self.rendered, 'failures': self.failures, 'throughput_per_second': self.throughput,
+                'p50_seconds': self.percentile(50), 'p95_seconds': self.percentile(95),
+                'render_seconds': self.render_seconds, 'wall_seconds': self.wall_seconds}
+
+
+class PdfRenderPool:
+    """Long-lived process pool that renders batches of proposals to an object store."""
+
+    def __init__(self, store, workers=None, renderer='services.pdf_rendering:MinimalPdfRenderer',
+                 fetch=fetch_image, key_template='proposals/{id}.pdf', fetch_threads=8):
+        self.store = store
+        self.fetch = fetch
+        self.key_template = key_template
+        self.fetch_threads = fetch_threads
+        self.metrics = RenderMetrics()
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(renderer,))
+
+    def _fetch_images(self, urls, directory):
+        """Download each distinct URL once; returns ``{url: path}`` for those that succeeded."""
+        def get(url):
+            path = os.path.join(directory, sha256(url.encode()).hexdigest())
+            with open(path, 'wb') as f:
+                f.write(self.fetch(url))
+            return url, path
+
+        paths = {}
+        with ThreadPoolExecutor(self.fetch_threads) as threads:
+            for future in as_completed([threads.submit(get, url) for url in urls]):
+                try:
+                    url, path = future.result()
+                except Exception:
+                    continue
+                paths[url] = path
+        return paths
+
+    def render_batch(self, session, proposal_ids):
+        """Render and store the PDFs of ``proposal_ids``; returns ``({proposal_id: url}, {proposal_id: error})``.
+
+        Every requested id ends up in one of the two; ids with no proposal get a ``LookupError``.
+        """
+        started = time.perf_counter()
+        proposal_ids = list(proposal_ids)
+        proposals = [render('proposal_render', p) for p in load_profile(session, 'proposal_render', proposal_ids)]
+        # Group proposals by property so workers see the same images back to back
+        proposals.sort(key=lambda p: p['property']['id'])
+        image_dir = tempfile.mkdtemp(prefix='proposal-images-')
+        urls, errors = {}, {}
+        found = {p['id'] for p in proposals}
+        for proposal_id in proposal_ids:
+            if proposal_id not in found:
+                errors[proposal_id] = LookupError('proposal not found')
+        try:
+            paths = self._fetch_images({url for p in proposals for url in p['property']['images']}, image_dir)
+            submitted = {}
+            for proposal in proposals:
+                images = [paths[url] for url in proposal['property']['images'] if url in paths]
+                future = self._pool.submit(_render_in_worker, proposal, images)
+                submitted[future] = (proposal['id'], time.perf_counter())
+            for future in as_completed(submitted):
+                proposal_id, submitted_at = submitted[future]
+                try:
+                    data, render_seconds = future.result()
+                    urls[proposal_id] = self.store.put(self.key_template.format(id=proposal_id), data)
+                except Exception as exc:
+                    errors[proposal_id] = exc
+                    self.metrics.failures += 1
+                    continue
+                self.metrics.render_seconds += render_seconds
+                self.metrics.latencies.append(time.perf_counter() - submitted_at)
+        finally:
+            shutil.rmtree(image_dir, ignore_errors=True)
+        if urls:
+            table = Proposal.__table__
+            session.execute(update(table).where(table.c.id == bindparam('pid')).values(pdf_url=bindparam('url')),
+                            [{'pid': pid, 'url': url} for pid, url in urls.items()])
+            session.commit()
+        self.metrics.wall_seconds += time.perf_counter() - started
+        return urls, errors
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
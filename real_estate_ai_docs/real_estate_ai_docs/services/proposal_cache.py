@@ -0,0 +1,195 @@
+"""Content-addressed cache for generated proposal sections and rendered PDFs.
+
+Agents regenerate near-identical proposals for the same property in the same
+language many times a day. A section's content depends only on:
+
+* the property snapshot (including ``updated_at``);
+* the lead attributes that section uses (:data:`SECTION_LEAD_FIELDS`; a
+  payment plan depends on the budget, not on the lead's name);
+* the section type, the proposal language and the template version.
+
+A SHA-256 of exactly those inputs is the cache key. The cache therefore never
+has to decide whether an entry is stale: when ``Property.updated_at`` changes
+the key changes, and the old entries are dropped eagerly by a mapper event and
+otherwise age out of the LRU. A PDF is keyed on the keys of its sections plus
+the proposal and everything else the renderer prints (:data:`PDF_LEAD_FIELDS`,
+:data:`PDF_AGENT_FIELDS` and the title). Sections are shared between leads,
+but a PDF is addressed to one lead and is never reused for another.
+
+The property-to-keys index behind that eager drop is only an optimisation, so
+it is kept bounded: keys a :class:`~db.cache.LocalBackend` evicts or expires
+are forgotten as it drops them, and past ``max_tracked_keys`` the oldest keys
+are forgotten too (a forgotten entry still ages out of the backend).
+
+Generators must only use the lead fields listed for their section, or content
+personalised for one lead would be served to another. :meth:`ProposalCache.cached`
+keeps a plain generator plain, so :class:`~services.proposal_generation.ProposalGenerator`
+still runs it on its bounded thread pool.
+"""
+import hashlib
+import inspect
+import json
+import threading
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import event
+
+from db.cache import CacheStats, LocalBackend
+from db.models import Property
+
+TEMPLATE_VERSION = '1'
+
+SECTION_LEAD_FIELDS = {
+    'property_details': (),
+    'financial_analysis': ('budget_min', 'budget_max'),
+    'location_insights': (),
+    'payment_plan': ('budget_min', 'budget_max'),
+    'visa_information': ('nationality',),
+}
+
+# Lead and agent fields the PDF renderer prints besides the sections
+PDF_LEAD_FIELDS = ('id', 'first_name', 'last_name')
+PDF_AGENT_FIELDS = ('id', 'first_name', 'last_name', 'agency')
+
+
+def _digest(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ProposalCache:
+    """Section content and PDF URLs keyed by a hash of their inputs, stored in a :mod:`db.cache` backend."""
+
+    def __init__(self, backend=None, template_version=TEMPLATE_VERSION, max_tracked_keys=100_000):
+        self.backend = backend if backend is not None else LocalBackend(max_bytes=128 * 1024 * 1024)
+        self.template_version = template_version
+        self.max_tracked_keys = max_tracked_keys
+        self.stats = CacheStats()
+        self._keys_by_property = defaultdict(set)
+        self._property_by_key = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        if isinstance(self.backend, LocalBackend):
+            self.backend.eviction_listeners.append(self._forget)
+
+    def section_key(self, context, section_type):
+        lead = context.get('lead') or {}
+        return 'proposal_section:' + _digest({
+            'property': context['property'],
+            'lead': {field: lead.get(field) for field in SECTION_LEAD_FIELDS.get(section_type, ())},
+            'type': section_type,
+            'language': context.get('language', 'en'),
+            'template': self.template_version,
+        })
+
+    def pdf_key(self, context, section_types):
+        lead = context.get('lead') or {}
+        agent = context.get('created_by') or {}
+        return 'proposal_pdf:' + _digest({
+            'proposal': context.get('id'),
+            'title': context.get('title'),
+            'lead': {field: lead.get(field) for field in PDF_LEAD_FIELDS},
+            'agent': {field: agent.get(field) for field in PDF_AGENT_FIELDS},
+            'sections': [self.section_key(context, t) for t in section_types],
+        })
+
+    def _remember(self, context, key):
+        property_id = context['property']['id']
+        with self._lock:
+            self._keys_by_property[property_id].add(key)
+            self._property_by_key[key] = property_id
+            self._property_by_key.move_to_end(key)
+            while len(self._property_by_key) > self.max_tracked_keys:
+                self._untrack(*self._property_by_key.popitem(last=False))
+
+    def _untrack(self, key, property_id):
+        keys = self._keys_by_property.get(property_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_property[property_id]
+
+    def _forget(self, key):
+        with self._lock:
+            property_id = self._property_by_key.pop(key, None)
+            if property_id is not None:
+                self._untrack(key, property_id)
+
+    def _get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.bytes_saved += len(value)
+        return value.decode()
+
+    def get_section(self, context, section_type):
+        return self._get(self.section_key(context, section_type))
+
+    def put_section(self, context, section_type, content):
+        key = self.section_key(context, section_type)
+        self.backend.set(key, content.encode())
+        self._remember(context, key)
+
+    def get_pdf_url(self, context, section_types):
+        return self._get(self.pdf_key(context, section_types))
+
+    def put_pdf_url(self, context, section_types, pdf_url):
+        key = self.pdf_key(context, section_types)
+        self.backend.set(key, pdf_url.encode())
+        self._remember(context, key)
+
+    def cached(self, generate):
+        """Wrap a section ``generate(section_type, context)`` callable so unchanged inputs skip generation.
+
+        Only successful results are cached; fallback content from timeouts or
+        errors is produced outside ``generate`` and never stored. The wrapper is
+        a coroutine function exactly when ``generate`` is one.
+        """
+        if inspect.iscoroutinefunction(generate):
+            async def cached_generate(section_type, context):
+                content = self.get_section(context, section_type)
+                if content is None:
+                    content = await generate(section_type, context)
+                    self.put_section(context, section_type, content)
+                return content
+        else:
+            def cached_generate(section_type, context):
+                content = self.get_section(context, section_type)
+                if content is None:
+                    content = generate(section_type, context)
+                    self.put_section(context, section_type, content)
+                return content
+        return cached_generate
+
+    def invalidate_property(self, property_id):
+        """Drop every cached section and PDF built from ``property_id``."""
+        with self._lock:
+            keys = self._keys_by_property.pop(property_id, set())
+            for key in keys:
+                self._property_by_key.pop(key, None)
+        if keys:
+            self.stats.invalidations += len(keys)
+            self.backend.delete(*keys)
+        return len(keys)
+
+    def listen(self):
+        """Invalidate a property's entries whenever it is updated or deleted through the ORM."""
+        def changed(mapper, connection, target):
+            self.invalidate_property(target.id)
+
+        for name in ('after_update', 'after_delete'):
+            event.listen(Property, name, changed)
+            self._listeners.append((name, changed))
+        return self
+
+    def close(self):
+        for name, fn in self._listeners:
+            event.remove(Property, name, fn)
+        self._listeners = []
+        if isinstance(self.backend, LocalBackend) and self._forget in self.backend.eviction_listeners:
+            self.backend.eviction_listeners.remove(self._forget)
+
+    def metrics(self):
+        return dict(self.stats.as_dict(), tracked_keys=len(self._property_by_key), **self.backend.stats())
@@ -0,0 +1,181 @@
+"""Concurrent generation of proposal sections with in-order streaming.
+
+The flow in ``diagrams/proposal_generation_sequence.py`` (steps 8-10) asks the
+LLM for each section in turn, so a proposal takes the sum of five LLM calls.
+The sections are independent given the property and lead data, so
+:class:`ProposalGenerator` runs them concurrently. A semaphore caps how many
+calls are in flight, and each section has its own timeout. A section that
+times out or fails gets fallback content instead of failing the proposal.
+
+Finished sections are streamed as soon as every section before them (by
+``ProposalSection.order``) is done, so the client can render the proposal top
+down while later sections are still generating. Once all sections are in,
+:func:`generate_proposal` persists them with one bulk INSERT, replacing the
+sections of any earlier generation.
+
+``generate`` is any callable ``generate(section_type, context) -> str``,
+either a coroutine function (an async LLM client) or a plain function. Plain
+functions run on the generator's own pool of ``max_threads`` threads. A thread
+cannot be interrupted, so a call that times out keeps its thread until it
+returns; the pool size, not the semaphore, is what bounds the blocking calls
+in flight (see :attr:`ProposalGenerator.in_flight`).
+"""
+import asyncio
+import inspect
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, insert
+
+from db.loading import load_profile, render
+from db.models import ProposalSection
+
+SECTION_TYPES = ('property_details', 'financial_analysis', 'location_insights', 'payment_plan', 'visa_information')
+
+SECTION_TITLES = {
+    'property_details': 'Property Details',
+    'financial_analysis': 'Financial Analysis',
+    'location_insights': 'Location Insights',
+    'payment_plan': 'Payment Plan',
+    'visa_information': 'Visa Information',
+}
+
+SectionResult = namedtuple('SectionResult', 'order type title content status elapsed')
+
+
+def unavailable_section(section_type, context, error):
+    """Default fallback content for a section that timed out or failed."""
+    return f"{SECTION_TITLES.get(section_type, section_type)} is being prepared and will be shared by your agent."
+
+
+def proposal_context(session, proposal_id):
+    """Property, lead and agent data for a proposal, loaded under the ``proposal_render`` profile."""
+    rows = load_profile(session, 'proposal_render', [proposal_id])
+    if not rows:
+        raise ValueError(f"Proposal {proposal_id} does not exist")
+    return render('proposal_render', rows[0])
+
+
+class ProposalGenerator:
+    """Generates proposal sections concurrently; at most ``concurrency`` calls per proposal run at once.
+
+    Plain ``generate`` functions share ``max_threads`` worker threads (default
+    ``concurrency``) across every proposal this generator serves, including
+    calls still finishing after their timeout.
+    """
+
+    def __init__(self, generate, concurrency=3, timeout=30.0, fallback=unavailable_section, max_threads=None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.generate = generate
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.fallback = fallback
+        self.in_flight = 0  # plain generate calls running in a worker thread, timed out or not
+        self._in_flight_lock = threading.Lock()
+        self._executor = None
+        if not inspect.iscoroutinefunction(generate):
+            self._executor = ThreadPoolExecutor(max_workers=max_threads or concurrency,
+                                                thread_name_prefix='proposal-section')
+
+    def _run_in_thread(self, section_type, context):
+        with self._in_flight_lock:
+            self.in_flight += 1
+        try:
+            return self.generate(section_type, context)
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+
+    async def _call(self, section_type, context):
+        if self._executor is None:
+            return await self.generate(section_type, context)
+        # A call cancelled by the timeout before a thread picked it up never runs
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run_in_thread, section_type, context)
+
+    async def _section(self, semaphore, order, section_type, context):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                content = await asyncio.wait_for(self._call(section_type, context), self.timeout)
+                status = 'ok'
+            except asyncio.TimeoutError as exc:
+                content, status = self.fallback(section_type, context, exc), 'timeout'
+            except Exception as exc:
+                content, status = self.fallback(section_type, context, exc), 'error'
+            return SectionResult(order, section_type, SECTION_TITLES.get(section_type, section_type), content,
+                                 status, time.perf_counter() - started)
+
+    async def stream(self, context, section_types=SECTION_TYPES, ordered=True):
+        """Yield a :class:`SectionResult` per section.
+
+        With ``ordered`` (the default) a section is yielded once all sections
+        before it are done, so results arrive in ``order``. Otherwise each is
+        yielded as soon as it finishes and the client places it by ``order``.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = {asyncio.ensure_future(self._section(semaphore, order, section_type, context))
+                   for order, section_type in enumerate(section_types, start=1)}
+        finished = {}
+        next_order = 1
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if not ordered:
+                        yield result
+                    finished[result.order] = result
+                while ordered and next_order in finished:
+                    yield finished[next_order]
+                    next_order += 1
+        finally:
+            # The consumer may stop early (client disconnected); do not leave LLM calls running
+            for task in pending:
+                task.cancel()
+
+    async def generate_all(self, context, section_types=SECTION_TYPES, on_section=None):
+        """All sections in order; ``on_section`` is called (or awaited) with each one as it streams."""
+        results = []
+        async for result in self.stream(context, section_types):
+            if on_section is not None:
+                outcome = on_section(result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            results.append(result)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def save_sections(session, proposal_id, results):
+    """Replace the sections of a proposal: one DELETE and one executemany INSERT in one transaction."""
+    session.execute(delete(ProposalSection).where(ProposalSection.proposal_id == proposal_id))
+    session.execute(insert(ProposalSection), [
+        {'proposal_id': proposal_id, 'title': r.title, 'content': r.content, 'type': r.type, 'order': r.order}
+        for r in results
+    ])
+    session.commit()
+
+
+async def generate_proposal(session, proposal_id, generator, section_types=SECTION_TYPES, on_section=None):
+    """Generate, stream and persist the sections of ``proposal_id``; returns the :class:`SectionResult` list.
+
+    ``session`` is a synchronous ORM session; database work runs in a worker
+    thread so the event loop keeps streaming other proposals.
+    """
+    context = await asyncio.to_thread(proposal_context, session, proposal_id)
+    results = await generator.generate_all(context, section_types, on_section)
+    await asyncio.to_thread(save_sections, session, proposal_id, results)
+    return results
@@ -0,0 +1,59 @@
+"""Query budgets of the :mod:`db.loading` profiles on a small synthetic database."""
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from db.loading import PROFILES, assert_max_queries, assert_profile_queries, load_profile
+from db.models import Base
+from db.synthetic import generate
+
+
+@pytest.fixture(scope='module')
+def engine():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    generate(engine, properties=60, leads=200, embeddings=False, seed=1)
+    yield engine
+    engine.dispose()
+
+
+def _ids(engine, model, limit):
+    with Session(engine) as session:
+        return session.scalars(select(model.id).order_by(model.id).limit(limit)).all()
+
+
+@pytest.mark.parametrize('name', sorted(PROFILES))
+def test_profile_stays_within_its_query_budget(engine, name):
+    ids = _ids(engine, PROFILES[name].model, 20)
+    assert len(ids) > 1
+    with Session(engine) as session:
+        rendered = assert_profile_queries(session, name, ids)
+    assert [row['id'] for row in rendered] == ids
+
+
+@pytest.mark.parametrize('name', sorted(PROFILES))
+def test_profile_query_count_does_not_grow_with_rows(engine, name):
+    profile = PROFILES[name]
+    counts = []
+    for limit in (1, 20):
+        ids = _ids(engine, profile.model, limit)
+        with Session(engine) as session, assert_max_queries(engine, profile.max_queries) as counter:
+            [profile.render(row) for row in load_profile(session, name, ids)]
+        counts.append(len(counter))
+    assert counts[0] == counts[1]
+
+
+def test_assert_max_queries_reports_the_statements(engine):
+    ids = _ids(engine, PROFILES['listing_card'].model, 2)
+    with Session(engine) as session, pytest.raises(AssertionError, match='Expected at most 1 queries, got 2'):
+        with assert_max_queries(engine, 1):
+            load_profile(session, 'listing_card', ids)
+
+
+def test_relationship_outside_the_profile_raises(engine):
+    ids = _ids(engine, PROFILES['listing_card'].model, 1)
+    with Session(engine) as session:
+        card = load_profile(session, 'listing_card', ids)[0]
+        with pytest.raises(InvalidRequestError):
+            card.features